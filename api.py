@@ -0,0 +1,208 @@
+"""HTTP API over RAGPipeline for other services.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    POST /ask            {"question": ...} -> answer, context, strategy, filters
+    POST /retrieve       {"question": ...} -> context only (no generation)
+    POST /ask/stream     {"question": ...} -> NDJSON: {"type": "token"} events, then {"type": "result"}
+    GET  /health         liveness
+    GET  /ready          200 once the embedding model is warm, 503 before (RANKING/FILTERS_ONLY
+                         questions are already served while it loads)
+    GET  /metrics        Prometheus text: duration histogram per pipeline stage (route, route.llm,
+                         retrieve, retrieve.select_table, rpc.<name>, embed, generate, query, ...)
+
+Every /ask and /retrieve response carries its spans in "trace"; set RAG_TRACE_LOG to also append
+each trace to a JSONL file.
+
+Concurrent query embeddings are micro-batched (EMBED_BATCH_MAX, EMBED_BATCH_WAIT_MS).
+At most API_MAX_IN_FLIGHT requests run at once; up to API_MAX_QUEUE more wait up to
+API_QUEUE_TIMEOUT_S seconds, and anything beyond that gets 429 with Retry-After.
+Pipeline configuration is the same env as app.py (see src/rag/factory.py).
+"""
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+
+from dotenv import find_dotenv, load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool
+
+from src.rag.factory import build_embedding_client, build_rag_pipeline
+from src.utils.embedding_batcher import MicroBatchingEmbedder
+from src.utils.tracing import METRICS
+
+load_dotenv(find_dotenv())
+
+
+class AdmissionController:
+    """Bounded concurrency: max_in_flight running, max_queue waiting, the rest rejected with 429."""
+
+    def __init__(self, max_in_flight: int = 32, max_queue: int = 64, queue_timeout: float = 10.0) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    def _reject(self, reason: str) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(status_code=429, detail=reason, headers={"Retry-After": "1"})
+
+    async def acquire(self) -> None:
+        # dem ca request dang cho lay semaphore: wait_for chi acquire o vong lap sau,
+        # nen mot loat request toi cung luc chua lam semaphore.locked()
+        if self.in_flight + self.waiting >= self.max_in_flight + self.max_queue:
+            raise self._reject("Server overloaded, queue full")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("Server overloaded, timed out in queue")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "waiting": self.waiting, "rejected": self.rejected,
+                "max_in_flight": self.max_in_flight, "max_queue": self.max_queue}
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """StreamingResponse that frees its admission slot however the response ends.
+
+    The body generator's `finally` only runs if the body is iterated; a client that
+    disconnects before the first chunk (or a failed send) would otherwise keep the slot.
+    """
+
+    def __init__(self, content: Any, admission: AdmissionController, **kwargs) -> None:
+        super().__init__(content, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.admission.release()
+
+
+class Question(BaseModel):
+    question: str
+
+
+state: dict[str, Any] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    embedder = MicroBatchingEmbedder(
+        build_embedding_client(),
+        max_batch=int(os.environ.get("EMBED_BATCH_MAX", "32")),
+        max_wait_ms=float(os.environ.get("EMBED_BATCH_WAIT_MS", "5")),
+    )
+    state["embedder"] = embedder
+    state["admission"] = AdmissionController(
+        max_in_flight=int(os.environ.get("API_MAX_IN_FLIGHT", "32")),
+        max_queue=int(os.environ.get("API_MAX_QUEUE", "64")),
+        queue_timeout=float(os.environ.get("API_QUEUE_TIMEOUT_S", "10")),
+    )
+    state["pipeline"] = await asyncio.to_thread(build_rag_pipeline, embedder)
+    yield
+    state.clear()
+
+
+app = FastAPI(title="RAG Football Q&A API", lifespan=lifespan)
+
+
+def _public(result: dict) -> dict:
+    # bo vector embedding cua doc khoi response
+    result = dict(result)
+    result["context"] = [{k: v for k, v in doc.items() if k != "embedding"} for doc in result.get("context") or []]
+    return result
+
+
+def _question(body: Question) -> str:
+    question = body.question.strip()
+    if not question:
+        raise HTTPException(status_code=422, detail="question is empty")
+    return question
+
+
+async def _run(coro_fn, question: str) -> dict:
+    admission: AdmissionController = state["admission"]
+    await admission.acquire()
+    try:
+        return _public(await coro_fn(question))
+    finally:
+        admission.release()
+
+
+@app.post("/ask")
+async def ask(body: Question) -> dict:
+    return await _run(state["pipeline"].acall, _question(body))
+
+
+@app.post("/retrieve")
+async def retrieve(body: Question) -> dict:
+    return await _run(state["pipeline"].aretrieve, _question(body))
+
+
+@app.post("/ask/stream")
+async def ask_stream(body: Question) -> StreamingResponse:
+    question = _question(body)
+    admission: AdmissionController = state["admission"]
+    await admission.acquire()
+
+    async def events():
+        try:
+            # pipeline.stream la generator sync (Gemini stream) -> chay trong threadpool
+            async for event in iterate_in_threadpool(state["pipeline"].stream(question)):
+                if event.get("type") == "result":
+                    event = _public(event)
+                yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+
+    # slot da giu -> response tu tra khi ket thuc (ke ca khi body chua bao gio duoc doc)
+    try:
+        return AdmittedStreamingResponse(events(), admission, media_type="application/x-ndjson")
+    except BaseException:
+        admission.release()
+        raise
+
+
+@app.get("/health")
+async def health() -> dict:
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    pipeline: Optional[Any] = state.get("pipeline")
+    embedder: Optional[MicroBatchingEmbedder] = state.get("embedder")
+    model_ready = bool(embedder is not None and embedder.ready)
+    body = {
+        "ready": pipeline is not None and model_ready,
+        "pipeline": pipeline is not None,
+        "embedding_model": model_ready,
+        "admission": state["admission"].stats() if "admission" in state else None,
+        "embedding_batches": embedder.stats() if embedder is not None else None,
+        "answer_cache": pipeline.answer_cache.stats() if pipeline is not None and pipeline.answer_cache else None,
+        "coalescing": pipeline.coalescing_stats() if pipeline is not None else None,
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
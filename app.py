@@ -1,17 +1,12 @@
 import streamlit as st
 import json
-import os
 from datetime import datetime
-from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 
-from src.utils.supabase_client import SupabaseClient
-from src.utils.gemini_client import GeminiClient
-from src.utils.embedding_client import LocalEmbeddingClient
-from src.rag.retriever import Retriever
-from src.rag.generator import ResponseGenerator
-from src.rag.query_processor import QueryProcessor
-from src.rag.rag_pipeline import RAGPipeline
+# supabase/httpx, google.generativeai va torch import trong build_rag_pipeline (lazy),
+# trang hien thi ngay khi script chay
+from src.rag.factory import build_rag_pipeline
+from src.utils.eval_store import EvaluationStore
 
 load_dotenv(find_dotenv())
 
@@ -24,16 +19,8 @@ st.set_page_config(
 @st.cache_resource
 def init_rag_pipeline():
     try:
-        supabase = SupabaseClient()
-        gemini_client = GeminiClient()
-        embedding_client = LocalEmbeddingClient()
-
-        pipeline = RAGPipeline(
-            retriever=Retriever(supabase, gemini_client, embedding_client),
-            generator=ResponseGenerator(gemini_client),
-            query_processor=QueryProcessor(gemini_client, embedding_client),
-        )
-        return pipeline
+        # cau hinh qua env (STORAGE_BACKEND, USE_LOCAL_VECTOR_INDEX, EMBEDDING_QUANTIZE, ...), xem src/rag/factory.py
+        return build_rag_pipeline()
     except Exception as e:
         st.error(f"Lỗi khởi tạo RAG pipeline: {str(e)}")
         return None
@@ -46,6 +33,17 @@ if 'current_context' not in st.session_state:
     st.session_state.current_context = None
 if 'current_question' not in st.session_state:
     st.session_state.current_question = None
+if 'current_timings' not in st.session_state:
+    st.session_state.current_timings = None
+if 'current_trace' not in st.session_state:
+    st.session_state.current_trace = None
+
+@st.cache_resource
+def get_eval_store():
+    # 1 store dung chung cho moi session; ghi append-only + flock nen nhieu session/process ghi cung luc van an toan
+    return EvaluationStore()
+
+EVAL_PAGE_SIZE = 20
 
 def save_evaluation_event(question, answer, context, ground_truth=None):
     event = {
@@ -55,29 +53,37 @@ def save_evaluation_event(question, answer, context, ground_truth=None):
         'context': context,
         'ground_truth': ground_truth
     }
-
-    Path('data').mkdir(exist_ok=True)
-
-    events_file = 'data/evaluation_events.json'
-    if os.path.exists(events_file):
-        with open(events_file, 'r', encoding='utf-8') as f:
-            events = json.load(f)
-    else:
-        events = []
-
-    events.append(event)
-
-    with open(events_file, 'w', encoding='utf-8') as f:
-        json.dump(events, f, ensure_ascii=False, indent=2)
-
+    get_eval_store().append(event)
     return True
 
-def process_question(pipeline, question):
+def stream_question(pipeline, question, result_holder):
+    # yield token cho st.write_stream, ket qua cuoi (context, timings) ghi vao result_holder
     try:
-        result = pipeline(question)
-        return result['answer'], result.get('context', [])
+        for event in pipeline.stream(question):
+            if event['type'] == 'token':
+                yield event['text']
+            else:
+                result_holder.update(event)
     except Exception as e:
-        return f"Lỗi xử lý câu hỏi: {str(e)}", []
+        error = f"Lỗi xử lý câu hỏi: {str(e)}"
+        result_holder.update({'answer': error, 'context': []})
+        yield error
+
+def trace_rows(trace):
+    # span -> 1 dong bang, thut le theo do sau (route > route.llm, retrieve > rpc.*, ...)
+    depth = {trace['root']['span_id']: 0}
+    rows = []
+    for span in trace['spans']:
+        level = depth.get(span['parent_id'], 0) + 1
+        depth[span['span_id']] = level
+        attributes = {k: v for k, v in span['attributes'].items() if v is not None}
+        rows.append({
+            'Bước': "  " * (level - 1) + span['name'],
+            'Bắt đầu (ms)': round(span['start_ms'], 1),
+            'Thời gian (ms)': round(span['duration_ms'], 1),
+            'Thuộc tính': ", ".join(f"{k}={v}" for k, v in attributes.items()),
+        })
+    return rows
 
 st.title("⚽ RAG Football Q&A")
 st.markdown("Hệ thống hỏi đáp về bóng đá với RAG (Retrieval-Augmented Generation)")
@@ -85,17 +91,9 @@ st.markdown("Hệ thống hỏi đáp về bóng đá với RAG (Retrieval-Augme
 with st.sidebar:
     st.header("📊 Thống kê")
 
-    events_file = 'data/evaluation_events.json'
-    if os.path.exists(events_file):
-        with open(events_file, 'r', encoding='utf-8') as f:
-            saved_events = json.load(f)
-
-        st.metric("Tổng câu hỏi đã lưu", len(saved_events))
-
-        with_gt = sum(1 for e in saved_events if e.get('ground_truth'))
-        st.metric("Có ground truth", with_gt)
-    else:
-        st.metric("Tổng câu hỏi đã lưu", 0)
+    counts = get_eval_store().counts()
+    st.metric("Tổng câu hỏi đã lưu", counts['total'])
+    st.metric("Có ground truth", counts['with_ground_truth'])
 
     st.divider()
 
@@ -113,6 +111,13 @@ pipeline = init_rag_pipeline()
 if pipeline is None:
     st.error("Không thể khởi tạo RAG pipeline. Vui lòng kiểm tra cấu hình.")
 else:
+    with st.sidebar:
+        if pipeline.query_processor.embedding_client.ready:
+            st.caption("🟢 Embedding model: sẵn sàng")
+        else:
+            st.caption("🟡 Embedding model: đang tải (câu hỏi xếp hạng/lọc vẫn trả lời được)")
+        show_latency = st.checkbox("⏱️ Phân tích độ trễ theo bước", value=False)
+
     col1, col2 = st.columns([4, 1])
 
     with col1:
@@ -125,24 +130,50 @@ else:
     with col2:
         ask_button = st.button("🔍 Hỏi", type="primary", use_container_width=True)
 
+    streamed = False
     if ask_button and question:
-        with st.spinner("Đang xử lý câu hỏi..."):
-            answer, context = process_question(pipeline, question)
-            st.session_state.current_question = question
-            st.session_state.current_answer = answer
-            st.session_state.current_context = context
-
-            st.session_state.history.append({
-                'question': question,
-                'answer': answer,
-                'context': context
-            })
+        st.divider()
+        st.subheader("💡 Câu trả lời:")
+        result = {}
+        st.write_stream(stream_question(pipeline, question, result))
+
+        answer = result.get('answer', '')
+        context = result.get('context', [])
+        st.session_state.current_question = question
+        st.session_state.current_answer = answer
+        st.session_state.current_context = context
+        st.session_state.current_timings = {
+            k: result[k] for k in ('ttft_ms', 'generation_ms', 'total_ms') if k in result
+        }
+        st.session_state.current_trace = result.get('trace')
+
+        st.session_state.history.append({
+            'question': question,
+            'answer': answer,
+            'context': context
+        })
+        # khong st.rerun(): cau tra loi vua stream giu nguyen tren trang, phan duoi chi them timings/context
+        streamed = True
 
     if st.session_state.current_answer:
-        st.divider()
+        if not streamed:
+            st.divider()
+            st.subheader("💡 Câu trả lời:")
+            st.write(st.session_state.current_answer)
+
+        timings = st.session_state.current_timings
+        if timings:
+            st.caption(
+                f"⏱️ Token đầu tiên: {timings['ttft_ms']:.0f} ms · "
+                f"Sinh câu trả lời: {timings['generation_ms']:.0f} ms · "
+                f"Tổng: {timings['total_ms']:.0f} ms"
+            )
 
-        st.subheader("💡 Câu trả lời:")
-        st.write(st.session_state.current_answer)
+        trace = st.session_state.current_trace
+        if show_latency and trace:
+            with st.expander("⏱️ Phân tích độ trễ", expanded=True):
+                st.dataframe(trace_rows(trace), use_container_width=True, hide_index=True)
+                st.caption(f"Trace {trace['trace_id']} · tổng {trace['total_ms']:.0f} ms")
 
         if st.session_state.current_context:
             with st.expander("📚 Xem context đã sử dụng"):
@@ -185,6 +216,8 @@ else:
             st.session_state.current_question = None
             st.session_state.current_answer = None
             st.session_state.current_context = None
+            st.session_state.current_timings = None
+            st.session_state.current_trace = None
             st.rerun()
 
     with col2:
@@ -206,13 +239,19 @@ else:
 
     with col3:
         if st.button("📊 Xem file đánh giá"):
-            events_file = 'data/evaluation_events.json'
-            if os.path.exists(events_file):
-                with open(events_file, 'r', encoding='utf-8') as f:
-                    events = json.load(f)
-                st.json(events)
-            else:
-                st.info("Chưa có dữ liệu đánh giá")
+            st.session_state.show_eval_events = not st.session_state.get('show_eval_events', False)
+
+    if st.session_state.get('show_eval_events'):
+        # chi doc cac event cua 1 trang, khong load ca file
+        store = get_eval_store()
+        total = store.counts()['total']
+        if total:
+            pages = (total + EVAL_PAGE_SIZE - 1) // EVAL_PAGE_SIZE
+            page = st.number_input(f"Trang (1-{pages}, mới nhất trước)", min_value=1, max_value=pages, value=1)
+            st.caption(f"{total} event, {EVAL_PAGE_SIZE} event/trang")
+            st.json(store.read_page(page - 1, EVAL_PAGE_SIZE))
+        else:
+            st.info("Chưa có dữ liệu đánh giá")
 
 st.divider()
 st.markdown(
@@ -0,0 +1,189 @@
+"""Benchmark IVFIndex (approximate) against VectorIndex (exact search).
+
+Reports build time, recall@k and query latency for several nprobe values on the
+real player / team vectors. By default they come from the local SQLite backend
+(build it with `python scripts_addon/build_sqlite_db.py --embed`), and the queries
+are the questions in data/eval/router_queries.jsonl embedded with the same model.
+The synthetic clustered data is only a smoke test: its clusters separate so
+cleanly that recall is ~1.0 at any nprobe.
+
+Usage (from repo root):
+    python scripts_addon/bench_ann.py
+    python scripts_addon/bench_ann.py --queries perturb      # no model: catalog vectors + noise
+    python scripts_addon/bench_ann.py --real data/players/players_with_embeddings.jsonl
+    python scripts_addon/bench_ann.py --synthetic --n 30000
+"""
+import argparse
+import json
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.ann_index import IVFIndex  # noqa: E402
+from src.utils.sqlite_client import DEFAULT_DB_PATH, PRIMARY_KEYS, SQLiteClient  # noqa: E402
+from src.utils.vector_index import VectorIndex, parse_embedding  # noqa: E402
+
+LEAGUES = ["eng premier league", "es la liga", "it serie a", "de bundesliga", "fr ligue 1"]
+EVAL_PATH = "data/eval/router_queries.jsonl"
+
+
+def synthetic(n: int, dim: int, n_clusters: int = 200, seed: int = 0):
+    # du lieu co cum (giong embedding that hon la gaussian deu)
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    matrix = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    rows = [{"player_id": i, "current_league": LEAGUES[i % len(LEAGUES)]} for i in range(n)]
+    queries = centers[rng.integers(0, n_clusters, 200)] + 0.6 * rng.standard_normal((200, dim)).astype(np.float32)
+    return rows, matrix, queries
+
+
+def perturbed(matrix: np.ndarray, n_queries: int = 200, noise: float = 0.5, seed: int = 0) -> np.ndarray:
+    # query = vector co san (chuan hoa) + nhieu ~noise * |v|, tranh truong hop tim thay chinh no
+    rng = np.random.default_rng(seed)
+    base = matrix[rng.choice(len(matrix), n_queries)]
+    base = base / np.linalg.norm(base, axis=1, keepdims=True)
+    jitter = rng.standard_normal(base.shape) / np.sqrt(base.shape[1])
+    return (base + noise * jitter).astype(np.float32)
+
+
+def real(path: str, n_queries: int = 200, seed: int = 0, noise: float = 0.5):
+    rows, vectors = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            vec = parse_embedding(row.pop("embedding", None))
+            if vec is not None:
+                rows.append(row)
+                vectors.append(vec)
+    matrix = np.vstack(vectors)
+    return rows, matrix, perturbed(matrix, n_queries, noise, seed)
+
+
+def from_db(path: str, table: str):
+    """Rows and embedding matrix of one table of the SQLite backend (rows without a vector are skipped)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        cur = conn.execute(f"SELECT * FROM {table} WHERE embedding IS NOT NULL")
+        rows, vectors = [], []
+        for r in cur.fetchall():
+            rows.append(SQLiteClient._decode(r))
+            vectors.append(np.frombuffer(r["embedding"], dtype=np.float32))
+    finally:
+        conn.close()
+    return rows, (np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32))
+
+
+def eval_queries(table: str, path: str = EVAL_PATH) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    return [c["query"] for c in cases if c.get("table", "players") == table]
+
+
+def id_key(rows: list[dict]) -> str:
+    return next((k for k in ("player_id", "team_id") if rows and k in rows[0]), "player_id")
+
+
+def ids_of(results: list[dict], key: str) -> set:
+    return {r[key] for r in results}
+
+
+def run(name: str, rows, matrix, queries, k: int, nlist, nprobes, filters):
+    key = id_key(rows)
+    t0 = time.perf_counter()
+    exact = VectorIndex.from_matrix(rows, matrix)
+    exact_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ivf = IVFIndex.from_matrix(rows, matrix, nlist=nlist)
+    ivf_build = time.perf_counter() - t0
+
+    print(f"\n=== {name}: n={len(rows)} dim={matrix.shape[1]} queries={len(queries)} filters={filters} ===")
+    print(f"build: exact {exact_build * 1000:.0f} ms | ivf {ivf_build * 1000:.0f} ms (nlist={ivf.nlist})")
+
+    truth, lat = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        truth.append(ids_of(exact.search(q, k, -1.0, filters), key))
+        lat.append((time.perf_counter() - t0) * 1000)
+    print(f"exact      p50={statistics.median(lat):.2f} ms  p95={np.percentile(lat, 95):.2f} ms")
+
+    for nprobe in nprobes:
+        if nprobe > ivf.nlist:
+            continue
+        lat, recall = [], []
+        for q, t in zip(queries, truth):
+            t0 = time.perf_counter()
+            got = ids_of(ivf.search(q, k, -1.0, filters, nprobe=nprobe), key)
+            lat.append((time.perf_counter() - t0) * 1000)
+            recall.append(len(got & t) / max(1, len(t)))
+        print(f"nprobe={nprobe:<4d} p50={statistics.median(lat):.2f} ms  p95={np.percentile(lat, 95):.2f} ms"
+              f"  recall@{k}={np.mean(recall):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite backend built with build_sqlite_db.py --embed")
+    parser.add_argument("--tables", nargs="+", default=["players", "teams"])
+    parser.add_argument("--real", help="JSONL rows with an 'embedding' column (e.g. an export of the players table)")
+    parser.add_argument("--queries", choices=["eval", "perturb"], default="eval",
+                        help="eval: router eval questions embedded locally; perturb: catalog vectors + noise")
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--synthetic", action="store_true", help="also run the synthetic clustered smoke test")
+    parser.add_argument("--n", type=int, default=30000)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    datasets = []
+    if args.real:
+        rows, matrix, _ = real(args.real)
+        datasets.append((Path(args.real).stem, rows, matrix))
+    elif Path(args.db).exists():
+        for table in args.tables:
+            rows, matrix = from_db(args.db, table)
+            if len(rows):
+                datasets.append((table, rows, matrix))
+    if not datasets and not args.synthetic:
+        print(f"⚠️ No embedded rows in {args.db}: run `python scripts_addon/build_sqlite_db.py --embed` "
+              f"or pass --real / --synthetic")
+        sys.exit(1)
+
+    embedder = None
+    if datasets and args.queries == "eval":
+        try:
+            from src.utils.embedding_client import LocalEmbeddingClient
+            embedder = LocalEmbeddingClient(cache_dir="data/cache/embeddings")
+        except ImportError as e:
+            print(f"⚠️ Local embedding model unavailable ({e}); using perturbed catalog vectors as queries")
+
+    for name, rows, matrix in datasets:
+        table = "teams" if id_key(rows) == PRIMARY_KEYS["teams"] else "players"
+        texts = eval_queries(table) if embedder is not None else []
+        if texts:
+            queries = np.asarray(embedder.get_embeddings(texts), dtype=np.float32)
+            label = f"{name} / eval queries"
+        else:
+            queries = perturbed(matrix, noise=args.noise)
+            label = f"{name} / perturbed x{args.noise}"
+        run(label, rows, matrix, queries, args.k, args.nlist, args.nprobe, None)
+        run(label, rows, matrix, queries, args.k, args.nlist, args.nprobe, {"league": "La Liga"})
+
+    if args.synthetic:
+        rows, matrix, queries = synthetic(args.n, args.dim)
+        run("synthetic", rows, matrix, queries, args.k, args.nlist, args.nprobe, None)
+        run("synthetic", rows, matrix, queries, args.k, args.nlist, args.nprobe, {"league": "La Liga"})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark EmbeddingPool: docs/sec vs worker count on real player documents.
+
+Each configuration gets all cores split evenly across its workers (threads_per_worker =
+cores // workers), so the numbers show what multi-process sharding buys over one
+process with the same total thread budget. Models are loaded before timing.
+
+Usage (from repo root):
+    python scripts_addon/bench_embedding_pool.py --workers 1,2,4,8 --n 4000
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.embedding_pool import DEFAULT_MODEL, EmbeddingPool  # noqa: E402
+from src.utils.ingest import csv_player_entity, iter_raw_records, make_player_document  # noqa: E402
+
+
+def load_documents(path: str, n: int) -> list[str]:
+    docs = [make_player_document(csv_player_entity(row)) for _, row in iter_raw_records(path)]
+    # lap lai neu can nhieu hon so cau thu 1 mua (gia lap corpus nhieu mua)
+    while len(docs) < n:
+        docs += docs[: n - len(docs)]
+    return docs[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default="data/players/players_data-2024_2025.csv")
+    parser.add_argument("--n", type=int, default=4000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--no-sort", action="store_true", help="disable length sorting (window = chunk size)")
+    args = parser.parse_args()
+
+    docs = load_documents(args.input, args.n)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"{len(docs)} documents, {cores} cores, model {args.model}")
+    print(f"{'workers':>8} {'threads/w':>10} {'docs/s':>10} {'speedup':>8} {'max|diff|':>10}")
+
+    baseline_rate = baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        with EmbeddingPool(args.model, workers=workers, chunk_size=args.chunk_size, batch_size=args.batch_size,
+                           window=args.chunk_size if args.no_sort else 4096) as pool:
+            pool.warm_up()
+            t0 = time.perf_counter()
+            out = pool.encode(docs)
+            rate = len(docs) / (time.perf_counter() - t0)
+        if baseline is None:
+            baseline_rate, baseline = rate, out
+        diff = float(np.abs(out - baseline).max())
+        print(f"{workers:>8} {pool.threads_per_worker:>10} {rate:>10.1f} {rate / baseline_rate:>7.2f}x {diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""Offline end-to-end benchmark of RAGPipeline with fake Supabase / Gemini clients.
+
+Storage is an in-memory SQLite loaded from data/, the LLM answers the router / table /
+decomposition prompts from the labelled routes in data/eval/router_queries.jsonl (plus the
+"both"-table queries below), and every RPC / LLM call sleeps an injected latency with jitter.
+No network, no API quota, same numbers on every run with the same --seed.
+
+Reports per stage and end-to-end p50/p95/p99, throughput, LLM calls and allocations (tracemalloc,
+separate pass), per query group and overall, and writes them to a JSON file so two commits can be
+compared (--baseline).
+
+Stages are inclusive and nested: embed runs inside route / retrieve, storage inside retrieve,
+llm inside route / retrieve / generate.
+
+Usage (from repo root):
+    python scripts_addon/bench_pipeline.py
+    python scripts_addon/bench_pipeline.py --mode async --concurrency 16 --rounds 5
+    python scripts_addon/bench_pipeline.py --llm-router --supabase-ms 0 --llm-ms 0   # CPU only
+    python scripts_addon/bench_pipeline.py --baseline data/cache/bench_pipeline_abc1234.json
+"""
+import argparse
+import asyncio
+import contextvars
+import inspect
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.rag.answer_cache import SemanticAnswerCache  # noqa: E402
+from src.rag.fast_router import FastRouter  # noqa: E402
+from src.rag.generator import ResponseGenerator  # noqa: E402
+from src.rag.query_processor import QueryProcessor  # noqa: E402
+from src.rag.rag_pipeline import RAGPipeline  # noqa: E402
+from src.rag.retriever import Retriever  # noqa: E402
+from src.utils.fake_clients import FakeGeminiClient, FakeSupabaseClient, HashEmbeddingClient, Latency  # noqa: E402
+from src.utils.leaderboard import LeaderboardClient, Leaderboards  # noqa: E402
+from src.utils.single_flight import CoalescingStorage  # noqa: E402
+
+LABELS_FILE = "data/eval/router_queries.jsonl"
+
+# router_queries.jsonl chi co 1 cau table == "both"; them cac cau "both" cho moi strategy
+BOTH_QUERIES = [
+    {"query": "Which team does Messi play for and where is their stadium?", "strategy": "semantic",
+     "table": "both", "filters": {},
+     "sub_queries": {"players": "Which team does Messi play for?", "teams": "Where is Inter Miami's stadium?"}},
+    {"query": "Haaland đá cho đội nào và sân nhà của đội đó ở đâu?", "strategy": "semantic", "table": "both",
+     "filters": {}, "sub_queries": {"players": "Haaland đá cho đội nào?", "teams": "Sân nhà của Manchester City?"}},
+    {"query": "Brazilian forwards in La Liga and the history of their clubs", "strategy": "hybrid",
+     "table": "both", "filters": {"league": "La Liga", "nationality": "Brazil"},
+     "sub_queries": {"players": "Brazilian forwards in La Liga", "teams": "History of La Liga clubs"}},
+    {"query": "Cầu thủ và đội bóng ở Bundesliga", "strategy": "filters_only", "table": "both",
+     "filters": {"league": "Bundesliga"}, "sub_queries": None},
+]
+
+STAGES = ("cache", "route", "embed", "retrieve", "storage", "generate", "llm")
+
+
+class StageRecorder:
+    """Per-query stage timings (ms) and call counts, kept in a context variable.
+
+    Works for thread pools (one query per thread at a time) and asyncio (each task has its own
+    context; asyncio.to_thread / gather copy it, so nested work lands in the same sample).
+    """
+
+    def __init__(self) -> None:
+        self._sample: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("bench_sample", default=None)
+
+    def start(self) -> dict:
+        sample: dict = defaultdict(float)
+        self._sample.set(sample)
+        return sample
+
+    def add(self, stage: str, seconds: float) -> None:
+        sample = self._sample.get()
+        if sample is not None:
+            sample[stage] += seconds * 1000
+            sample[f"{stage}_calls"] += 1
+
+
+class Timed:
+    """Proxy that times every public method call of `target` as `stage`."""
+
+    def __init__(self, target: Any, stage: str, recorder: StageRecorder) -> None:
+        self._target = target
+        self._stage = stage
+        self._recorder = recorder
+
+    def _wrap(self, fn):
+        stage, recorder = self._stage, self._recorder
+        if asyncio.iscoroutinefunction(fn):
+            async def acall(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    recorder.add(stage, time.perf_counter() - t0)
+            return acall
+
+        def call(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.add(stage, time.perf_counter() - t0)
+        return call
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not inspect.isroutine(attr):
+            return attr  # thuoc tinh / client con (vd. retriever.supabase) tra ve nguyen
+        return self._wrap(attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._wrap(self._target)(*args, **kwargs)
+
+
+def load_mix(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        labels = [json.loads(line) for line in f if line.strip()]
+    seen = {r["query"] for r in labels}
+    labels += [r for r in BOTH_QUERIES if r["query"] not in seen]
+    for row in labels:
+        row["group"] = row["strategy"] + ("+both" if row.get("table") == "both" else "")
+    return labels
+
+
+def build(args, recorder: StageRecorder, mix: list[dict]):
+    if args.embedder == "local":
+        from src.utils.embedding_client import LocalEmbeddingClient
+        embedder = LocalEmbeddingClient(cache_dir="data/cache/embeddings")
+    else:
+        embedder = HashEmbeddingClient()
+
+    t0 = time.perf_counter()
+    # nap du lieu truoc khi bat latency; cosine cua hash embedding thap -> khong loc theo nguong
+    fake_supabase = FakeSupabaseClient.from_data_dir(
+        embedder, match_threshold=0.3 if args.embedder == "local" else -1.0,
+    )
+    load_s = time.perf_counter() - t0
+    if args.embedder == "hash":
+        embedder.latency = Latency(args.embed_ms, args.embed_jitter_ms, seed=args.seed)
+    fake_supabase.latency = Latency(args.supabase_ms, args.supabase_jitter_ms, seed=args.seed + 1)
+    fake_gemini = FakeGeminiClient(
+        routes={r["query"]: r for r in mix},
+        latency=Latency(args.llm_ms, args.llm_jitter_ms, seed=args.seed + 2),
+        token_ms=args.token_ms,
+    )
+
+    storage: Any = fake_supabase
+    if not args.no_leaderboards:
+        storage = LeaderboardClient(storage, Leaderboards.from_data_dir("data"))
+    storage = CoalescingStorage(storage)  # nhu build_storage()
+
+    embedding = Timed(embedder, "embed", recorder)
+    gemini = Timed(fake_gemini, "llm", recorder)
+    pipeline = RAGPipeline(
+        retriever=Timed(Retriever(Timed(storage, "storage", recorder), gemini, embedding), "retrieve", recorder),
+        generator=Timed(ResponseGenerator(gemini), "generate", recorder),
+        query_processor=Timed(
+            QueryProcessor(gemini, embedding, fast_router=None if args.llm_router else FastRouter.from_data_dir("data")),
+            "route", recorder,
+        ),
+        # khong snapshot: khong dung / ghi data/cache/answer_cache.json
+        answer_cache=Timed(SemanticAnswerCache(embedding), "cache", recorder) if args.answer_cache else None,
+    )
+    return pipeline, fake_supabase, fake_gemini, load_s
+
+
+def _outcome(row: dict, sample: dict, started: float, result: Optional[dict], error: Optional[Exception]) -> dict:
+    sample["e2e"] = (time.perf_counter() - started) * 1000
+    result = result or {}
+    return {"group": row["group"], "query": row["query"], "sample": dict(sample),
+            "docs": len(result.get("context") or []), "strategy": result.get("strategy"),
+            "cache_hit": bool(result.get("cache_hit")), "error": f"{type(error).__name__}: {error}" if error else None}
+
+
+def run_query(pipeline: RAGPipeline, recorder: StageRecorder, row: dict) -> dict:
+    sample = recorder.start()
+    t0 = time.perf_counter()
+    try:
+        result = pipeline(row["query"])
+    except Exception as e:  # vd. route RANKING thieu sort_field: dem loi, khong dung benchmark
+        return _outcome(row, sample, t0, None, e)
+    return _outcome(row, sample, t0, result, None)
+
+
+async def arun_query(pipeline: RAGPipeline, recorder: StageRecorder, row: dict, sem: asyncio.Semaphore) -> dict:
+    async with sem:
+        sample = recorder.start()
+        t0 = time.perf_counter()
+        try:
+            result = await pipeline.acall(row["query"])
+        except Exception as e:
+            return _outcome(row, sample, t0, None, e)
+    return _outcome(row, sample, t0, result, None)
+
+
+def run_rounds(pipeline, recorder, queries: list[dict], mode: str, concurrency: int) -> list[dict]:
+    if mode == "async":
+        async def main():
+            sem = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(arun_query(pipeline, recorder, row, sem) for row in queries))
+        return asyncio.run(main())
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda row: run_query(pipeline, recorder, row), queries))
+
+
+def measure_allocations(pipeline, recorder, mix: list[dict]) -> dict[str, list[dict]]:
+    # 1 lan / cau, tuan tu: tracemalloc lam cham nen khong chay chung voi pass do latency
+    out: dict[str, list[dict]] = defaultdict(list)
+    tracemalloc.start()
+    try:
+        for row in mix:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            run_query(pipeline, recorder, row)
+            current, peak = tracemalloc.get_traced_memory()
+            out[row["group"]].append({"peak_kb": (peak - base) / 1024, "retained_kb": (current - base) / 1024})
+    finally:
+        tracemalloc.stop()
+    return out
+
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"n": 0}
+    arr = np.asarray(values, dtype=np.float64)
+    return {
+        "n": len(values),
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def summarize_runs(runs: list[dict]) -> dict:
+    errors = [r for r in runs if r["error"]]
+    runs = [r for r in runs if not r["error"]]  # latency chi tinh cau tra loi thanh cong
+    stages = {s: summarize([r["sample"][s] for r in runs if s in r["sample"]]) for s in STAGES}
+    return {
+        "queries": len(runs),
+        "errors": len(errors),
+        "error_samples": sorted({f"{r['query']!r}: {r['error']}" for r in errors})[:5],
+        "end_to_end_ms": summarize([r["sample"]["e2e"] for r in runs]),
+        "stages_ms": {s: v for s, v in stages.items() if v["n"]},
+        "llm_calls_per_query": round(sum(r["sample"].get("llm_calls", 0) for r in runs) / max(1, len(runs)), 3),
+        "storage_calls_per_query": round(sum(r["sample"].get("storage_calls", 0) for r in runs) / max(1, len(runs)), 3),
+        "docs_mean": round(sum(r["docs"] for r in runs) / max(1, len(runs)), 2),
+        "cache_hits": sum(r["cache_hit"] for r in runs),
+        "routed_strategies": dict(sorted(_count(r["strategy"] for r in runs).items())),
+    }
+
+
+def _count(values) -> dict:
+    out: dict = defaultdict(int)
+    for v in values:
+        out[str(v)] += 1
+    return out
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nvs baseline {baseline['meta'].get('commit')} ({baseline_path}):")
+    rows = [("overall", baseline["overall"], report["overall"])]
+    rows += [(g, baseline["groups"][g], report["groups"][g]) for g in report["groups"] if g in baseline["groups"]]
+    for name, old, new in rows:
+        parts = []
+        for q in ("p50", "p95", "p99"):
+            a, b = old["end_to_end_ms"].get(q), new["end_to_end_ms"].get(q)
+            if a:
+                parts.append(f"{q} {a:.1f} -> {b:.1f} ms ({(b - a) / a * 100:+.1f}%)")
+        print(f"  {name:<20s} " + "  ".join(parts))
+    old_qps, new_qps = baseline.get("throughput_qps"), report["throughput_qps"]
+    if old_qps:
+        print(f"  throughput {old_qps:.2f} -> {new_qps:.2f} q/s ({(new_qps - old_qps) / old_qps * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", default=LABELS_FILE)
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync", help="pipeline(q) or pipeline.acall(q)")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=3, help="timed passes over the query mix")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed passes first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedder", choices=("hash", "local"), default="hash",
+                        help="hash: no model, --embed-ms per call; local: the real sentence-transformers model")
+    parser.add_argument("--embed-ms", type=float, default=15.0)
+    parser.add_argument("--embed-jitter-ms", type=float, default=3.0)
+    parser.add_argument("--supabase-ms", type=float, default=40.0)
+    parser.add_argument("--supabase-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--llm-ms", type=float, default=400.0, help="per LLM call (time to first token)")
+    parser.add_argument("--llm-jitter-ms", type=float, default=150.0)
+    parser.add_argument("--token-ms", type=float, default=5.0, help="per generated answer token")
+    parser.add_argument("--llm-router", action="store_true", help="no FastRouter: every query routed by the LLM")
+    parser.add_argument("--no-leaderboards", action="store_true", help="RANKING via the ranking RPC")
+    parser.add_argument("--answer-cache", action="store_true", help="enable the semantic answer cache (in memory)")
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--out", default=None, help="default: data/cache/bench_pipeline_<commit>.json")
+    parser.add_argument("--baseline", help="earlier --out file to compare against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    recorder = StageRecorder()
+    mix = load_mix(args.labels)
+    pipeline, fake_supabase, fake_gemini, load_s = build(args, recorder, mix)
+    print(f"Loaded data/ into in-memory SQLite in {load_s:.1f}s; {len(mix)} queries in the mix")
+
+    for _ in range(args.warmup):
+        run_rounds(pipeline, recorder, mix, args.mode, args.concurrency)
+
+    llm_before = fake_gemini.stats()["calls"]
+    storage_before = {name: v["calls"] for name, v in fake_supabase.stats().items()}
+    queries = mix * args.rounds
+    t0 = time.perf_counter()
+    runs = run_rounds(pipeline, recorder, queries, args.mode, args.concurrency)
+    wall_s = time.perf_counter() - t0
+    # chi tinh pass do latency (khong tinh warmup / pass allocations)
+    llm_by_kind = {k: v - llm_before.get(k, 0) for k, v in fake_gemini.stats()["calls"].items()}
+    storage_by_rpc = {name: v["calls"] - storage_before.get(name, 0) for name, v in fake_supabase.stats().items()}
+    llm_calls = sum(llm_by_kind.values())
+    storage_calls = sum(storage_by_rpc.values())
+
+    by_group: dict[str, list[dict]] = defaultdict(list)
+    for run in runs:
+        by_group[run["group"]].append(run)
+    groups = {g: summarize_runs(rs) for g, rs in sorted(by_group.items())}
+
+    if not args.no_alloc:
+        for group, allocs in measure_allocations(pipeline, recorder, mix).items():
+            groups[group]["allocations_kb"] = {
+                "peak": summarize([a["peak_kb"] for a in allocs]),
+                "retained": summarize([a["retained_kb"] for a in allocs]),
+            }
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+            "data_load_s": round(load_s, 2),
+            "note": "stages are inclusive; embed/storage/llm are nested in route/retrieve/generate",
+        },
+        "wall_s": round(wall_s, 3),
+        "throughput_qps": round(len(runs) / wall_s, 3),
+        "llm_calls": {"executed": llm_calls, "per_query": round(llm_calls / len(runs), 3), "by_kind": llm_by_kind},
+        "storage_calls": {"executed": storage_calls, "by_rpc": storage_by_rpc},
+        "coalescing": pipeline.coalescing_stats(),
+        "overall": summarize_runs(runs),
+        "groups": groups,
+    }
+
+    overall = report["overall"]["end_to_end_ms"]
+    print(f"{len(runs)} queries in {wall_s:.2f}s ({report['throughput_qps']:.2f} q/s, mode={args.mode}, "
+          f"concurrency={args.concurrency})")
+    print(f"end-to-end p50={overall['p50']:.1f} p95={overall['p95']:.1f} p99={overall['p99']:.1f} ms; "
+          f"LLM calls {llm_calls} ({report['llm_calls']['per_query']:.2f}/query), storage calls {storage_calls}")
+    errors = report["overall"]["errors"]
+    if errors:
+        print(f"{errors} queries failed (excluded from latency): {report['overall']['error_samples']}")
+    print(f"\n{'group':<20s}{'n':>5s}{'p50':>9s}{'p95':>9s}{'p99':>9s}{'llm/q':>7s}{'docs':>6s}{'peak KB':>9s}")
+    for group, summary in groups.items():
+        e2e = summary["end_to_end_ms"]
+        peak = summary.get("allocations_kb", {}).get("peak", {}).get("p50")
+        print(f"{group:<20s}{summary['queries']:>5d}{e2e['p50']:>9.1f}{e2e['p95']:>9.1f}{e2e['p99']:>9.1f}"
+              f"{summary['llm_calls_per_query']:>7.2f}{summary['docs_mean']:>6.1f}"
+              f"{peak if peak is not None else float('nan'):>9.1f}")
+    print(f"\n{'stage':<20s}{'n':>7s}{'p50':>9s}{'p95':>9s}{'p99':>9s}")
+    for stage, s in report["overall"]["stages_ms"].items():
+        print(f"{stage:<20s}{s['n']:>7d}{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}")
+
+    out = args.out or f"data/cache/bench_pipeline_{commit}.json"
+    Path(out).parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {out}")
+
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark QuantizedIndex (int8 / PQ) against exact float32 search.
+
+Reports memory per row, compression ratio, recall@k and query latency, with and
+without the full-precision re-rank stage.
+
+Usage (from repo root):
+    python scripts_addon/bench_quantized.py --n 30000
+    python scripts_addon/bench_quantized.py --real data/players/players_with_embeddings.jsonl
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts_addon.bench_ann import id_key, real, synthetic  # noqa: E402
+from src.utils.quantized_index import QuantizedIndex  # noqa: E402
+from src.utils.vector_index import VectorIndex  # noqa: E402
+
+
+def measure(index, queries, k: int, truth=None, **search_kwargs):
+    lat, recall, results = [], [], []
+    key = id_key(index.rows)
+    for i, q in enumerate(queries):
+        t0 = time.perf_counter()
+        got = {r[key] for r in index.search(q, k, -1.0, **search_kwargs)}
+        lat.append((time.perf_counter() - t0) * 1000)
+        results.append(got)
+        if truth is not None:
+            recall.append(len(got & truth[i]) / max(1, len(truth[i])))
+    return results, statistics.median(lat), float(np.percentile(lat, 95)), float(np.mean(recall)) if recall else 1.0
+
+
+def run(name: str, rows, matrix, queries, k: int, pq_m: int, rerank_factors):
+    print(f"\n=== {name}: n={len(rows)} dim={matrix.shape[1]} k={k} ===")
+    exact = VectorIndex.from_matrix(rows, matrix)
+    truth, p50, p95, _ = measure(exact, queries, k)
+    print(f"{'exact float32':<22} {matrix.shape[1] * 4:>6} B/row   1.0x  p50={p50:.2f} ms  p95={p95:.2f} ms")
+
+    for mode in ("int8", "pq"):
+        t0 = time.perf_counter()
+        index = QuantizedIndex.from_matrix(rows, matrix, mode=mode, pq_m=pq_m)
+        build = time.perf_counter() - t0
+        mem = index.memory_bytes()
+        per_row = mem["codes"] / len(rows)
+        print(f"{mode} build {build * 1000:.0f} ms")
+        for factor in rerank_factors:
+            _, p50, p95, recall = measure(index, queries, k, truth, rerank_factor=factor)
+            label = f"{mode} rerank x{factor}" if factor else f"{mode} no rerank"
+            print(f"{label:<22} {per_row:>6.0f} B/row {mem['compression']:>5.1f}x  "
+                  f"p50={p50:.2f} ms  p95={p95:.2f} ms  recall@{k}={recall:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=30000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", type=int, default=96)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 4, 10])
+    parser.add_argument("--real", help="JSONL rows with an 'embedding' column (e.g. an export of the players table)")
+    args = parser.parse_args()
+
+    rows, matrix, queries = synthetic(args.n, args.dim)
+    run("synthetic", rows, matrix, queries, args.k, args.pq_m, args.rerank)
+    if args.real:
+        rows, matrix, queries = real(args.real)
+        run("real", rows, matrix, queries, args.k, args.pq_m, args.rerank)
+
+
+if __name__ == "__main__":
+    main()
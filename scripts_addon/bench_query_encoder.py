@@ -0,0 +1,121 @@
+"""Parity and speed of the quantized query encoder (LocalEmbeddingClient(quantize=True)).
+
+Documents are embedded with the fp32 model (as stored in the DB). Each query encoder
+variant is then compared with fp32 on:
+  cosine   - cosine(query vector, fp32 query vector), mean / min over the query set
+  overlap  - |top-k(variant) & top-k(fp32)| / k over player + team documents
+  latency  - single-query encode p50 / p95 (ms, cache bypassed)
+  size     - serialized model weights (MB) and RSS growth after loading (MB)
+
+Usage (from repo root):
+    python scripts_addon/bench_query_encoder.py --docs 3000 --k 10
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.embedding_client import LocalEmbeddingClient  # noqa: E402
+from src.utils.ingest import csv_player_entity, gen_team_bio, iter_raw_records, make_player_document  # noqa: E402
+
+VARIANTS = [("int8", True, None), ("int8-seq64", True, 64), ("fp32-seq64", False, 64)]
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def model_mb(model) -> float:
+    import torch
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell() / 1e6
+
+
+def load_documents(players_csv: str, teams_jsonl: str, n: int) -> list[str]:
+    docs = [make_player_document(csv_player_entity(row)) for _, row in iter_raw_records(players_csv)][:n]
+    docs += [gen_team_bio(json.loads(line)) for _, line in iter_raw_records(teams_jsonl)]
+    return docs
+
+
+def encode_queries(client: LocalEmbeddingClient, queries: list[str]) -> tuple[np.ndarray, list[float]]:
+    vectors, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        vectors.append(client.model.encode(q))  # bo qua cache: do thoi gian encode that
+        latencies.append((time.perf_counter() - t0) * 1000)
+    out = np.asarray(vectors, dtype=np.float32)
+    return out / np.linalg.norm(out, axis=1, keepdims=True), latencies
+
+
+def top_k(queries: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", default="data/players/players_data-2024_2025.csv")
+    parser.add_argument("--teams", default="data/teams/team_complete_metadata_for_supabase.jsonl")
+    parser.add_argument("--queries", default="data/eval/router_queries.jsonl")
+    parser.add_argument("--docs", type=int, default=3000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = [json.loads(line)["query"] for line in f if line.strip()]
+    docs = load_documents(args.players, args.teams, args.docs)
+
+    rss0 = rss_mb()
+    fp32 = LocalEmbeddingClient(cache_dir="data/cache/embeddings")
+    fp32_rss = rss_mb() - rss0
+    doc_matrix = fp32.get_embeddings(docs, batch_size=64, normalize=True, as_numpy=True)
+    fp32.model.encode("warm up")
+    ref, ref_latency = encode_queries(fp32, queries)
+    ref_top = top_k(ref, doc_matrix, args.k)
+
+    print(f"{len(queries)} queries, {len(docs)} documents, k={args.k}")
+    print(f"{'encoder':12} {'cos mean':>9} {'cos min':>8} {'overlap@k':>10} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'speedup':>8} {'model MB':>9} {'RSS MB':>7}")
+    base_p50 = statistics.median(ref_latency)
+    print(f"{'fp32':12} {1.0:>9.4f} {1.0:>8.4f} {1.0:>10.3f} {base_p50:>7.1f} "
+          f"{percentile(ref_latency, 0.95):>7.1f} {1.0:>7.2f}x {model_mb(fp32.model):>9.0f} {fp32_rss:>7.0f}")
+
+    for name, quantize, max_seq_length in VARIANTS:
+        before = rss_mb()
+        client = LocalEmbeddingClient(quantize=quantize, max_seq_length=max_seq_length)
+        grown = rss_mb() - before
+        client.model.encode("warm up")
+        vectors, latency = encode_queries(client, queries)
+        cos = np.sum(vectors * ref, axis=1)
+        found = top_k(vectors, doc_matrix, args.k)
+        overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, ref_top)])
+        p50 = statistics.median(latency)
+        print(f"{name:12} {cos.mean():>9.4f} {cos.min():>8.4f} {overlap:>10.3f} {p50:>7.1f} "
+              f"{percentile(latency, 0.95):>7.1f} {base_p50 / p50:>7.2f}x {model_mb(client.model):>9.0f} {grown:>7.0f}")
+        del client
+    print(f"torch threads: {os.environ.get('OMP_NUM_THREADS', 'default')}")
+
+
+if __name__ == "__main__":
+    main()
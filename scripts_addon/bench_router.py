@@ -0,0 +1,112 @@
+"""Benchmark FastRouter against the labelled query set (and optionally the LLM router).
+
+Usage (from repo root):
+    python scripts_addon/bench_router.py
+    python scripts_addon/bench_router.py --llm   # also call Gemini, needs GEMINI_API_KEY
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.rag.fast_router import FastRouter  # noqa: E402
+
+LABELS_FILE = "data/eval/router_queries.jsonl"
+
+
+def load_labels(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def as_route(strategy, filters, sort_field, sort_order, table) -> dict:
+    return {
+        "strategy": strategy,
+        "filters": {k: v for k, v in (filters or {}).items() if v},
+        "sort": (sort_field, sort_order) if strategy == "ranking" else (None, None),
+        "table": table,
+    }
+
+
+def agreement(preds: list[dict], refs: list[dict]) -> dict:
+    n = len(refs) or 1
+    return {
+        "strategy": sum(p["strategy"] == r["strategy"] for p, r in zip(preds, refs)) / n,
+        "filters": sum(p["filters"] == r["filters"] for p, r in zip(preds, refs)) / n,
+        "sort": sum(p["sort"] == r["sort"] for p, r in zip(preds, refs)) / n,
+        "exact": sum(p == r for p, r in zip(preds, refs)) / n,
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", default=LABELS_FILE)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--llm", action="store_true", help="compare with the Gemini router")
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    refs = [as_route(r["strategy"], r["filters"], r["sort_field"], r["sort_order"], r["table"]) for r in labels]
+
+    t0 = time.perf_counter()
+    router = FastRouter.from_data_dir("data")
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    latencies_us = []
+    contexts = []
+    for row in labels:
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            ctx = router(row["query"])
+            latencies_us.append((time.perf_counter() - t0) * 1e6)
+        contexts.append(ctx)
+
+    preds = [as_route(c.strategy.value, c.filters, c.sort_field, c.sort_order, c.table) for c in contexts]
+    confident = [i for i, c in enumerate(contexts) if c.confidence >= args.threshold]
+
+    print(f"Gazetteer build: {build_ms:.1f} ms")
+    print(f"Router latency: p50={statistics.median(latencies_us):.1f} us  p95={percentile(latencies_us, 0.95):.1f} us")
+    print(f"Coverage (confidence >= {args.threshold}): {len(confident)}/{len(labels)}")
+    print("Agreement with labels (all):", agreement(preds, refs))
+    print("Agreement with labels (confident):",
+          agreement([preds[i] for i in confident], [refs[i] for i in confident]))
+
+    for i in confident:
+        if preds[i] != refs[i]:
+            print(f"  MISMATCH {labels[i]['query']!r}: {preds[i]} != {refs[i]}")
+
+    if args.llm:
+        from dotenv import load_dotenv
+        from src.utils.gemini_client import GeminiClient
+        from src.rag.query_processor import QueryProcessor
+
+        load_dotenv()
+        qp = QueryProcessor(GeminiClient(), embedding_client=None)
+        llm_preds, llm_ms = [], []
+        for row in labels:
+            t0 = time.perf_counter()
+            analysis = qp._analyze_query(row["query"])
+            llm_ms.append((time.perf_counter() - t0) * 1000)
+            sort = analysis.get("sort") or {}
+            llm_preds.append(as_route(
+                analysis.get("strategy"), analysis.get("filters"),
+                sort.get("field"), sort.get("order"), analysis.get("table"),
+            ))
+        print(f"LLM router latency: p50={statistics.median(llm_ms):.0f} ms  p95={percentile(llm_ms, 0.95):.0f} ms")
+        print("LLM agreement with labels:", agreement(llm_preds, refs))
+        print("Fast vs LLM (confident):",
+              agreement([preds[i] for i in confident], [llm_preds[i] for i in confident]))
+
+
+if __name__ == "__main__":
+    main()
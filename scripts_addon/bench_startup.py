@@ -0,0 +1,120 @@
+"""Startup cost breakdown: imports vs model load vs first query, eager vs lazy.
+
+Each mode runs in a fresh Python process so imports are cold:
+  eager - LocalEmbeddingClient() loads the model before the app can answer anything
+  lazy  - LocalEmbeddingClient(lazy=True) + warm_up() in a background thread; a RANKING
+          question is routed and retrieved while the model is still loading
+
+Usage (from repo root):
+    python scripts_addon/bench_startup.py
+    python scripts_addon/bench_startup.py --mode lazy
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+RANKING_QUERY = "Ai ghi nhiều bàn nhất EPL?"
+SEMANTIC_QUERY = "Cầu thủ chạy nhanh và sút tốt"
+
+
+def timed(out: dict, key: str, fn):
+    t0 = time.perf_counter()
+    value = fn()
+    out[key] = round((time.perf_counter() - t0) * 1000, 1)
+    return value
+
+
+def optional_import(name: str):
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+def child(mode: str) -> dict:
+    out: dict = {"mode": mode}
+    start = time.perf_counter()
+
+    def import_app():
+        import src.rag.rag_pipeline  # noqa: F401
+        import src.rag.fast_router  # noqa: F401
+        import src.utils.embedding_client  # noqa: F401
+        import src.utils.leaderboard  # noqa: F401
+
+    timed(out, "import_app_ms", import_app)
+    # thu vien nang: cac ban lazy chi import khi can
+    for name in ("google.generativeai", "supabase"):
+        if not timed(out, f"import_{name}_ms", lambda: optional_import(name)):
+            out[f"import_{name}_ms"] = None
+
+    from src.rag.fast_router import FastRouter
+    from src.rag.query_processor import QueryProcessor
+    from src.rag.retriever import Retriever
+    from src.utils.embedding_client import LocalEmbeddingClient
+    from src.utils.leaderboard import DEFAULT_SNAPSHOT, LeaderboardClient, Leaderboards
+
+    router = timed(out, "fast_router_build_ms", lambda: FastRouter.from_data_dir("data"))
+    boards = timed(out, "leaderboards_open_ms", lambda: Leaderboards.open(DEFAULT_SNAPSHOT))
+
+    if mode == "eager":
+        client = timed(out, "embedding_client_ms", LocalEmbeddingClient)
+    else:
+        client = timed(out, "embedding_client_ms", lambda: LocalEmbeddingClient(lazy=True))
+        client.warm_up(background=True)
+    out["app_ready_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    # cau hoi RANKING: khong can embedding (storage=None: phai tra loi tu leaderboard)
+    qp = QueryProcessor(gemini_client=None, embedding_client=client, fast_router=router)
+    retriever = Retriever(LeaderboardClient(None, boards), None, client)
+
+    def ranking():
+        ctx = qp(RANKING_QUERY)
+        return retriever.retrieve_ranking(query=RANKING_QUERY, filters=ctx.filters, sort_field=ctx.sort_field,
+                                          sort_order=ctx.sort_order, table=ctx.table)
+
+    out["model_ready_at_ranking"] = client.ready
+    docs = timed(out, "first_ranking_query_ms", ranking)
+    out["ranking_docs"] = len(docs)
+    out["first_ranking_since_start_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    timed(out, "first_semantic_encode_ms", lambda: client.get_embedding(SEMANTIC_QUERY))
+    timed(out, "second_semantic_encode_ms", lambda: client.get_embedding(SEMANTIC_QUERY + " ?"))
+    out["model_load_ms"] = round(client.load_seconds * 1000, 1) if client.load_seconds else None
+    out["warmup_encode_ms"] = round(client.warmup_seconds * 1000, 1) if client.warmup_seconds else None
+    out["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["eager", "lazy", "both"], default="both")
+    parser.add_argument("--child", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child)))
+        return
+
+    modes = ["eager", "lazy"] if args.mode == "both" else [args.mode]
+    results = []
+    for mode in modes:
+        proc = subprocess.run([sys.executable, __file__, "--child", mode], capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr)
+            raise SystemExit(f"{mode} run failed")
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    keys = [k for k in results[0] if k != "mode"]
+    print(f"{'':32}" + "".join(f"{r['mode']:>12}" for r in results))
+    for key in keys:
+        print(f"{key:32}" + "".join(f"{str(r.get(key)):>12}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
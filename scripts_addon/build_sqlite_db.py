@@ -0,0 +1,38 @@
+"""Build the local SQLite storage backend from the files under data/.
+
+Usage (from repo root):
+    python scripts_addon/build_sqlite_db.py --db data/football.db
+    python scripts_addon/build_sqlite_db.py --db data/football.db --embed   # also embed documents locally
+
+Then run the app with STORAGE_BACKEND=sqlite (and SQLITE_DB_PATH if not the default).
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.sqlite_client import DEFAULT_DB_PATH, SQLiteClient, load_data_dir  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--embed", action="store_true", help="embed rows without an embedding (LocalEmbeddingClient)")
+    args = parser.parse_args()
+
+    embedding_client = None
+    if args.embed:
+        from src.utils.embedding_client import LocalEmbeddingClient
+        embedding_client = LocalEmbeddingClient(cache_dir="data/cache/embeddings")
+
+    t0 = time.perf_counter()
+    client = SQLiteClient(args.db)
+    counts = load_data_dir(client, args.data_dir, embedding_client)
+    print(f"Loaded {counts} into {args.db} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Run the shared embedding daemon: one model per node, used by every app/api worker.
+
+Usage (from repo root):
+    python scripts_addon/embedding_server.py --socket /tmp/football-rag-embedding.sock
+    EMBEDDING_SERVER_SOCKET=/tmp/football-rag-embedding.sock uvicorn api:app --workers 8
+
+Workers then use EmbeddingServerClient instead of loading their own LocalEmbeddingClient
+(src/rag/factory.py). EMBEDDING_QUANTIZE / EMBEDDING_MAX_SEQ_LENGTH apply to the daemon.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.embedding_client import LocalEmbeddingClient  # noqa: E402
+from src.utils.embedding_server import DEFAULT_SOCKET, EmbeddingServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", default=os.environ.get("EMBEDDING_SERVER_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--cache-dir", default="data/cache/embeddings")
+    args = parser.parse_args()
+
+    client = LocalEmbeddingClient(
+        cache_dir=args.cache_dir,
+        lazy=True,
+        quantize=os.environ.get("EMBEDDING_QUANTIZE") == "1",
+        max_seq_length=int(os.environ["EMBEDDING_MAX_SEQ_LENGTH"]) if os.environ.get("EMBEDDING_MAX_SEQ_LENGTH") else None,
+    )
+    client.warm_up(background=True)  # socket mo ngay, ping bao ready khi model xong
+
+    server = EmbeddingServer(client, args.socket, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    print(f"Embedding server listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Batches: {server.embedder.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 import json
 import os
+import sys
+from pathlib import Path
 from typing import Dict, Any
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.utils.leaderboard import refresh_snapshot  # noqa: E402
+
 load_dotenv()
 
 def load_jsonl_file(file_path: str):
@@ -42,16 +47,19 @@ def prepare_record_for_upsert(player_data: Dict[str, Any]) -> Dict[str, Any]:
 
     return record
 
-def upsert_to_supabase(supabase_client: Client, records: list, table_name: str):
+def upsert_to_supabase(supabase_client: Client, records: list, table_name: str) -> list:
     batch_size = 100
+    upserted = []
     for i in range(0, len(records), batch_size):
         batch = records[i:i + batch_size]
 
         try:
             response = supabase_client.table(table_name).upsert(batch).execute()
+            upserted.extend(batch)
             print(f"Đã upsert thành công batch {i//batch_size + 1}, số lượng: {len(batch)}")
         except Exception as e:
             print(f"Lỗi khi upsert batch {i//batch_size + 1}: {str(e)}")
+    return upserted
 
 def main():
     url = os.environ.get("SUPABASE_URL")
@@ -77,7 +85,9 @@ def main():
     table_name = "players"
 
     print(f"Upserting {len(records_to_upsert)} records into table {table_name}...")
-    upsert_to_supabase(supabase, records_to_upsert, table_name)
+    upserted = upsert_to_supabase(supabase, records_to_upsert, table_name)
+    # cap nhat bang xep hang cho cac row vua upsert
+    refresh_snapshot(table_name, upserted)
 
     print("Data upsert process completed!")
 
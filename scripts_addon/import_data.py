@@ -1,8 +1,13 @@
 ﻿import json
 import os
+import sys
+from pathlib import Path
 from supabase import create_client
 from dotenv import load_dotenv, find_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.utils.leaderboard import refresh_snapshot  # noqa: E402
+
 load_dotenv(find_dotenv())
 
 supabase = create_client(
@@ -110,6 +115,7 @@ def insert_teams(filepath):
         batch = teams[i:i+100]
         supabase.table("teams").upsert(batch).execute()
         print(f"   {min(i+100, len(teams))}/{len(teams)}")
+    refresh_snapshot("teams", teams)
     
     print("Teams inserted!")
 
@@ -143,6 +149,7 @@ def insert_players(filepath):
         batch = players[i:i+100]
         supabase.table("players").upsert(batch).execute()
         print(f"   {min(i+100, len(players))}/{len(players)}")
+    refresh_snapshot("players", players)
     
     print("Players inserted!")
 
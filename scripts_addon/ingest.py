@@ -0,0 +1,137 @@
+"""Streaming ingestion: parse -> transform -> document -> embed -> upsert in one command.
+
+Replaces the one-off fill_players.py / import_data.py / update_*_embedding(s).py /
+upload_teams_to_supabase.py flow. Records are streamed through bounded queues, so the
+input never has to fit in memory; embedding overlaps the upload and batches are upserted
+by a pool of workers. Progress is checkpointed after every contiguous run of committed
+batches, so an interrupted run resumes where it stopped. Records that cannot be parsed or
+transformed are written to data/cache/ingest_<table>.rejects.jsonl instead of blocking it.
+
+A manifest (data/cache/embedding_manifest_<backend>_<target hash>.json, one per storage
+target) keeps a hash of each row's document and
+columns plus the embedding model: unchanged rows are skipped, rows whose document is
+unchanged are upserted without re-embedding, and rows missing from a complete run are
+deleted. Use --full to re-embed everything.
+
+Usage (from repo root):
+    python scripts_addon/ingest.py --table teams --input data/teams/team_complete_metadata_for_supabase.jsonl
+    python scripts_addon/ingest.py --table players --input data/players/players_data-2024_2025.csv \
+        --backend sqlite --embedder local --upsert-workers 2
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.ingest import EmbeddingManifest, StreamingIngestor  # noqa: E402
+from src.utils.leaderboard import DEFAULT_SNAPSHOT, Leaderboards  # noqa: E402
+
+
+def make_storage(backend: str, db_path: str):
+    if backend == "sqlite":
+        from src.utils.sqlite_client import SQLiteClient
+        return SQLiteClient(db_path)
+    from src.utils.supabase_client import SupabaseClient
+    return SupabaseClient()
+
+
+def storage_target(backend: str, db_path: str) -> str:
+    # manifest chi dung cho dung storage da ghi no (sqlite file khac / project Supabase khac)
+    if backend == "sqlite":
+        return f"sqlite:{os.path.abspath(db_path)}"
+    return f"supabase:{os.environ.get('SUPABASE_URL', '')}"
+
+
+def default_manifest_path(target: str) -> str:
+    backend = target.split(":", 1)[0]
+    digest = hashlib.sha1(target.encode("utf-8")).hexdigest()[:8]
+    return os.path.join("data", "cache", f"embedding_manifest_{backend}_{digest}.json")
+
+
+def make_embedder(name: str, workers: int = 0):
+    if name == "local" and workers > 1:
+        # nhieu process encode song song, khong load model trong process chinh; dung chung cache tren disk
+        from src.utils.embedding_client import LocalEmbeddingClient
+        return LocalEmbeddingClient(cache_dir="data/cache/embeddings", lazy=True).pool(workers)
+    if name == "local":
+        from src.utils.embedding_client import LocalEmbeddingClient
+        return LocalEmbeddingClient(cache_dir="data/cache/embeddings")
+    if name == "gemini":
+        from src.utils.gemini_client import GeminiClient
+        return GeminiClient()
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", choices=["players", "teams"], required=True)
+    parser.add_argument("--input", required=True, help="JSONL of entities, or the players CSV")
+    parser.add_argument("--backend", choices=["supabase", "sqlite"], default="supabase")
+    parser.add_argument("--db", default="data/football.db", help="SQLite path (--backend sqlite)")
+    parser.add_argument("--embedder", choices=["local", "gemini", "none"], default="local")
+    parser.add_argument("--embed-workers", type=int, default=0, help="local embedder: >1 uses a process pool")
+    parser.add_argument("--batch-size", type=int, default=100, help="rows per upsert")
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--upsert-workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=8, help="batches buffered between stages")
+    parser.add_argument("--checkpoint", default=None, help="default: data/cache/ingest_<table>.json")
+    parser.add_argument("--rejects", default=None, help="default: data/cache/ingest_<table>.rejects.jsonl")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from record 0")
+    parser.add_argument("--manifest", default=None, help="default: data/cache/embedding_manifest_<backend>_<hash>.json")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest: re-embed and upsert every row")
+    parser.add_argument("--no-leaderboards", action="store_true", help="do not refresh the leaderboard snapshot")
+    args = parser.parse_args()
+
+    storage = make_storage(args.backend, args.db)
+    target = storage_target(args.backend, args.db)
+    embedder = make_embedder(args.embedder, args.embed_workers)
+
+    on_upserted = on_deleted = None
+    boards = None
+    if not args.no_leaderboards:
+        boards = Leaderboards.open(DEFAULT_SNAPSHOT)
+        boards_lock = threading.Lock()
+
+        def on_upserted(table, rows):
+            with boards_lock:
+                boards.upsert(table, rows)
+
+        def on_deleted(table, ids):
+            with boards_lock:
+                boards.delete(table, ids)
+
+    ingestor = StreamingIngestor(
+        args.table,
+        storage,
+        embedding_client=embedder,
+        batch_size=args.batch_size,
+        embed_batch_size=args.embed_batch_size,
+        upsert_workers=args.upsert_workers,
+        queue_size=args.queue_size,
+        checkpoint_path=args.checkpoint or os.path.join("data", "cache", f"ingest_{args.table}.json"),
+        reject_path=args.rejects or os.path.join("data", "cache", f"ingest_{args.table}.rejects.jsonl"),
+        on_upserted=on_upserted,
+        on_deleted=on_deleted,
+        manifest=None if args.full else EmbeddingManifest(args.manifest or default_manifest_path(target), target),
+    )
+    report = ingestor.run(args.input, resume=not args.restart)
+    if boards is not None:
+        boards.save(DEFAULT_SNAPSHOT)
+    if hasattr(embedder, "close"):
+        embedder.close()
+
+    print(json.dumps(report, indent=2))
+    failed = report["stages"]["embed"]["errors"] + report["stages"]["upsert"]["errors"]
+    if failed:
+        print(f"⚠️ {failed} records failed; re-run the same command to retry from record {report['records_done']}")
+    if report["rejected"]:
+        print(f"⚠️ {report['rejected']} records could not be parsed/transformed, see {report['reject_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+-- One round trip for the "both" branches of Retriever (SupabaseClient.search_vectors_multi).
+-- Wraps the existing match_players / match_teams functions and returns
+-- {"players": [...], "teams": [...]}.
+-- Run once in the Supabase SQL editor; the client falls back to two parallel RPCs until it exists.
+
+create or replace function match_players_and_teams(
+  players_embedding vector(768),
+  teams_embedding vector(768),
+  match_count int default 5,
+  match_threshold float default 0.3,
+  filter jsonb default '{}'::jsonb
+)
+returns jsonb
+language sql
+stable
+as $$
+  select jsonb_build_object(
+    'players', coalesce((
+      select jsonb_agg(to_jsonb(p))
+      from match_players(
+        query_embedding => players_embedding,
+        match_count => match_count,
+        match_threshold => match_threshold,
+        filter => filter
+      ) p
+    ), '[]'::jsonb),
+    'teams', coalesce((
+      select jsonb_agg(to_jsonb(t))
+      from match_teams(
+        query_embedding => teams_embedding,
+        match_count => match_count,
+        match_threshold => match_threshold,
+        filter => filter
+      ) t
+    ), '[]'::jsonb)
+  );
+$$;
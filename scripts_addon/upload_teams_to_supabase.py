@@ -1,11 +1,13 @@
 import json
 import os
+import time
 from pathlib import Path
 from src.utils.supabase_client import create_client, Client
 import dotenv
 from src.utils.gemini_client import GeminiClient
+from src.utils.leaderboard import refresh_snapshot
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -16,7 +18,9 @@ gemini = GeminiClient()
 dotenv.load_dotenv()
 
 BATCH_SIZE = 100
-EMBEDDING_BATCH_SIZE = 10
+EMBEDDING_BATCH_SIZE = 100  # gioi han batchEmbedContents
+EMBEDDING_RETRIES = 3
+REJECT_PATH = "data/cache/upload_teams.rejects.jsonl"  # doi nao khong embed duoc, chay lai de thu
 
 
 def gen_team_bio(team_data: dict) -> str:
@@ -62,16 +66,24 @@ def prepare_before_upsert(team_data: dict) -> dict:
     }
 
 
-def generate_embeddings_batch(team_bios: List[str]) -> List[List[float]]:
-    embeddings = []
-    for bio in team_bios:
+def generate_embeddings_batch(team_bios: List[str]) -> Optional[List[List[float]]]:
+    # loi -> thu lai ca batch; van loi thi tra None (khong upsert vector 0: cosine cua no vo nghia)
+    for attempt in range(EMBEDDING_RETRIES):
         try:
-            embedding = gemini.get_embedding(bio)
-            embeddings.append(embedding)
+            return gemini.get_embeddings(team_bios, batch_size=EMBEDDING_BATCH_SIZE)
         except Exception as e:
-            logger.error(f"Error generating embedding: {str(e)}")
-            embeddings.append([0.0] * 768)
-    return embeddings
+            logger.error(f"Error generating embeddings batch (attempt {attempt + 1}/{EMBEDDING_RETRIES}): {str(e)}")
+            if attempt < EMBEDDING_RETRIES - 1:
+                time.sleep(2 ** attempt)
+    return None
+
+
+def write_rejects(rows: List[Dict[str, Any]], path: str = REJECT_PATH) -> None:
+    # giong reject file cua StreamingIngestor: 1 dong JSON moi record bi bo qua
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
 
 
 def upsert_to_supabase(
@@ -79,18 +91,21 @@ def upsert_to_supabase(
     records: list,
     table_name: str,
     batch_size: int = BATCH_SIZE,
-):
+) -> list:
 
+    upserted = []
     for i in range(0, len(records), batch_size):
         batch = records[i : i + batch_size]
 
         try:
             response = supabase_client.table(table_name).upsert(batch).execute()
+            upserted.extend(batch)
             logger.info(
                 f"Successfully upserted batch {i//batch_size + 1}, count: {len(batch)}"
             )
         except Exception as e:
             logger.error(f"Error upserting batch {i//batch_size + 1}: {str(e)}")
+    return upserted
 
 
 def main():
@@ -116,13 +131,19 @@ def main():
         bio_batch = team_bios[i : i + EMBEDDING_BATCH_SIZE]
         logger.info(f"Processing embedding batch {i//EMBEDDING_BATCH_SIZE + 1}")
         embeddings_batch = generate_embeddings_batch(bio_batch)
-        all_embeddings.extend(embeddings_batch)
+        all_embeddings.extend(embeddings_batch or [None] * len(bio_batch))
 
-    teams_data = []
+    teams_data, rejected = [], []
     for i, raw_team in enumerate(raw_teams):
         prepared = prepare_before_upsert(raw_team)
+        if not all_embeddings[i]:
+            rejected.append({"index": i, "stage": "embed", "error": "embedding failed", "input": raw_team})
+            continue
         prepared["embedding"] = all_embeddings[i]
         teams_data.append(prepared)
+    if rejected:
+        write_rejects(rejected)
+        logger.error(f"{len(rejected)} teams skipped (embedding failed), see {REJECT_PATH}")
 
     supabase_url = os.environ.get("SUPABASE_URL")
     supabase_key = os.environ.get("SUPABASE_KEY")
@@ -135,13 +156,12 @@ def main():
 
     logger.info("Starting upsert to Supabase...")
     try:
-        upsert_to_supabase(supabase, teams_data, "teams")
+        upserted = upsert_to_supabase(supabase, teams_data, "teams")
+        refresh_snapshot("teams", upserted)
     except Exception as e:
         logger.error(f"Error during upsert operation: {str(e)}")
         raise
     finally:
-        import time
-
         time.sleep(1)
 
     logger.info("Upsert completed")
@@ -0,0 +1,254 @@
+from __future__ import annotations
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.rag.types import Strategy
+
+# chi cac route nay can embedding de so cau hoi gan giong; RANKING/FILTERS_ONLY chi khop exact
+SEMANTIC_STRATEGIES = (Strategy.SEMANTIC, Strategy.HYBRID)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SemanticAnswerCache:
+    # cache cau tra loi theo cosine similarity cua query embedding (LRU + TTL)
+    # route (QueryContext cua FastRouter, pipeline route 1 lan roi truyen vao lookup/store):
+    # cau hoi gan giong nhung khac giai / khac chieu sort ("youngest" vs "oldest La Liga player")
+    # co cosine > threshold -> chi khop khi cung route
+
+    def __init__(
+        self,
+        embedding_client: Any,
+        threshold: float = 0.92,
+        max_size: int = 512,
+        ttl_seconds: float = 6 * 3600,
+        snapshot_path: Optional[str] = None,
+        snapshot_every: int = 10,
+    ) -> None:
+        self.embedding_client = embedding_client
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # key -> entry, cu nhat o dau
+        self._matrix: Optional[np.ndarray] = None  # (max_size, dim), moi hang da chuan hoa
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self._dirty = 0
+
+        if snapshot_path:
+            self._load_snapshot()
+            atexit.register(self.save_snapshot)
+
+    def _ensure_matrix(self, dim: int) -> None:
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_size, dim), dtype=np.float32)
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        if entry["slot"] is not None:
+            self._free_slots.append(entry["slot"])
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [k for k, e in self._entries.items() if self._is_expired(e, now)]
+        for key in expired:
+            self._remove(key)
+
+    @staticmethod
+    def _route_key(route: Any) -> Optional[str]:
+        if route is None:
+            return None
+        filters = sorted((k, str(v).lower()) for k, v in (route.filters or {}).items() if v)
+        return json.dumps([route.strategy.value, route.table, filters, route.sort_field, route.sort_order],
+                          ensure_ascii=False)
+
+    @staticmethod
+    def needs_embedding(route: Any) -> bool:
+        return route is None or route.strategy in SEMANTIC_STRATEGIES
+
+    def lookup(self, query: str, route: Any = None) -> Tuple[Optional[Dict[str, Any]], Optional[list]]:
+        """Return (cached result or None, query embedding) - embedding is reused on a miss.
+
+        Only SEMANTIC/HYBRID routes (or no route) are embedded and matched by similarity;
+        other routes only hit on the same normalized text.
+        """
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_expired(entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["result"], None
+
+        if not self.needs_embedding(route) or not getattr(self.embedding_client, "ready", True):
+            # RANKING/FILTERS_ONLY khong can vector; model dang load: chi khop exact
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        embedding = self.embedding_client.get_embedding(query)
+        if not embedding:
+            with self._lock:
+                self.misses += 1
+            return None, embedding
+
+        vec = np.asarray(embedding, dtype=np.float32)
+        vec = vec / (np.linalg.norm(vec) or 1.0)
+        route_key = self._route_key(route)
+
+        with self._lock:
+            self._evict_expired(now)
+            if self._matrix is not None and self._entries and self._matrix.shape[1] == vec.shape[0]:
+                keys = [k for k, e in self._entries.items() if e["slot"] is not None and e.get("route") == route_key]
+            else:
+                keys = []
+            if keys:
+                slots = np.fromiter((self._entries[k]["slot"] for k in keys), dtype=np.int64, count=len(keys))
+                sims = self._matrix[slots] @ vec
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]]["result"], embedding
+            self.misses += 1
+        return None, embedding
+
+    def store(self, query: str, embedding: Optional[list], result: Dict[str, Any], route: Any = None) -> None:
+        # khong cache cau tra loi tu context rong / loi storage: lan sau co the co du lieu
+        if not result.get("answer") or not result.get("context") or result.get("error"):
+            return
+        key = normalize_query(query)
+        route_key = self._route_key(route)
+        vec = None
+        if embedding:  # khong co embedding (RANKING/FILTERS_ONLY) -> chi khop exact
+            vec = np.asarray(embedding, dtype=np.float32)
+            vec = vec / (np.linalg.norm(vec) or 1.0)
+
+        # bo embedding cua doc di cho nhe cache/snapshot
+        result = dict(result)
+        result["context"] = [
+            {k: v for k, v in doc.items() if k != "embedding"} for doc in result.get("context") or []
+        ]
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if len(self._entries) >= self.max_size or (vec is not None and not self._free_slots):
+                self._evict_expired(time.time())
+            while len(self._entries) >= self.max_size or (vec is not None and not self._free_slots):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+            slot = None
+            if vec is not None:
+                self._ensure_matrix(vec.shape[0])
+                slot = self._free_slots.pop()
+                self._matrix[slot] = vec
+            self._entries[key] = {
+                "slot": slot,
+                "query": query,
+                "route": route_key,
+                "result": result,
+                "created_at": time.time(),
+            }
+            self._dirty += 1
+            should_save = self.snapshot_path and self._dirty >= self.snapshot_every
+
+        if should_save:
+            self.save_snapshot()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._free_slots = list(range(self.max_size - 1, -1, -1))
+            self._dirty += 1
+
+    def save_snapshot(self) -> None:
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            entries = [
+                {
+                    "key": key,
+                    "query": e["query"],
+                    "route": e.get("route"),
+                    "embedding": self._matrix[e["slot"]].tolist() if e["slot"] is not None else None,
+                    "result": e["result"],
+                    "created_at": e["created_at"],
+                }
+                for key, e in self._entries.items()
+                if not self._is_expired(e, now)
+            ]
+            self._dirty = 0
+
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)  # ghi atomic
+
+    def _load_snapshot(self) -> None:
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ Answer cache snapshot unreadable: {e}. Starting empty.")
+            return
+
+        now = time.time()
+        for e in entries[-self.max_size:]:
+            if now - e["created_at"] > self.ttl_seconds:
+                continue
+            if e["key"] in self._entries:
+                self._remove(e["key"])  # key trung trong file: ban sau thay ban truoc, tra slot lai
+            slot = None
+            if e.get("embedding"):
+                if not self._free_slots:
+                    break
+                vec = np.asarray(e["embedding"], dtype=np.float32)
+                self._ensure_matrix(vec.shape[0])
+                slot = self._free_slots.pop()
+                self._matrix[slot] = vec
+            self._entries[e["key"]] = {
+                "slot": slot,
+                "query": e["query"],
+                "route": e.get("route"),
+                "result": e["result"],
+                "created_at": e["created_at"],
+            }
@@ -0,0 +1,164 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+from .types import Strategy
+
+# ten hien thi -> cac duong dan co the co trong row (cot phang hoac metadata JSON)
+PLAYER_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "name": ("name", "metadata.name"),
+    "club": ("metadata.current_club", "current_club"),
+    "league": ("current_league", "metadata.current_league"),
+    "nationality": ("nationality", "metadata.identity.nationality"),
+    "position": ("position", "metadata.identity.position"),
+    "birth_year": ("birth_year", "metadata.identity.birth_year"),
+    "age": ("age", "metadata.identity.age"),
+    "height_cm": ("metadata.identity.height_cm", "metadata.identity.height"),
+    "goals": ("metadata.season_stats.goals", "metadata.stats.goals"),
+    "assists": ("metadata.season_stats.assists", "metadata.stats.assists"),
+    "appearances": ("metadata.season_stats.matches", "metadata.stats.matches_played"),
+    "minutes": ("metadata.season_stats.minutes",),
+    "season": ("metadata.current_season",),
+    "similarity": ("similarity",),
+    "document": ("document", "metadata.biography"),
+}
+
+TEAM_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "name": ("metadata.identity.full_name", "name"),
+    "league": ("current_league", "metadata.current_league.name", "metadata.current_league"),
+    "country": ("country", "metadata.identity.country"),
+    "city": ("metadata.venue.city", "metadata.identity.city"),
+    "founded_year": ("founded_year", "metadata.identity.founded_year"),
+    "stadium": ("metadata.venue.stadium_name",),
+    "capacity": ("metadata.venue.capacity",),
+    "rank": ("metadata.season_stats.rank",),
+    "points": ("metadata.season_stats.points",),
+    "goals": ("metadata.season_stats.goals_for",),
+    "goals_against": ("metadata.season_stats.goals_against",),
+    "appearances": ("metadata.season_stats.played",),
+    "season": ("metadata.current_season",),
+    "similarity": ("similarity",),
+    "document": ("document",),
+}
+
+# sort_field cua router -> field hien thi
+SORT_FIELD_ALIASES = {"age": ("age", "birth_year"), "height": ("height_cm",)}
+
+BASE_PLAYER = ("name", "club", "league", "nationality", "position")
+BASE_TEAM = ("name", "league", "country", "city")
+
+STRATEGY_FIELDS = {
+    Strategy.RANKING: ((), ()),  # chi base + truong sort
+    Strategy.FILTERS_ONLY: (("birth_year", "goals", "assists", "appearances"), ("stadium", "founded_year", "rank", "points")),
+    Strategy.SEMANTIC: (("similarity", "document"), ("stadium", "capacity", "founded_year", "similarity", "document")),
+    Strategy.HYBRID: (("similarity", "document"), ("stadium", "capacity", "founded_year", "similarity", "document")),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 ky tu / token, du de canh budget, khong can tokenizer
+    return (len(text) + 3) // 4
+
+
+def get_path(doc: Dict[str, Any], path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def is_team(doc: Dict[str, Any]) -> bool:
+    return "team_id" in doc and "player_id" not in doc
+
+
+class ContextBuilder:
+    """Project each retrieved row onto the fields a strategy needs and keep the block under a token budget."""
+
+    def __init__(self, max_tokens: int = 1500, max_doc_chars: int = 600) -> None:
+        self.max_tokens = max_tokens
+        self.max_doc_chars = max_doc_chars  # gioi han cho truong text dai (document/bio)
+
+    def project(self, doc: Dict[str, Any], strategy: Optional[Strategy] = None,
+                sort_field: Optional[str] = None) -> Dict[str, Any]:
+        team = is_team(doc)
+        field_paths = TEAM_FIELDS if team else PLAYER_FIELDS
+        base = BASE_TEAM if team else BASE_PLAYER
+
+        if strategy is None:
+            wanted = list(field_paths)  # khong ro strategy -> lay het field da biet
+        else:
+            player_extra, team_extra = STRATEGY_FIELDS.get(strategy, ((), ()))
+            wanted = [*base, *(team_extra if team else player_extra)]
+        if sort_field:
+            wanted.extend(SORT_FIELD_ALIASES.get(sort_field, (sort_field,)))
+
+        projected: Dict[str, Any] = {}
+        for field in dict.fromkeys(wanted):
+            for path in field_paths.get(field, (field,)):
+                value = get_path(doc, path)
+                if value not in (None, "", [], {}):
+                    projected[field] = value
+                    break
+
+        if len(projected) <= 1:
+            # row khong theo schema quen thuoc -> giu cac cot don gian nhu truoc
+            for k, v in doc.items():
+                if k not in projected and k not in ("embedding", "metadata") and not isinstance(v, (dict, list)):
+                    projected[k] = v
+        return projected
+
+    def _format(self, idx: int, fields: Dict[str, Any]) -> str:
+        lines = [f"[Doc {idx}]"]
+        for k, v in fields.items():
+            if isinstance(v, float):
+                v = round(v, 3)
+            lines.append(f"{k}: {v}")
+        return "\n".join(lines)
+
+    def _truncate(self, fields: Dict[str, Any], max_chars: int) -> bool:
+        truncated = False
+        for k, v in fields.items():
+            if isinstance(v, str) and len(v) > max_chars:
+                fields[k] = v[:max_chars].rsplit(" ", 1)[0] + " ..."
+                truncated = True
+        return truncated
+
+    def build(self, docs: List[Dict[str, Any]], strategy: Optional[Strategy] = None,
+              sort_field: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """Return (context block, stats) - stats has tokens/chars/docs included/truncated."""
+        if not docs:
+            text = "No documents were retrieved from the database."
+            return text, {"context_tokens": estimate_tokens(text), "context_chars": len(text),
+                          "docs_total": 0, "docs_included": 0, "docs_truncated": 0}
+
+        blocks: List[str] = []
+        used_tokens = 0
+        truncated = 0
+        for i, doc in enumerate(docs):
+            fields = self.project(doc, strategy, sort_field)
+            doc_truncated = self._truncate(fields, self.max_doc_chars)
+            block = self._format(i + 1, fields)
+
+            remaining = self.max_tokens - used_tokens
+            if estimate_tokens(block) > remaining:
+                # thu cat ngan text dai them lan nua truoc khi bo doc
+                doc_truncated |= self._truncate(fields, max(80, remaining * 4 // 2))
+                block = self._format(i + 1, fields)
+                if estimate_tokens(block) > remaining:
+                    break
+            truncated += doc_truncated
+            blocks.append(block)
+            used_tokens += estimate_tokens(block) + 1
+
+        omitted = len(docs) - len(blocks)
+        if omitted:
+            blocks.append(f"[{omitted} more document(s) omitted to fit the context budget]")
+        text = "\n\n".join(blocks)
+        return text, {
+            "context_tokens": estimate_tokens(text),
+            "context_chars": len(text),
+            "docs_total": len(docs),
+            "docs_included": len(docs) - omitted,
+            "docs_truncated": truncated,
+        }
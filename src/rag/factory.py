@@ -0,0 +1,87 @@
+import os
+from typing import Any, Optional
+
+from src.utils.embedding_client import LocalEmbeddingClient
+from src.utils.vector_index import LocalVectorSearchClient
+from src.utils.leaderboard import DEFAULT_SNAPSHOT, LeaderboardClient, Leaderboards
+from src.utils.sqlite_client import DEFAULT_DB_PATH, SQLiteClient
+from src.utils.single_flight import CoalescingStorage
+from src.rag.retriever import Retriever
+from src.rag.generator import ResponseGenerator
+from src.rag.query_processor import QueryProcessor
+from src.rag.fast_router import FastRouter
+from src.rag.answer_cache import SemanticAnswerCache
+from src.rag.rag_pipeline import RAGPipeline
+
+# supabase/httpx, google.generativeai va torch chi import khi build (lazy)
+
+
+def build_storage() -> Any:
+    """Storage client from env: STORAGE_BACKEND, USE_LOCAL_VECTOR_INDEX, USE_LEADERBOARDS."""
+    backend = os.environ.get("STORAGE_BACKEND", "supabase")
+    if backend == "sqlite":
+        # file SQLite local (scripts_addon/build_sqlite_db.py), khong goi mang cho storage
+        storage = SQLiteClient(os.environ.get("SQLITE_DB_PATH", DEFAULT_DB_PATH))
+    else:
+        from src.utils.supabase_client import SupabaseClient
+        storage = SupabaseClient()
+        if os.environ.get("USE_LOCAL_VECTOR_INDEX") == "1":
+            # tai embedding 1 lan, search_vectors chay trong process thay vi goi RPC
+            # LOCAL_VECTOR_INDEX_TYPE: exact | ivf | int8 | pq
+            # ivf: luu index vao data/cache/ivf_index.<table>, lan khoi dong sau khong chay lai k-means
+            index_type = os.environ.get("LOCAL_VECTOR_INDEX_TYPE", "exact")
+            storage = LocalVectorSearchClient.from_supabase(
+                storage,
+                index_type=index_type,
+                index_kwargs={"cache_path": "data/cache/ivf_index"} if index_type == "ivf" else None,
+            )
+    # mac dinh chi bat voi sqlite (build tu chinh row trong DB); voi Supabase snapshot/CSV co the lech
+    # row ma RPC tra ve (ten, cot...) -> chi bat khi snapshot duoc ghi boi ingest.py tren cung DB
+    if os.environ.get("USE_LEADERBOARDS", "1" if backend == "sqlite" else "0") == "1":
+        # cau hoi RANKING tra loi tu bang xep hang materialize, khong can goi RPC
+        boards = Leaderboards.from_storage(storage) if backend == "sqlite" else Leaderboards.open(DEFAULT_SNAPSHOT)
+        storage = LeaderboardClient(storage, boards, snapshot_path=DEFAULT_SNAPSHOT)
+    # doc giong het dang chay (cung method + tham so) -> 1 lan goi storage
+    return CoalescingStorage(storage)
+
+
+def build_embedding_client() -> Any:
+    if os.environ.get("EMBEDDING_SERVER_SOCKET"):
+        # model nam trong daemon dung chung (scripts_addon/embedding_server.py), worker khong load model
+        from src.utils.embedding_server import EmbeddingServerClient
+        return EmbeddingServerClient(os.environ["EMBEDDING_SERVER_SOCKET"])
+    # model load trong thread nen; RANKING/FILTERS_ONLY tra loi duoc ngay,
+    # SEMANTIC/HYBRID cho den khi model san sang
+    # EMBEDDING_QUANTIZE=1: encoder int8 cho query (xem scripts_addon/bench_query_encoder.py)
+    embedding_client = LocalEmbeddingClient(
+        cache_dir="data/cache/embeddings",
+        lazy=True,
+        quantize=os.environ.get("EMBEDDING_QUANTIZE") == "1",
+        max_seq_length=int(os.environ["EMBEDDING_MAX_SEQ_LENGTH"]) if os.environ.get("EMBEDDING_MAX_SEQ_LENGTH") else None,
+    )
+    embedding_client.warm_up(background=True)
+    return embedding_client
+
+
+def build_rag_pipeline(embedding_client: Optional[Any] = None, gemini_client: Optional[Any] = None,
+                       storage: Optional[Any] = None) -> RAGPipeline:
+    """RAGPipeline wired the way app.py and api.py serve it; any client can be passed in."""
+    storage = storage if storage is not None else build_storage()
+    if gemini_client is None:
+        from src.utils.gemini_client import GeminiClient
+        gemini_client = GeminiClient()
+    embedding_client = embedding_client if embedding_client is not None else build_embedding_client()
+
+    return RAGPipeline(
+        retriever=Retriever(storage, gemini_client, embedding_client),
+        generator=ResponseGenerator(gemini_client),
+        query_processor=QueryProcessor(
+            gemini_client,
+            embedding_client,
+            fast_router=FastRouter.from_data_dir("data"),
+        ),
+        answer_cache=SemanticAnswerCache(
+            embedding_client,
+            snapshot_path="data/cache/answer_cache.json",
+        ),
+    )
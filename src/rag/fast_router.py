@@ -0,0 +1,239 @@
+from __future__ import annotations
+import csv
+import glob
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.rag.types import QueryContext, Strategy
+
+# (sort_field, sort_order, pattern) - thu tu quan trong, rule dau tien khop se thang
+SORT_RULES: List[Tuple[str, str, str]] = [
+    ("goals", "ASC", r"ít bàn|fewest goals|least goals"),
+    ("goals", "DESC", r"ghi (nhiều )?bàn|nhiều bàn|vua phá lưới|top (goal)?scorer|most goals|scored the most|scores the most"),
+    ("assists", "DESC", r"kiến tạo|assist"),
+    ("appearances", "ASC", r"ra sân ít|ít trận|fewest (appearances|matches|games)"),
+    ("appearances", "DESC", r"ra sân|nhiều trận|đá nhiều|most (appearances|matches|games)"),
+    ("age", "ASC", r"trẻ nhất|ít tuổi nhất|youngest"),
+    ("age", "DESC", r"già nhất|lớn tuổi nhất|nhiều tuổi nhất|oldest"),
+    ("height", "ASC", r"thấp nhất|lùn nhất|shortest"),
+    ("height", "DESC", r"cao nhất|tallest"),
+    # bang teams: suc chua san (metadata.venue.capacity)
+    ("capacity", "ASC", r"sân (vận động )?(nhỏ|bé) nhất|smallest (stadium|ground|venue)"),
+    ("capacity", "DESC", r"sân (vận động )?(lớn|to|rộng) nhất|sức chứa|(biggest|largest) (stadium|ground|venue)|capacity"),
+]
+
+SUPERLATIVE_RE = re.compile(r"nhất|vua phá lưới|\b(most|least|top|best|worst|highest|lowest|fewest|\w+est)\b")
+SEMANTIC_RE = re.compile(
+    r"giỏi|tốt|nhanh|mạnh|kỹ thuật|rê bóng|đánh đầu|chuyền|sút|phong cách|lối chơi|giống|sáng tạo|tốc độ"
+    r"|\b(good|great|fast|quick|skill\w*|style|dribbl\w*|header\w*|creative|strong|similar|like|technical|playmaker|pace|clinical)\b"
+)
+TEAM_RE = re.compile(r"\b(đội|câu lạc bộ|clb|club|clubs|team|teams|sân vận động|stadium|thành lập|founded)\b")
+PLAYER_RE = re.compile(
+    r"\b(cầu thủ|tiền đạo|hậu vệ|thủ môn|tiền vệ|ai|player|players|striker|strikers|forward|forwards"
+    r"|defender|defenders|goalkeeper|goalkeepers|midfielder|midfielders|winger|wingers|who)\b"
+)
+
+# alias ngoai ten giai trong CSV (tieng Viet + viet tat)
+LEAGUE_ALIASES: Dict[str, List[str]] = {
+    "Premier League": ["epl", "ngoại hạng anh", "english premier league"],
+    "La Liga": ["laliga", "vđqg tây ban nha", "spanish league"],
+    "Serie A": ["vđqg ý", "vđqg italia", "italian league"],
+    "Bundesliga": ["vđqg đức", "german league"],
+    "Ligue 1": ["vđqg pháp", "french league"],
+}
+
+# ma FIFA (cot Nation trong CSV) -> (ten chuan, alias)
+NATION_ALIASES: Dict[str, Tuple[str, List[str]]] = {
+    "ESP": ("Spain", ["spain", "spanish", "tây ban nha"]),
+    "FRA": ("France", ["france", "french", "pháp"]),
+    "GER": ("Germany", ["germany", "german"]),
+    "ITA": ("Italy", ["italy", "italian", "italia"]),
+    "ENG": ("England", ["england", "english"]),
+    "BRA": ("Brazil", ["brazil", "brasil", "brazilian"]),
+    "ARG": ("Argentina", ["argentina", "argentinian", "argentine"]),
+    "POR": ("Portugal", ["portugal", "portuguese", "bồ đào nha"]),
+    "NED": ("Netherlands", ["netherlands", "dutch", "hà lan"]),
+    "DEN": ("Denmark", ["denmark", "danish", "đan mạch"]),
+    "BEL": ("Belgium", ["belgium", "belgian"]),
+    "CIV": ("Côte d'Ivoire", ["ivory coast", "côte d'ivoire", "bờ biển ngà"]),
+    "MAR": ("Morocco", ["morocco", "moroccan", "ma-rốc", "maroc"]),
+    "SUI": ("Switzerland", ["switzerland", "swiss", "thụy sĩ"]),
+    "SWE": ("Sweden", ["sweden", "swedish", "thụy điển"]),
+    "NGA": ("Nigeria", ["nigeria", "nigerian"]),
+    "CRO": ("Croatia", ["croatia", "croatian"]),
+    "AUT": ("Austria", ["austria", "austrian"]),
+    "SEN": ("Senegal", ["senegal", "senegalese"]),
+    "POL": ("Poland", ["poland", "polish", "ba lan"]),
+    "SRB": ("Serbia", ["serbia", "serbian"]),
+    "USA": ("United States", ["united states", "usa", "american", "mỹ"]),
+    "NOR": ("Norway", ["norway", "norwegian", "na uy"]),
+    "JPN": ("Japan", ["japan", "japanese", "nhật bản"]),
+    "COL": ("Colombia", ["colombia", "colombian"]),
+    "URU": ("Uruguay", ["uruguay", "uruguayan"]),
+    "KOR": ("Korea Republic", ["south korea", "korean", "hàn quốc"]),
+}
+# alias ngan de nham voi tu thuong -> chi khop khi viet hoa dung
+CASE_SENSITIVE_ALIASES = {"Anh": "England", "Ý": "Italy", "Đức": "Germany", "Áo": "Austria", "Bỉ": "Belgium"}
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", text).lower().strip()
+
+
+NATION_BY_CODE = {code: name for code, (name, _) in NATION_ALIASES.items()}
+NATION_BY_ALIAS = {normalize(a): name for name, aliases in NATION_ALIASES.values() for a in [name, *aliases]}
+FBREF_NATION_RE = re.compile(r"^[a-z]{2,3} ([a-z]{3})$", re.I)
+
+
+def canonical_nation(value: str) -> str:
+    """FBref nation code ("br BRA") or alias ("brasil") -> the router's name ("Brazil"); other values unchanged."""
+    value = str(value).strip()
+    m = FBREF_NATION_RE.match(value)
+    if m:
+        return NATION_BY_CODE.get(m.group(1).upper(), value)
+    return NATION_BY_ALIAS.get(normalize(value), value)
+
+
+def _alias_regex(aliases: Iterable[str]) -> Optional[re.Pattern]:
+    aliases = sorted({a for a in aliases if a}, key=len, reverse=True)  # alias dai khop truoc
+    if not aliases:
+        return None
+    return re.compile(r"(?<!\w)(" + "|".join(re.escape(a) for a in aliases) + r")(?!\w)")
+
+
+class FastRouter:
+    # router bang luat, chay local truoc khi goi LLM router
+
+    def __init__(
+        self,
+        leagues: Dict[str, List[str]],
+        nationalities: Dict[str, List[str]],
+        clubs: Iterable[str] = (),
+    ) -> None:
+        self._league_by_alias = {normalize(a): name for name, aliases in leagues.items() for a in [name, *aliases]}
+        self._nation_by_alias = {normalize(a): name for name, aliases in nationalities.items() for a in aliases}
+        self._league_re = _alias_regex(self._league_by_alias)
+        self._nation_re = _alias_regex(self._nation_by_alias)
+        self._club_re = _alias_regex(clubs)  # ten rieng -> khop co phan biet hoa thuong
+        self._nation_cs_re = _alias_regex(
+            a for a, name in CASE_SENSITIVE_ALIASES.items() if name in nationalities
+        )
+        self._sort_rules = [(f, o, re.compile(p)) for f, o, p in SORT_RULES]
+
+    @classmethod
+    def from_data_dir(cls, data_dir: str = "data") -> "FastRouter":
+        # gazetteer: giai + nuoc tu CSV cau thu, ten CLB tu data/cache/league_teams_*.json
+        players_csv = os.path.join(data_dir, "players", "players_data_light-2024_2025.csv")
+        squad_comp: Dict[str, Counter] = {}
+        nation_codes = set()
+        with open(players_csv, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                comp = row.get("Comp", "").split(" ", 1)[-1]  # "eng Premier League" -> "Premier League"
+                squad_comp.setdefault(row.get("Squad", ""), Counter())[comp] += 1
+                if row.get("Nation"):
+                    nation_codes.add(row["Nation"].split(" ")[-1])  # "br BRA" -> "BRA"
+
+        leagues: Dict[str, List[str]] = {}
+        clubs: List[str] = []
+        for path in sorted(glob.glob(os.path.join(data_dir, "cache", "league_teams_*.json"))):
+            with open(path, "r", encoding="utf-8") as f:
+                response = json.load(f).get("response", [])
+            names = [item["team"]["name"] for item in response]
+            clubs.extend(names)
+
+            votes = Counter()
+            for name in names:
+                votes.update(squad_comp.get(name, Counter()))
+            if not votes:
+                continue
+            league = votes.most_common(1)[0][0]
+            country = response[0]["team"].get("country") if response else None
+            aliases = list(LEAGUE_ALIASES.get(league, []))
+            if country:
+                aliases.append(f"{country} {league}")
+            leagues[league] = aliases
+
+        nationalities = {
+            name: [name, *aliases]
+            for code, (name, aliases) in NATION_ALIASES.items()
+            if code in nation_codes
+        }
+        return cls(leagues=leagues, nationalities=nationalities, clubs=clubs)
+
+    def _extract_filters(self, query: str, text: str) -> Dict[str, str]:
+        filters: Dict[str, str] = {}
+        if self._league_re:
+            m = self._league_re.search(text)
+            if m:
+                filters["league"] = self._league_by_alias[m.group(1)]
+                text = text[:m.start()] + " " + text[m.end():]  # "Ngoại hạng Anh" khong tinh la nuoc Anh
+                query = query[:m.start()] + " " + query[m.end():]
+
+        if self._nation_re:
+            m = self._nation_re.search(text)
+            if m:
+                filters["nationality"] = self._nation_by_alias[m.group(1)]
+        if "nationality" not in filters and self._nation_cs_re:
+            m = self._nation_cs_re.search(query)
+            if m:
+                filters["nationality"] = CASE_SENSITIVE_ALIASES[m.group(1)]
+        return filters
+
+    def _match_sort(self, text: str) -> Tuple[Optional[str], Optional[str]]:
+        for field, order, pattern in self._sort_rules:
+            if pattern.search(text):
+                return field, order
+        return None, None
+
+    def __call__(self, query: str) -> QueryContext:
+        raw = unicodedata.normalize("NFC", query).strip()
+        text = raw.lower()
+        filters = self._extract_filters(raw, text)
+        sort_field, sort_order = self._match_sort(text)
+        superlative = bool(SUPERLATIVE_RE.search(text))
+        semantic = bool(SEMANTIC_RE.search(text))
+        team_cue = bool(TEAM_RE.search(text))
+        player_cue = bool(PLAYER_RE.search(text))
+        club_mentioned = bool(self._club_re and self._club_re.search(raw))
+
+        if team_cue and player_cue:
+            table = "both"
+        elif team_cue:
+            table = "teams"
+        else:
+            table = "players"
+
+        if sort_field and superlative and not semantic:
+            strategy, confidence = Strategy.RANKING, 0.95
+        elif sort_field or superlative:
+            # so sanh nhung khong ro truong sort -> de LLM quyet
+            strategy, confidence = Strategy.RANKING, 0.3
+        elif semantic:
+            strategy = Strategy.HYBRID if filters else Strategy.SEMANTIC
+            confidence = 0.6
+        elif filters:
+            strategy, confidence = Strategy.FILTERS_ONLY, 0.85
+        else:
+            strategy, confidence = Strategy.HYBRID, 0.2
+
+        if strategy != Strategy.RANKING:
+            sort_field, sort_order = None, None
+        if table == "both":
+            confidence = min(confidence, 0.4)  # can sub_queries tu LLM
+        if club_mentioned:
+            confidence -= 0.3  # filter theo CLB chua ho tro
+
+        return QueryContext(
+            raw_query=query,
+            strategy=strategy,
+            filters=filters,
+            embedding=None,
+            sort_field=sort_field,
+            sort_order=sort_order,
+            table=table,
+            confidence=round(max(confidence, 0.0), 2),
+        )
@@ -1,35 +1,23 @@
 ﻿from __future__ import annotations
-from typing import Any, Dict, List, Optional
-from src.utils.gemini_client import GeminiClient
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 from .types import Strategy
+from .context_builder import ContextBuilder, estimate_tokens
+from src.utils.tracing import annotate, traced
+
+if TYPE_CHECKING:
+    from src.utils.gemini_client import GeminiClient
 
 class ResponseGenerator:
-    def __init__(self, gemini_client: GeminiClient) -> None:
+    def __init__(self, gemini_client: GeminiClient, context_builder: Optional[ContextBuilder] = None) -> None:
         self.gemini = gemini_client
+        self.context_builder = context_builder or ContextBuilder()
 
-    def _format_doc(self, idx: int, doc: Dict[str, Any]) -> str:
-
-        fields_to_skip = {"embedding"}
-        clean_doc = {k: v for k, v in doc.items() if k not in fields_to_skip}
-
-        lines = [f"[Doc {idx}]"]
-        for k, v in clean_doc.items():
-            lines.append(f"{k}: {v}")
-        return "\n".join(lines)
-
-    def _build_context(self, docs: List[Dict[str, Any]]) -> str:
-        
-        if not docs:
-            return "No documents were retrieved from the database."
-
-        formatted = [self._format_doc(i + 1, doc) for i, doc in enumerate(docs)] # gộp các doc đã format
-        return "\n\n".join(formatted)
-
-
-    def __call__(self, query: str, docs: List[Dict[str, Any]],
-                strategy: Optional[Strategy] = None,
-                filters: Optional[Dict[str, Any]] = None) -> str:
-        context_block = self._build_context(docs)
+    def _build_prompts(self, query: str, docs: List[Dict[str, Any]],
+                       strategy: Optional[Strategy] = None,
+                       sort_field: Optional[str] = None,
+                       prompt_stats: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+        # chi dua cac field can cho strategy/sort vao prompt, trong gioi han token
+        context_block, stats = self.context_builder.build(docs, strategy, sort_field)
 
         system_prompt = (
             "You are a football data assistant. "
@@ -51,9 +39,49 @@ class ResponseGenerator:
                         - If you are not sure, explicitly say you are not sure instead of guessing.
                         - Provide a concise but complete answer.
                         """
+        prompt_chars = len(system_prompt) + len(user_prompt)
+        prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        if prompt_stats is not None:
+            prompt_stats.update(stats)
+            prompt_stats["prompt_chars"] = prompt_chars
+            prompt_stats["prompt_tokens"] = prompt_tokens
+        annotate(docs=len(docs), prompt_chars=prompt_chars, prompt_tokens=prompt_tokens,
+                 strategy=strategy.value if strategy else None)
+        return system_prompt, user_prompt
+
+    @traced("generate")
+    def __call__(self, query: str, docs: List[Dict[str, Any]],
+                strategy: Optional[Strategy] = None,
+                filters: Optional[Dict[str, Any]] = None,
+                sort_field: Optional[str] = None,
+                prompt_stats: Optional[Dict[str, Any]] = None) -> str:
+        system_prompt, user_prompt = self._build_prompts(query, docs, strategy, sort_field, prompt_stats)
         response = self.gemini.chat(
             system_prompt=system_prompt,
             user_prompt=user_prompt,
         )
 
         return response
+
+    def stream(self, query: str, docs: List[Dict[str, Any]],
+               strategy: Optional[Strategy] = None,
+               filters: Optional[Dict[str, Any]] = None,
+               sort_field: Optional[str] = None,
+               prompt_stats: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        system_prompt, user_prompt = self._build_prompts(query, docs, strategy, sort_field, prompt_stats)
+        yield from self.gemini.chat_stream(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+        )
+
+    @traced("generate")
+    async def acall(self, query: str, docs: List[Dict[str, Any]],
+                    strategy: Optional[Strategy] = None,
+                    filters: Optional[Dict[str, Any]] = None,
+                    sort_field: Optional[str] = None,
+                    prompt_stats: Optional[Dict[str, Any]] = None) -> str:
+        system_prompt, user_prompt = self._build_prompts(query, docs, strategy, sort_field, prompt_stats)
+        return await self.gemini.achat(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+        )
@@ -1,16 +1,26 @@
 ﻿from __future__ import annotations
+import asyncio
 import json
-from typing import Dict, Any
-from src.utils.gemini_client import GeminiClient
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 from src.rag.types import QueryContext, Strategy
+from src.rag.fast_router import FastRouter
+from src.utils.tracing import span, traced
+
+if TYPE_CHECKING:
+    from src.utils.gemini_client import GeminiClient
+
+TABLES = ("players", "teams", "both")
 
 
 class QueryProcessor:
     # phân tích query chọn chiến lược tối ưu 
 
-    def __init__(self, gemini_client: GeminiClient, embedding_client: Any):
+    def __init__(self, gemini_client: GeminiClient, embedding_client: Any,
+                 fast_router: Optional[FastRouter] = None, fast_router_threshold: float = 0.8):
         self.gemini = gemini_client
         self.embedding_client = embedding_client
+        self.fast_router = fast_router  # None -> luon dung LLM router
+        self.fast_router_threshold = fast_router_threshold
         self.router_prompt = """
 You are a Query Router for a football RAG system.
 Analyze the user's query and decide the best retrieval strategy.
@@ -29,37 +39,44 @@ Analyze the user's query and decide the best retrieval strategy.
     "nationality": "Country Name" | null
   },
   "sort": {
-    "field": "goals" | "assists" | "age" | "height" | "appearances" | null,
+    "field": "goals" | "assists" | "age" | "height" | "appearances" | "capacity" | null,
     "order": "DESC" | "ASC"
-  }
+  },
+  "table": "players" | "teams" | "both",
+  "sub_queries": {
+    "players": "sub-question for players",
+    "teams": "sub-question for teams"
+  } | null
 }
 
 **Rules:**
 - For `ranking` strategy: `sort.field` and `sort.order` are REQUIRED.
 - `sort.order` = "DESC" for "most/highest/nhiều nhất", "ASC" for "least/youngest/ít nhất/trẻ nhất".
+- `sort.field` = "capacity" (stadium size) only applies to table "teams".
 - `filters` should only extract 'league' and 'nationality'.
+- `table`: "players" for footballers, stats, bio; "teams" for clubs, stadiums, history; "both" if the question needs info from BOTH players AND teams.
+- `sub_queries` is REQUIRED when `table` = "both": split the question into one sub-question focused ONLY on players and one focused ONLY on teams. Otherwise null.
 - Return ONLY valid JSON.
 
 **Examples:**
 Query: "Ai ghi nhiều bàn nhất EPL?"
-Response: {"strategy": "ranking", "filters": {"league": "Premier League", "nationality": null}, "sort": {"field": "goals", "order": "DESC"}}
+Response: {"strategy": "ranking", "filters": {"league": "Premier League", "nationality": null}, "sort": {"field": "goals", "order": "DESC"}, "table": "players", "sub_queries": null}
 
 Query: "Cầu thủ trẻ nhất?"
-Response: {"strategy": "ranking", "filters": {"league": null, "nationality": null}, "sort": {"field": "age", "order": "ASC"}}
+Response: {"strategy": "ranking", "filters": {"league": null, "nationality": null}, "sort": {"field": "age", "order": "ASC"}, "table": "players", "sub_queries": null}
 
 Query: "Tiền đạo Brazil ở La Liga"
-Response: {"strategy": "filters_only", "filters": {"league": "La Liga", "nationality": "Brazil"}, "sort": {"field": null, "order": null}}
+Response: {"strategy": "filters_only", "filters": {"league": "La Liga", "nationality": "Brazil"}, "sort": {"field": null, "order": null}, "table": "players", "sub_queries": null}
 
 Query: "Cầu thủ chạy nhanh và sút tốt"
-Response: {"strategy": "semantic", "filters": {"league": null, "nationality": null}, "sort": {"field": null, "order": null}}
+Response: {"strategy": "semantic", "filters": {"league": null, "nationality": null}, "sort": {"field": null, "order": null}, "table": "players", "sub_queries": null}
+
+Query: "Which team does Messi play for and where is their stadium?"
+Response: {"strategy": "semantic", "filters": {"league": null, "nationality": null}, "sort": {"field": null, "order": null}, "table": "both", "sub_queries": {"players": "Which team does Messi play for?", "teams": "Where is Inter Miami's stadium?"}}
 """
 
-    def _analyze_query(self, query: str) -> Dict[str, Any]:
+    def _parse_analysis(self, response_text: str) -> Dict[str, Any]:
         try:
-            response_text = self.gemini.chat(
-                system_prompt=self.router_prompt,
-                user_prompt=f'Query: "{query}"\nJSON Response:'
-            )
             # Clean markdown code blocks
             clean_response = (
                 response_text.strip()
@@ -68,7 +85,7 @@ Response: {"strategy": "semantic", "filters": {"league": null, "nationality": nu
                 .strip()
             )
             return json.loads(clean_response)
-        except (json.JSONDecodeError, TypeError) as e:
+        except (json.JSONDecodeError, TypeError, AttributeError) as e:
             print(f"⚠️ Router Error: {e}. Defaulting to hybrid strategy.")
             return {
                 "strategy": "hybrid",
@@ -76,9 +93,60 @@ Response: {"strategy": "semantic", "filters": {"league": null, "nationality": nu
                 "sort": {"field": None, "order": None}
             }
 
-    def __call__(self, query: str) -> QueryContext:
-        analysis = self._analyze_query(query)
-
+    @traced("route.llm")
+    def _analyze_query(self, query: str) -> Dict[str, Any]:
+        response_text = self.gemini.chat(
+            system_prompt=self.router_prompt,
+            user_prompt=f'Query: "{query}"\nJSON Response:'
+        )
+        return self._parse_analysis(response_text)
+
+    @traced("route.llm")
+    async def _aanalyze_query(self, query: str) -> Dict[str, Any]:
+        response_text = await self.gemini.achat(
+            system_prompt=self.router_prompt,
+            user_prompt=f'Query: "{query}"\nJSON Response:'
+        )
+        return self._parse_analysis(response_text)
+
+    def _parse_table(self, query: str, analysis: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, str]]]:
+        # bang + sub-questions di chung 1 lan goi router, retriever khong can hoi LLM lai
+        table = analysis.get("table")
+        if table not in TABLES:
+            return None, None  # retriever se tu chon bang
+
+        if table != "both":
+            return table, None
+
+        sub_raw = analysis.get("sub_queries") or {}
+        sub_queries = {
+            "players": sub_raw.get("players") or query,
+            "teams": sub_raw.get("teams") or query,
+        }
+        return table, sub_queries
+
+    def _embed_if_needed(self, strategy: Strategy, query: str, embedding: Optional[list] = None) -> Optional[list]:
+        if strategy in (Strategy.SEMANTIC, Strategy.HYBRID):
+            return embedding or self.embedding_client.get_embedding(query)
+        return None
+
+    def fast_route(self, query: str) -> Optional[QueryContext]:
+        """FastRouter context at any confidence (None without a fast router).
+
+        The pipeline computes it once and passes it to the answer cache and back to
+        __call__/acall as `route`, so a query is not routed again.
+        """
+        return None if self.fast_router is None else self.fast_router(query)
+
+    def _fast_route(self, query: str, route: Optional[QueryContext] = None) -> Optional[QueryContext]:
+        if self.fast_router is None:
+            return None
+        context = route if route is not None else self.fast_router(query)
+        if context.confidence is not None and context.confidence >= self.fast_router_threshold:
+            return context
+        return None
+
+    def _context_from_analysis(self, query: str, analysis: Dict[str, Any]) -> QueryContext:
         strategy_str = analysis.get("strategy", "hybrid")
         try:
             strategy = Strategy(strategy_str)
@@ -93,15 +161,73 @@ Response: {"strategy": "semantic", "filters": {"league": null, "nationality": nu
         sort_field = sort_info.get("field")  # "goals", "age", etc.
         sort_order = sort_info.get("order")  # "DESC" or "ASC"
 
-        embedding = None
-        if strategy in (Strategy.SEMANTIC, Strategy.HYBRID):
-            embedding = self.embedding_client.get_embedding(query)
+        table, sub_queries = self._parse_table(query, analysis)
 
         return QueryContext(
             raw_query=query,
             strategy=strategy,
             filters=filters,
-            embedding=embedding,
+            embedding=None,
             sort_field=sort_field,
-            sort_order=sort_order
-        )
\ No newline at end of file
+            sort_order=sort_order,
+            table=table,
+            sub_queries=sub_queries,
+        )
+
+    @staticmethod
+    def _span_attributes(context: QueryContext) -> Dict[str, Any]:
+        # confidence chi co khi FastRouter tra loi (LLM route -> None)
+        router = "fast" if context.confidence is not None else "llm"
+        return {"router": router, "strategy": context.strategy.value, "table": context.table,
+                "confidence": context.confidence}
+
+    def __call__(self, query: str, embedding: Optional[list] = None,
+                 route: Optional[QueryContext] = None) -> QueryContext:
+        # embedding: query embedding da tinh san (vd. tu answer cache), tranh encode lai
+        # route: ket qua fast_route() da tinh san, tranh route lai
+        with span("route") as s:
+            context = self._fast_route(query, route)
+            if context is None:
+                context = self._context_from_analysis(query, self._analyze_query(query))
+            s.set(**self._span_attributes(context))
+            context.embedding = self._embed_if_needed(context.strategy, query, embedding)
+            return context
+
+    async def acall(self, query: str, embedding: Optional[list] = None,
+                    route: Optional[QueryContext] = None) -> QueryContext:
+        with span("route") as s:
+            context = await self._aroute(query, embedding, route)
+            s.set(**self._span_attributes(context))
+            return context
+
+    async def _aroute(self, query: str, embedding: Optional[list] = None,
+                      route: Optional[QueryContext] = None) -> QueryContext:
+        context = self._fast_route(query, route)
+        if context is not None:
+            if embedding is None and context.strategy in (Strategy.SEMANTIC, Strategy.HYBRID):
+                embedding = await asyncio.to_thread(self.embedding_client.get_embedding, query)
+            context.embedding = self._embed_if_needed(context.strategy, query, embedding)
+            return context
+
+        # encode query trong worker thread trong luc cho router LLM
+        # (model chua load xong -> khong encode truoc, RANKING/FILTERS_ONLY khong phai cho)
+        embed_task = None
+        if embedding is None and getattr(self.embedding_client, "ready", True):
+            embed_task = asyncio.ensure_future(asyncio.to_thread(self.embedding_client.get_embedding, query))
+
+        try:
+            context = self._context_from_analysis(query, await self._aanalyze_query(query))
+            if context.strategy in (Strategy.SEMANTIC, Strategy.HYBRID) and embedding is None:
+                if embed_task is not None:
+                    embedding = await embed_task
+                else:
+                    embedding = await asyncio.to_thread(self.embedding_client.get_embedding, query)
+        finally:
+            # RANKING/FILTERS_ONLY hoac router loi: embedding doan truoc khong dung toi
+            if embed_task is not None:
+                if not embed_task.done():
+                    embed_task.cancel()
+                elif not embed_task.cancelled():
+                    embed_task.exception()  # danh dau da doc loi, tranh "exception never retrieved"
+        context.embedding = self._embed_if_needed(context.strategy, query, embedding)
+        return context
@@ -1,7 +1,14 @@
-﻿from .retriever import Retriever
+﻿import asyncio
+import time
+from typing import Iterator
+
+from .retriever import Retriever
 from .generator import ResponseGenerator
 from .query_processor import QueryProcessor
-from .types import Strategy  # import Enum Strategy
+from .types import QueryContext, Strategy  # import Enum Strategy
+from .answer_cache import SemanticAnswerCache, normalize_query
+from src.utils.single_flight import SingleFlight
+from src.utils.tracing import Trace, activate, span, trace
 
 
 class RAGPipeline:
@@ -10,46 +17,216 @@ class RAGPipeline:
         retriever: Retriever,
         generator: ResponseGenerator,
         query_processor: QueryProcessor,
+        answer_cache: SemanticAnswerCache | None = None,
     ):
         self.retriever = retriever
         self.generator = generator
         self.query_processor = query_processor
+        self.answer_cache = answer_cache
+        # cau hoi giong het (sau normalize) dang xu ly -> cho ket qua do, khong chay lai
+        self.flight = SingleFlight()
 
     def __call__(self, query: str) -> dict:
-        # query_processor tra ve QueryContext object
-        qp = self.query_processor(query)
-        strategy: Strategy = qp.strategy
-        embedding = qp.embedding
-        filters = qp.filters
-        sort_field = qp.sort_field
-        sort_order = qp.sort_order
+        with trace("query", mode="sync") as tr:
+            result = dict(self.flight.do(("call", normalize_query(query)), self._call, query))  # moi caller 1 ban
+            self._annotate_root(tr, result)
+        result["trace"] = tr.to_dict()
+        return result
 
-        # 1) lay docs theo strategy
-        docs = self._retrieve(
-            query=query,
-            strategy=strategy,
-            embedding=embedding,
-            filters=filters,
-            sort_field=sort_field,
-            sort_order=sort_order,
-        )
+    async def acall(self, query: str) -> dict:
+        with trace("query", mode="async") as tr:
+            result = dict(await self.flight.ado(("acall", normalize_query(query)), self._acall, query))
+            self._annotate_root(tr, result)
+        result["trace"] = tr.to_dict()
+        return result
 
-        # 2) generate cau tra loi
-        answer = self.generator(
-            query=query, 
-            docs=docs or [],  # Fix: Fallback to empty list if None
-            strategy=strategy, 
-            filters=filters
-        )
+    @staticmethod
+    def _annotate_root(tr: Trace, result: dict) -> None:
+        tr.root.set(strategy=result.get("strategy"), cache_hit=result.get("cache_hit"),
+                    docs=len(result.get("context") or []))
+
+    def _lookup(self, query: str, route: QueryContext | None) -> tuple[dict | None, list[float] | None]:
+        with span("answer_cache.lookup") as s:
+            cached, query_embedding = self.answer_cache.lookup(query, route)
+            s.set(hit=cached is not None)
+        return cached, query_embedding
+
+    def coalescing_stats(self) -> dict:
+        """Coalesced-call counters per level: pipeline, storage, Gemini chat."""
+        stats = {"pipeline": self.flight.stats()}
+        storage_flight = getattr(self.retriever.supabase, "flight", None)
+        if storage_flight is not None:
+            stats["storage"] = storage_flight.stats()
+        gemini_flight = getattr(self.generator.gemini, "flight", None)
+        if gemini_flight is not None:
+            stats["gemini"] = gemini_flight.stats()
+        return stats
+
+    def _call(self, query: str) -> dict:
+        route, cached, query_embedding = self._check_cache(query)
+        if cached is not None:
+            return cached
+        result = self._answer(query, query_embedding, route)
+        return self._store(query, query_embedding, route, result)
+
+    async def _acall(self, query: str) -> dict:
+        # ban async: cho nhieu user dong thoi trong 1 process; chi route/retrieve/generate la await
+        route, cached, query_embedding = await asyncio.to_thread(self._check_cache, query)
+        if cached is not None:
+            return cached
+        qp = await self.query_processor.acall(query, embedding=query_embedding, route=route)
+        docs = await self._aretrieve(**self._retrieve_args(query, qp)) or []
+        prompt_stats: dict = {}
+        answer = await self.generator.acall(**self._generate_args(query, qp, docs, prompt_stats))
+        result = self._result(qp, docs, answer, prompt_stats)
+        return await asyncio.to_thread(self._store, query, query_embedding, route, result)
+
+    def _check_cache(self, query: str) -> tuple[QueryContext | None, dict | None, list[float] | None]:
+        """(fast route, cached result or None, query embedding) - shared by every entry point."""
+        # route 1 lan (FastRouter, khong goi LLM), dung chung cho cache va query_processor
+        route = self.query_processor.fast_route(query)
+        if self.answer_cache is None:
+            return route, None, None
+        # 0) cau hoi tuong tu da tra loi -> khong goi Gemini/Supabase
+        cached, query_embedding = self._lookup(query, route)
+        return route, ({**cached, "cache_hit": True} if cached is not None else None), query_embedding
+
+    def _store(self, query: str, query_embedding: list[float] | None, route: QueryContext | None,
+               result: dict) -> dict:
+        if self.answer_cache is not None:
+            self.answer_cache.store(query, query_embedding, result, route)
+            result["cache_hit"] = False
+        return result
+
+    @staticmethod
+    def _retrieve_args(query: str, qp: QueryContext) -> dict:
+        return {
+            "query": query,
+            "strategy": qp.strategy,
+            "embedding": qp.embedding,
+            "filters": qp.filters,
+            "sort_field": qp.sort_field,
+            "sort_order": qp.sort_order,
+            "table": qp.table,
+            "sub_queries": qp.sub_queries,
+        }
+
+    @staticmethod
+    def _generate_args(query: str, qp: QueryContext, docs: list[dict], prompt_stats: dict) -> dict:
+        return {
+            "query": query,
+            "docs": docs,
+            "strategy": qp.strategy,
+            "filters": qp.filters,
+            "sort_field": qp.sort_field,
+            "prompt_stats": prompt_stats,
+        }
 
+    @staticmethod
+    def _result(qp: QueryContext, docs: list[dict], answer: str, prompt_stats: dict) -> dict:
         # tra ve them strategy/filters
         return {
             "answer": answer,
-            "context": docs or [],  # Fix: Consistent with generator input
-            "strategy": strategy.value,
-            "filters": filters or {},
+            "context": docs,
+            "strategy": qp.strategy.value,
+            "filters": qp.filters or {},
+            "prompt_stats": prompt_stats,
+        }
+
+    def stream(self, query: str) -> Iterator[dict]:
+        """Yield {"type": "token", "text": ...} events, then one {"type": "result", ...} event."""
+        start = time.perf_counter()
+        # generator: trace chi duoc set lam context trong tung doan khong co yield
+        tr = Trace("query", mode="stream")
+        with activate(tr):
+            route, cached, query_embedding = self._check_cache(query)
+        if cached is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._annotate_root(tr, cached)
+            tr.finish()
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "result", **cached,
+                   "ttft_ms": elapsed_ms, "generation_ms": 0.0, "total_ms": elapsed_ms, "trace": tr.to_dict()}
+            return
+
+        with activate(tr):
+            qp, docs = self._prepare(query, query_embedding, route)
+
+        # 2) stream cau tra loi, do TTFT (tinh tu luc nhan query) va thoi gian generate
+        gen_start = time.perf_counter()
+        ttft_ms = None
+        chunks = []
+        prompt_stats: dict = {}
+        for text in self.generator.stream(**self._generate_args(query, qp, docs, prompt_stats)):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - start) * 1000
+            chunks.append(text)
+            yield {"type": "token", "text": text}
+        end = time.perf_counter()
+        tr.record("generate", gen_start, end, docs=len(docs), strategy=qp.strategy.value,
+                  prompt_chars=prompt_stats.get("prompt_chars"), prompt_tokens=prompt_stats.get("prompt_tokens"),
+                  ttft_ms=round(ttft_ms, 3) if ttft_ms is not None else None)
+
+        result = self._store(query, query_embedding, route, self._result(qp, docs, "".join(chunks), prompt_stats))
+        self._annotate_root(tr, result)
+        tr.finish()
+
+        yield {
+            "type": "result",
+            **result,
+            "ttft_ms": ttft_ms if ttft_ms is not None else (end - start) * 1000,
+            "generation_ms": (end - gen_start) * 1000,
+            "total_ms": (end - start) * 1000,
+            "trace": tr.to_dict(),
         }
 
+    def retrieve(self, query: str) -> dict:
+        """Route and retrieve without generating an answer (no Gemini call on the fast-router path)."""
+        with trace("retrieve", mode="sync") as tr:
+            qp, docs = self._prepare(query)
+            result = self._retrieval_result(qp, docs)
+            self._annotate_root(tr, result)
+        result["trace"] = tr.to_dict()
+        return result
+
+    async def aretrieve(self, query: str) -> dict:
+        with trace("retrieve", mode="async") as tr:
+            qp = await self.query_processor.acall(query)
+            docs = await self._aretrieve(**self._retrieve_args(query, qp))
+            result = self._retrieval_result(qp, docs or [])
+            self._annotate_root(tr, result)
+        result["trace"] = tr.to_dict()
+        return result
+
+    @staticmethod
+    def _retrieval_result(qp: QueryContext, docs: list[dict]) -> dict:
+        return {
+            "context": docs,
+            "strategy": qp.strategy.value,
+            "filters": qp.filters or {},
+            "table": qp.table,
+            "sort_field": qp.sort_field,
+            "sort_order": qp.sort_order,
+        }
+
+    def _prepare(self, query: str, query_embedding: list[float] | None = None,
+                 route: QueryContext | None = None) -> tuple[QueryContext, list[dict]]:
+        # query_processor tra ve QueryContext object
+        qp = self.query_processor(query, embedding=query_embedding, route=route)
+
+        # 1) lay docs theo strategy
+        docs = self._retrieve(**self._retrieve_args(query, qp))
+        return qp, docs or []  # Fix: Fallback to empty list if None
+
+    def _answer(self, query: str, query_embedding: list[float] | None = None,
+                route: QueryContext | None = None) -> dict:
+        qp, docs = self._prepare(query, query_embedding, route)
+
+        # 2) generate cau tra loi
+        prompt_stats: dict = {}
+        answer = self.generator(**self._generate_args(query, qp, docs, prompt_stats))
+        return self._result(qp, docs, answer, prompt_stats)
+
     def _retrieve(
         self,
         query: str,
@@ -58,6 +235,8 @@ class RAGPipeline:
         filters: dict | None,
         sort_field: str | None,
         sort_order: str | None,
+        table: str | None = None,
+        sub_queries: dict[str, str] | None = None,
     ) -> list[dict]:
 
         if strategy == Strategy.FILTERS_ONLY:
@@ -65,6 +244,7 @@ class RAGPipeline:
             return self.retriever.retrieve_by_filters(
                 query=query,
                 filters=filters or {},
+                table=table,
             )
 
         if strategy == Strategy.SEMANTIC:
@@ -74,6 +254,8 @@ class RAGPipeline:
             return self.retriever.retrieve_semantic(
                 query=query,
                 query_embedding=embedding,
+                table=table,
+                sub_queries=sub_queries,
             )
 
         if strategy == Strategy.RANKING:
@@ -85,6 +267,7 @@ class RAGPipeline:
                 filters=filters or {},
                 sort_field=sort_field,
                 sort_order=sort_order,
+                table=table,
             )
 
         # mac dinh: HYBRID
@@ -94,4 +277,56 @@ class RAGPipeline:
             query=query,
             query_embedding=embedding,
             filters=filters,
+            table=table,
+            sub_queries=sub_queries,
+        )
+
+    async def _aretrieve(
+        self,
+        query: str,
+        strategy: Strategy,
+        embedding: list[float] | None,
+        filters: dict | None,
+        sort_field: str | None,
+        sort_order: str | None,
+        table: str | None = None,
+        sub_queries: dict[str, str] | None = None,
+    ) -> list[dict]:
+
+        if strategy == Strategy.FILTERS_ONLY:
+            return await self.retriever.aretrieve_by_filters(
+                query=query,
+                filters=filters or {},
+                table=table,
+            )
+
+        if strategy == Strategy.SEMANTIC:
+            if embedding is None:
+                raise ValueError("Semantic strategy requires embedding.")
+            return await self.retriever.aretrieve_semantic(
+                query=query,
+                query_embedding=embedding,
+                table=table,
+                sub_queries=sub_queries,
+            )
+
+        if strategy == Strategy.RANKING:
+            if not sort_field or not sort_order:
+                raise ValueError("RANKING strategy requires sort_field and sort_order")
+            return await self.retriever.aretrieve_ranking(
+                query=query,
+                filters=filters or {},
+                sort_field=sort_field,
+                sort_order=sort_order,
+                table=table,
+            )
+
+        if embedding is None:
+            raise ValueError("Hybrid strategy requires embedding.")
+        return await self.retriever.aretrieve_hybrid(
+            query=query,
+            query_embedding=embedding,
+            filters=filters,
+            table=table,
+            sub_queries=sub_queries,
         )
@@ -1,7 +1,13 @@
-﻿from typing import Any
-from src.utils.supabase_client import SupabaseClient
-from src.utils.gemini_client import GeminiClient
+﻿from __future__ import annotations
+import asyncio
+import json
+from typing import TYPE_CHECKING, Any
 from src.rag.types import QueryContext,Strategy
+from src.utils.tracing import annotate, doc_count, traced
+
+if TYPE_CHECKING:  # chi de type hint, khong import supabase/genai khi load module
+    from src.utils.supabase_client import SupabaseClient
+    from src.utils.gemini_client import GeminiClient
 
 class Retriever:    
     def __init__(self, supabase: SupabaseClient, gemini_client: GeminiClient, embedding_client: Any):
@@ -9,19 +15,16 @@ class Retriever:
         self.gemini = gemini_client
         self.embedding_client = embedding_client
 
-    def llm_select_table(self, user_question) -> str:
-        prompt = f"""Given the question: "{user_question}", select the most relevant table:
+    def _select_table_prompt(self, user_question: str) -> str:
+        return f"""Given the question: "{user_question}", select the most relevant table:
         - "players" (for questions about footballers, stats, bio)
         - "teams" (for questions about clubs, stadiums, history)
         - "both" (if question needs info from BOTH players AND teams)
         
         Only return: "players", "teams", or "both"."""
-        
-        response = self.gemini.chat(
-            system_prompt="You are an expert database assistant.",
-            user_prompt=prompt
-        ).lower()
-        
+
+    def _parse_table_choice(self, response: str) -> str:
+        response = response.lower()
         if "both" in response:
             return "both"
         if "team" in response or "club" in response:
@@ -30,8 +33,24 @@ class Retriever:
             return "players"
         return "players"
 
-    def decompose_query(self, user_question: str) -> dict[str, str]:
-        prompt = f"""Given this question: "{user_question}"
+    @traced("retrieve.select_table", lambda table: {"table": table})
+    def llm_select_table(self, user_question) -> str:
+        response = self.gemini.chat(
+            system_prompt="You are an expert database assistant.",
+            user_prompt=self._select_table_prompt(user_question)
+        )
+        return self._parse_table_choice(response)
+
+    @traced("retrieve.select_table", lambda table: {"table": table})
+    async def allm_select_table(self, user_question) -> str:
+        response = await self.gemini.achat(
+            system_prompt="You are an expert database assistant.",
+            user_prompt=self._select_table_prompt(user_question)
+        )
+        return self._parse_table_choice(response)
+
+    def _decompose_prompt(self, user_question: str) -> str:
+        return f"""Given this question: "{user_question}"
         
         This question requires information from BOTH the players table and the teams table.
         Please decompose it into TWO focused sub-questions:
@@ -51,14 +70,9 @@ class Retriever:
             "players": "Which team does Messi play for?",
             "teams": "Where is Inter Miami's stadium?"
         }}"""
-        
-        response = self.gemini.chat(
-            system_prompt="You are an expert at decomposing complex queries. Return only JSON.",
-            user_prompt=prompt
-        )
-        
+
+    def _parse_decomposed(self, response: str, user_question: str) -> dict[str, str]:
         try:
-            import json
             cleaned_response = response.replace("```json", "").replace("```", "").strip()
             decomposed = json.loads(cleaned_response)
             return decomposed
@@ -68,8 +82,44 @@ class Retriever:
                 "teams": user_question
             }
 
-    def retrieve_by_filters(self, query: str, filters: dict | None = None, top_k: int = 5):
-        table = self.llm_select_table(query)
+    @traced("retrieve.decompose")
+    def decompose_query(self, user_question: str) -> dict[str, str]:
+        response = self.gemini.chat(
+            system_prompt="You are an expert at decomposing complex queries. Return only JSON.",
+            user_prompt=self._decompose_prompt(user_question)
+        )
+        return self._parse_decomposed(response, user_question)
+
+    @traced("retrieve.decompose")
+    async def adecompose_query(self, user_question: str) -> dict[str, str]:
+        response = await self.gemini.achat(
+            system_prompt="You are an expert at decomposing complex queries. Return only JSON.",
+            user_prompt=self._decompose_prompt(user_question)
+        )
+        return self._parse_decomposed(response, user_question)
+
+    def _resolve_table(self, query: str, table: str | None) -> str:
+        # bang da duoc router chon thi khong goi LLM nua
+        table = table or self.llm_select_table(query)
+        annotate(table=table)  # gan vao span "retrieve" dang mo
+        return table
+
+    def _resolve_sub_queries(self, query: str, sub_queries: dict[str, str] | None) -> dict[str, str]:
+        return sub_queries or self.decompose_query(query)
+
+    def _search_both(self, players_embedding, teams_embedding, filters: dict | None, k: int) -> list[dict]:
+        # 1 round trip cho ca 2 bang neu client ho tro, khong thi 2 RPC nhu cu
+        multi = getattr(self.supabase, "search_vectors_multi", None)
+        if multi is None:
+            results_players = self.supabase.search_vectors("players", players_embedding, filters, k)
+            results_teams = self.supabase.search_vectors("teams", teams_embedding, filters, k)
+            return results_players + results_teams
+        found = multi({"players": players_embedding, "teams": teams_embedding}, filters, k)
+        return found["players"] + found["teams"]
+
+    @traced("retrieve", doc_count, strategy="filters_only")
+    def retrieve_by_filters(self, query: str, filters: dict | None = None, top_k: int = 5, table: str | None = None):
+        table = self._resolve_table(query, table)
         
         if table == "both":
             k = max(1, top_k // 2)
@@ -83,20 +133,20 @@ class Retriever:
             top_k=top_k,
         )
 
-    def retrieve_semantic(self, query: str, query_embedding: list[float], top_k: int = 5):
-        table = self.llm_select_table(query)
+    @traced("retrieve", doc_count, strategy="semantic")
+    def retrieve_semantic(self, query: str, query_embedding: list[float], top_k: int = 5,
+                          table: str | None = None, sub_queries: dict[str, str] | None = None):
+        table = self._resolve_table(query, table)
         
         if table == "both":
-            subqueries = self.decompose_query(query)
+            subqueries = self._resolve_sub_queries(query, sub_queries)
             k = max(1, top_k // 2)
             
-            players_embedding = self.embedding_client.get_embedding(subqueries["players"])
-            results_players = self.supabase.search_vectors("players", players_embedding, None, k)
-            
-            teams_embedding = self.embedding_client.get_embedding(subqueries["teams"])
-            results_teams = self.supabase.search_vectors("teams", teams_embedding, None, k)
-            
-            return results_players + results_teams
+            # 2 sub-question encode chung 1 lan
+            players_embedding, teams_embedding = self.embedding_client.get_embeddings(
+                [subqueries["players"], subqueries["teams"]]
+            )
+            return self._search_both(players_embedding, teams_embedding, None, k)
 
         return self.supabase.search_vectors(
             table=table,
@@ -105,20 +155,20 @@ class Retriever:
             top_k=top_k,
         )
 
-    def retrieve_hybrid(self, query: str, query_embedding: list[float], filters: dict | None = None, top_k: int = 5):
-        table = self.llm_select_table(query)
+    @traced("retrieve", doc_count, strategy="hybrid")
+    def retrieve_hybrid(self, query: str, query_embedding: list[float], filters: dict | None = None, top_k: int = 5,
+                        table: str | None = None, sub_queries: dict[str, str] | None = None):
+        table = self._resolve_table(query, table)
         
         if table == "both":
-            subqueries = self.decompose_query(query)
+            subqueries = self._resolve_sub_queries(query, sub_queries)
             k = max(1, top_k // 2)
             
-            players_embedding = self.embedding_client.get_embedding(subqueries["players"])
-            results_players = self.supabase.search_vectors("players", players_embedding, filters, k)
-            
-            teams_embedding = self.embedding_client.get_embedding(subqueries["teams"])
-            results_teams = self.supabase.search_vectors("teams", teams_embedding, filters, k)
-            
-            return results_players + results_teams
+            # 2 sub-question encode chung 1 lan
+            players_embedding, teams_embedding = self.embedding_client.get_embeddings(
+                [subqueries["players"], subqueries["teams"]]
+            )
+            return self._search_both(players_embedding, teams_embedding, filters, k)
 
         return self.supabase.search_vectors(
             table=table,
@@ -127,10 +177,73 @@ class Retriever:
             top_k=top_k,
         )
         
-    def retrieve_ranking(self, query, filters, sort_field, sort_order) -> list[dict]:
-        table = self.llm_select_table(query)
+    @traced("retrieve", doc_count, strategy="ranking")
+    def retrieve_ranking(self, query, filters, sort_field, sort_order, table: str | None = None) -> list[dict]:
+        table = self._resolve_table(query, table)
         return self.supabase.call_ranking_rpc(table, filters, sort_field, sort_order)
 
+    # ---- async: cac truy van doc lap (players/teams) chay dong thoi ----
+
+    async def _aresolve_table(self, query: str, table: str | None) -> str:
+        table = table or await self.allm_select_table(query)
+        annotate(table=table)
+        return table
+
+    async def _aresolve_sub_queries(self, query: str, sub_queries: dict[str, str] | None) -> dict[str, str]:
+        return sub_queries or await self.adecompose_query(query)
+
+    async def _asearch_both(self, query: str, filters: dict | None, top_k: int,
+                            sub_queries: dict[str, str] | None) -> list[dict]:
+        subqueries = await self._aresolve_sub_queries(query, sub_queries)
+        k = max(1, top_k // 2)
+        players_embedding, teams_embedding = await asyncio.to_thread(
+            self.embedding_client.get_embeddings, [subqueries["players"], subqueries["teams"]]
+        )
+        multi = getattr(self.supabase, "asearch_vectors_multi", None)
+        if multi is not None:
+            found = await multi({"players": players_embedding, "teams": teams_embedding}, filters, k)
+            return found["players"] + found["teams"]
+        results_players, results_teams = await asyncio.gather(
+            self.supabase.asearch_vectors("players", players_embedding, filters, k),
+            self.supabase.asearch_vectors("teams", teams_embedding, filters, k),
+        )
+        return results_players + results_teams
+
+    @traced("retrieve", doc_count, strategy="filters_only")
+    async def aretrieve_by_filters(self, query: str, filters: dict | None = None, top_k: int = 5, table: str | None = None):
+        table = await self._aresolve_table(query, table)
+
+        if table == "both":
+            k = max(1, top_k // 2)
+            results_teams, results_players = await asyncio.gather(
+                self.supabase.asearch_by_filters("teams", filters or {}, k),
+                self.supabase.asearch_by_filters("players", filters or {}, k),
+            )
+            return results_teams + results_players
+
+        return await self.supabase.asearch_by_filters(table=table, filters=filters or {}, top_k=top_k)
+
+    @traced("retrieve", doc_count, strategy="semantic")
+    async def aretrieve_semantic(self, query: str, query_embedding: list[float], top_k: int = 5,
+                                 table: str | None = None, sub_queries: dict[str, str] | None = None):
+        table = await self._aresolve_table(query, table)
+        if table == "both":
+            return await self._asearch_both(query, None, top_k, sub_queries)
+        return await self.supabase.asearch_vectors(table, query_embedding, None, top_k)
+
+    @traced("retrieve", doc_count, strategy="hybrid")
+    async def aretrieve_hybrid(self, query: str, query_embedding: list[float], filters: dict | None = None, top_k: int = 5,
+                               table: str | None = None, sub_queries: dict[str, str] | None = None):
+        table = await self._aresolve_table(query, table)
+        if table == "both":
+            return await self._asearch_both(query, filters, top_k, sub_queries)
+        return await self.supabase.asearch_vectors(table, query_embedding, filters, top_k)
+
+    @traced("retrieve", doc_count, strategy="ranking")
+    async def aretrieve_ranking(self, query, filters, sort_field, sort_order, table: str | None = None) -> list[dict]:
+        table = await self._aresolve_table(query, table)
+        return await self.supabase.acall_ranking_rpc(table, filters, sort_field, sort_order)
+
     def __call__(   
         self,
         query: str,
@@ -19,3 +19,6 @@ class QueryContext:
     embedding: Optional[List[float]]
     sort_field: Optional[str] = None # attr in json col to sort
     sort_order: Optional[Literal["DESC", "ASC"]] = None
+    table: Optional[Literal["players", "teams", "both"]] = None # None -> retriever tu chon bang
+    sub_queries: Optional[Dict[str, str]] = None # {"players": ..., "teams": ...} khi table == "both"
+    confidence: Optional[float] = None # do tin cay cua FastRouter, None khi LLM route
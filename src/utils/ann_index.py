@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.utils.vector_index import VectorIndex
+
+
+def spherical_kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """k-means on unit vectors (cosine), returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=n_clusters)
+
+        empty = counts == 0
+        if empty.any():  # cum rong -> lay lai diem ngau nhien
+            sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        new_centroids = sums / np.where(norms == 0, 1.0, norms)
+        if np.allclose(new_centroids, centroids, atol=1e-5):
+            centroids = new_centroids
+            break
+        centroids = new_centroids
+    return centroids.astype(np.float32)
+
+
+class IVFIndex(VectorIndex):
+    """IVF-flat approximate index: k-means coarse quantizer + exact scan of the probed lists.
+
+    Recall knobs: `nlist` (number of clusters, fixed at build time) and `nprobe`
+    (lists scanned per query, can be changed per call). Filtered search scans only
+    the rows passing the filter inside probed lists and widens nprobe until it has
+    `top_k` candidates or has visited every list.
+
+    With `cache_path`, a saved index built from the same rows and vectors (and nlist) is
+    reused instead of re-running k-means; otherwise the index is built and saved there.
+    """
+
+    def __init__(self, rows: Iterable[dict], embedding_key: str = "embedding", nlist: Optional[int] = None,
+                 nprobe: int = 8, kmeans_iters: int = 20, train_size: Optional[int] = None, seed: int = 0,
+                 cache_path: Optional[str] = None) -> None:
+        super().__init__(rows, embedding_key)
+        self.nprobe = nprobe
+        if cache_path and self._reuse(cache_path, nlist):
+            return
+        self.build(nlist, kmeans_iters, train_size, seed)
+        if cache_path and len(self.rows):
+            self.save(cache_path)
+
+    @classmethod
+    def from_matrix(cls, rows: list[dict], matrix: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+                    kmeans_iters: int = 20, train_size: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        index = cls.__new__(cls)
+        index._set_data(rows, matrix)
+        index.nprobe = nprobe
+        index.build(nlist, kmeans_iters, train_size, seed)
+        return index
+
+    def build(self, nlist: Optional[int] = None, kmeans_iters: int = 20,
+              train_size: Optional[int] = None, seed: int = 0) -> None:
+        t0 = time.perf_counter()
+        n = len(self.rows)
+        if not n:
+            self.centroids = np.zeros((0, 0), dtype=np.float32)
+            self.list_ids = np.zeros(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.build_seconds = 0.0
+            return
+
+        nlist = min(n, nlist or max(1, int(np.sqrt(n))))
+        train_size = min(n, train_size or nlist * 64)  # ~64 diem / cum la du de train
+        rng = np.random.default_rng(seed)
+        sample = self.matrix[rng.choice(n, train_size, replace=False)]
+        self.centroids = spherical_kmeans(sample, nlist, kmeans_iters, seed)
+
+        # gan toan bo vector theo block de khong tao ma tran n x nlist qua lon
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 8192):
+            assign[start:start + 8192] = np.argmax(self.matrix[start:start + 8192] @ self.centroids.T, axis=1)
+
+        # inverted lists: ids sap theo cum, offsets[c]:offsets[c+1] la list cua cum c
+        self.list_ids = np.argsort(assign, kind="stable")
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        self.build_seconds = time.perf_counter() - t0
+
+    def fingerprint(self) -> str:
+        """sha1 of the rows and vectors: a saved index is only reused for the same data."""
+        digest = hashlib.sha1(json.dumps(self.rows, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+        digest.update(np.ascontiguousarray(self.matrix).tobytes())
+        return digest.hexdigest()
+
+    def save(self, path: str) -> None:
+        """Write centroids, inverted lists, matrix and rows to one .npz (atomic replace)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                matrix=self.matrix,
+                centroids=self.centroids,
+                list_ids=self.list_ids,
+                offsets=self.offsets,
+                nprobe=np.array(self.nprobe),
+                rows=np.array(json.dumps(self.rows, ensure_ascii=False, default=str)),
+                fingerprint=np.array(self.fingerprint()),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path, allow_pickle=False) as data:
+            index = cls.__new__(cls)
+            index._set_data(json.loads(str(data["rows"])), data["matrix"])
+            index._set_lists(data)
+            index.nprobe = int(data["nprobe"])
+        return index
+
+    def _set_lists(self, data) -> None:
+        self.centroids = data["centroids"]
+        self.list_ids = data["list_ids"]
+        self.offsets = data["offsets"]
+        self.build_seconds = 0.0
+
+    def _reuse(self, path: str, nlist: Optional[int]) -> bool:
+        # chi dung lai khi file duoc build tu dung du lieu nay (va cung nlist neu co chi dinh)
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["fingerprint"]) != self.fingerprint():
+                    return False
+                if nlist is not None and len(data["centroids"]) != min(len(self.rows), nlist):
+                    return False
+                self._set_lists(data)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Cannot reuse IVF index {path}: {e}")
+            return False
+        return True
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def search(self, query_embedding: list[float] | np.ndarray, top_k: int = 5,
+               match_threshold: float = 0.3, filters: dict | None = None,
+               nprobe: Optional[int] = None) -> list[dict]:
+        if not len(self.rows) or top_k <= 0:
+            return []
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        mask = self.filter_mask(filters)
+
+        order = np.argsort(-(self.centroids @ q))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probed = 0
+        chunks = []
+        found = 0
+        while probed < self.nlist:
+            for c in order[probed:nprobe]:
+                ids = self.list_ids[self.offsets[c]:self.offsets[c + 1]]
+                if mask is not None:
+                    ids = ids[mask[ids]]
+                chunks.append(ids)
+                found += len(ids)
+            probed = nprobe
+            if found >= top_k or mask is None:
+                break
+            nprobe = min(self.nlist, nprobe * 2)  # filter chat -> mo rong vung tim
+
+        ids = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+        if not len(ids):
+            return []
+        scores = self.matrix[ids] @ q
+        return self._top_k(ids, scores, top_k, match_threshold)
+
@@ -0,0 +1,95 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any
+
+from src.utils.tracing import span
+
+
+class MicroBatchingEmbedder:
+    """get_embedding() from many threads, encoded together in one get_embeddings() call.
+
+    Requests queued while the previous batch was encoding form the next batch. Under
+    concurrent load, the batch also waits up to `max_wait_ms` for more requests to join
+    (up to `max_batch` texts); a lone request is encoded at once. A batch of N queries
+    costs about one forward pass instead of N, and the model is only used from the
+    batcher thread. Everything else (ready, cache, get_embeddings, ...) is delegated to
+    the wrapped client.
+    """
+
+    def __init__(self, client: Any, max_batch: int = 32, max_wait_ms: float = 5.0) -> None:
+        self.client = client
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.batched_texts = 0
+        self.max_seen_batch = 0
+        self._concurrent = False
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        if not text:
+            future.set_result([])
+        else:
+            self._queue.put((text, future))
+        return future
+
+    def get_embedding(self, text: str) -> list[float]:
+        with span("embed", batched=True):
+            return self.submit(text).result()
+
+    async def aget_embedding(self, text: str) -> list[float]:
+        with span("embed", batched=True):
+            return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self) -> list[tuple[str, Future]]:
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        # chi cho them khi dang co tai (nhieu request cung luc); 1 request le khong phai cho max_wait
+        if len(batch) == 1 and not self._concurrent:
+            return batch
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.client.get_embeddings(texts, batch_size=len(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vec in zip(batch, vectors):
+                future.set_result(vec)
+            self._concurrent = len(batch) > 1 or not self._queue.empty()
+            self.batches += 1
+            self.batched_texts += len(batch)
+            self.max_seen_batch = max(self.max_seen_batch, len(batch))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.batched_texts,
+            "avg_batch": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_seen_batch,
+            "queued": self._queue.qsize(),
+        }
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+try:
+    import fcntl  # khoa file giua cac process (Linux/macOS)
+except ImportError:  # Windows
+    fcntl = None
+
+DIGEST_SIZE = 20  # sha1
+EMPTY_DIGEST = b"\x00" * DIGEST_SIZE  # hang mo coi (crash giua luc ghi)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-process LRU over an append-only memory-mapped store.
+
+    On disk (one directory per model):
+      vectors.f32  - float32 rows, appended, read through np.memmap
+      index.bin    - one sha1(model + text) digest per row, same order as vectors.f32
+    """
+
+    def __init__(self, model_name: str, dim: int, cache_dir: Optional[str] = None, lru_size: int = 4096) -> None:
+        self.model_name = model_name
+        self.dim = dim
+        self.lru_size = lru_size
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._rows: dict[bytes, int] = {}
+        self._mmap: Optional[np.memmap] = None
+        self._index_offset = 0
+
+        self.cache_dir = None
+        if cache_dir:
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", model_name).strip("_")
+            self.cache_dir = os.path.join(cache_dir, slug)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+            self._index_path = os.path.join(self.cache_dir, "index.bin")
+            self._refresh_index()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model_name}\x00{normalize_text(text)}".encode("utf-8")).digest()
+
+    def _row_count_on_disk(self) -> int:
+        if not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self.dim * 4)
+
+    def _index_grew(self) -> bool:
+        return os.path.exists(self._index_path) and os.path.getsize(self._index_path) > self._index_offset
+
+    def _refresh_index(self) -> None:
+        # doc phan index moi (do process khac ghi them) va map lai vectors
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        usable = len(data) - len(data) % DIGEST_SIZE
+        n_vectors = self._row_count_on_disk()
+        row = self._index_offset // DIGEST_SIZE
+        for i in range(0, usable, DIGEST_SIZE):
+            if row >= n_vectors:  # vector chua ghi xong -> bo qua
+                break
+            digest = data[i:i + DIGEST_SIZE]
+            if digest != EMPTY_DIGEST:
+                self._rows.setdefault(digest, row)
+            row += 1
+        self._index_offset = row * DIGEST_SIZE
+        if row:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(row, self.dim))
+
+    def _lru_put(self, key: bytes, vec: np.ndarray) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self._key(text)
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vec
+
+            if self.cache_dir:
+                row = self._rows.get(key)
+                if row is None and self._index_grew():
+                    self._refresh_index()
+                    row = self._rows.get(key)
+                if row is not None and self._mmap is not None:
+                    vec = np.array(self._mmap[row])  # copy 1 hang, khong load ca file
+                    self._lru_put(key, vec)
+                    self.disk_hits += 1
+                    return vec
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vec: np.ndarray) -> None:
+        key = self._key(text)
+        vec = np.asarray(vec, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            self._lru_put(key, vec)
+            if not self.cache_dir or key in self._rows:
+                return
+            self._append(key, vec)
+
+    def _append(self, key: bytes, vec: np.ndarray) -> None:
+        with open(self._vectors_path, "ab") as vf, open(self._index_path, "ab") as xf:
+            if fcntl is not None:
+                fcntl.flock(vf, fcntl.LOCK_EX)
+            try:
+                # vector truoc, index sau: index khong bao gio tro toi hang chua ghi
+                row = os.path.getsize(self._vectors_path) // (self.dim * 4)
+                indexed = os.path.getsize(self._index_path) // DIGEST_SIZE
+                if indexed < row:
+                    xf.write(EMPTY_DIGEST * (row - indexed))
+                if os.path.getsize(self._vectors_path) != row * self.dim * 4:
+                    vf.truncate(row * self.dim * 4)  # bo phan hang ghi do
+                vf.write(vec.tobytes())
+                vf.flush()
+                xf.write(key)
+                xf.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(vf, fcntl.LOCK_UN)
+        self._refresh_index()
+
+    def stats(self) -> dict:
+        return {
+            "lru_size": len(self._lru),
+            "disk_rows": len(self._rows),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
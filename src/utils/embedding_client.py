@@ -1,13 +1,159 @@
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.tracing import span
 
 class LocalEmbeddingClient:
-    def __init__(self, model_name: str = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"):
-        print(f"Loading local embedding model: {model_name}...")
-        self.model = SentenceTransformer(model_name)
-        print("Model loaded successfully.")
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2",
+        cache_dir: Optional[str] = None,
+        lru_size: int = 4096,
+        lazy: bool = False,
+        quantize: bool = False,
+        max_seq_length: Optional[int] = None,
+    ):
+        # lazy=True: khong import torch / load model o day; load o lan encode dau tien
+        # hoac trong warm_up() (thread nen) -> app khoi dong ngay
+        # quantize=True: int8 dynamic quantization cho cac nn.Linear (encode query tren CPU),
+        # max_seq_length: cat ngan input (query ngan, attention re hon)
+        self.model_name = model_name
+        self.quantize = quantize
+        self.max_seq_length = max_seq_length
+        self.cache_dir = cache_dir
+        self.lru_size = lru_size
+        self.model = None
+        self.cache: Optional[EmbeddingCache] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self._load_lock = threading.Lock()
+        self._ready = threading.Event()
+        if not lazy:
+            self._ensure_model()
+            self._ready.set()
+
+    @property
+    def cache_key(self) -> str:
+        """Cache namespace: quantized / truncated vectors never mix with fp32 document vectors."""
+        variant = ("int8" if self.quantize else "") + (f"-seq{self.max_seq_length}" if self.max_seq_length else "")
+        return f"{self.model_name}#{variant.strip('-')}" if variant else self.model_name
+
+    @property
+    def ready(self) -> bool:
+        """True once the model is loaded and has run one encode."""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def _ensure_model(self) -> None:
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is not None:
+                return
+            print(f"Loading local embedding model: {self.model_name}...")
+            started = time.perf_counter()
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(self.model_name, device="cpu" if self.quantize else None)
+            if self.quantize:
+                import torch
+
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            if self.max_seq_length:
+                model.max_seq_length = self.max_seq_length
+            # cache_dir=None -> chi LRU trong process, khong ghi xuong disk
+            self.cache = EmbeddingCache(
+                self.cache_key,
+                dim=model.get_sentence_embedding_dimension(),
+                cache_dir=self.cache_dir,
+                lru_size=self.lru_size,
+            )
+            self.model = model
+            self.load_seconds = time.perf_counter() - started
+            print(f"Model loaded successfully ({self.load_seconds:.1f}s).")
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Load the model and run one dummy encode (first encode is much slower than the rest)."""
+        def run():
+            try:
+                self._ensure_model()
+                started = time.perf_counter()
+                self.model.encode("warm up")
+                self.warmup_seconds = time.perf_counter() - started
+                self._ready.set()
+            except Exception as e:
+                print(f"⚠️ Embedding model warm-up failed: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="embedding-warmup", daemon=True)
+        thread.start()
+        return thread
 
     def get_embedding(self, text: str) -> list[float]:
         if not text:
             return []
-        embedding = self.model.encode(text)
-        return embedding.tolist()
+        with span("embed") as s:
+            self._ensure_model()
+            cached = self.cache.get(text)
+            s.set(cache_hit=cached is not None)
+            if cached is not None:
+                return cached.tolist()
+            embedding = self.model.encode(text)
+            self.cache.put(text, embedding)
+            self._ready.set()
+            return embedding.tolist()
+
+    def get_embeddings(
+        self,
+        texts: list[str],
+        batch_size: int = 32,
+        normalize: bool = False,
+        as_numpy: bool = False,
+    ) -> list[list[float]] | np.ndarray:
+        """Embed many texts with one encode call; cached texts are not re-encoded."""
+        with span("embed.batch", texts=len(texts)) as s:
+            self._ensure_model()
+            dim = self.cache.dim
+            out = np.zeros((len(texts), dim), dtype=np.float32)
+            missing: dict[str, list[int]] = {}  # text -> vi tri, text trung chi encode 1 lan
+            for i, text in enumerate(texts):
+                if not text:
+                    continue
+                cached = self.cache.get(text)
+                if cached is not None:
+                    out[i] = cached
+                else:
+                    missing.setdefault(text, []).append(i)
+
+            s.set(encoded=len(missing))
+            if missing:
+                to_encode = list(missing)
+                encoded = self.model.encode(to_encode, batch_size=batch_size, convert_to_numpy=True)
+                for text, vec in zip(to_encode, encoded):
+                    self.cache.put(text, vec)
+                    out[missing[text]] = vec
+
+        if normalize:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.where(norms == 0, 1.0, norms)
+
+        if as_numpy:
+            return out
+        return [row.tolist() if text else [] for text, row in zip(texts, out)]
+
+    def pool(self, workers: Optional[int] = None, **kwargs):
+        """Multi-process EmbeddingPool for bulk encoding with the same model (always fp32) and cache."""
+        from src.utils.embedding_pool import EmbeddingPool
+        if self.cache_key != self.model_name:
+            return EmbeddingPool(self.model_name, workers=workers, **kwargs)
+        # model chua load (lazy) -> pool tu mo cache tren disk, khong load model o process nay
+        return EmbeddingPool(self.model_name, workers=workers, cache=self.cache, cache_dir=self.cache_dir,
+                             lru_size=self.lru_size, **kwargs)
@@ -0,0 +1,176 @@
+import multiprocessing as mp
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional
+
+import numpy as np
+
+from src.utils.embedding_cache import EmbeddingCache
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+
+# state trong moi worker process (spawn -> moi process 1 model rieng)
+_model = None
+
+
+def _init_worker(model_name: str, threads: int, slots: "mp.Queue", pin: bool) -> None:
+    global _model
+    slot = slots.get()
+    # phai set truoc khi import torch thi OpenMP/MKL moi nhan
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if pin and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        mine = cores[slot * threads:(slot + 1) * threads]
+        if mine:
+            os.sched_setaffinity(0, mine)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _model = SentenceTransformer(model_name, device="cpu")
+
+
+def _dimension() -> int:
+    return _model.get_sentence_embedding_dimension()
+
+
+def _encode_chunk(texts: list[str], batch_size: int) -> np.ndarray:
+    return _model.encode(texts, batch_size=batch_size, convert_to_numpy=True).astype(np.float32, copy=False)
+
+
+class EmbeddingPool:
+    """Bulk CPU encoding across a process pool, for ingestion (not for single queries).
+
+    Texts are sorted by length inside windows of `window` texts, so each chunk pads to
+    similar lengths. Chunks of `chunk_size` go to `workers` processes, each pinned to its
+    own `threads_per_worker` cores. iter_encode() yields vectors in input order as soon
+    as the chunks covering them are done, so the reorder buffer never holds more than
+    about one window. With `cache_dir` (and no `cache`) the on-disk EmbeddingCache is
+    opened on the first encode, with the dimension reported by a worker, so the parent
+    process never loads the model.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, workers: Optional[int] = None,
+                 threads_per_worker: Optional[int] = None, chunk_size: int = 64, batch_size: int = 32,
+                 window: int = 4096, pin: bool = True, cache: Optional[EmbeddingCache] = None,
+                 cache_dir: Optional[str] = None, lru_size: int = 4096) -> None:
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        self.model_name = model_name
+        self.workers = workers or cpus
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.window = max(window, chunk_size)
+        self.cache = cache
+        self.cache_dir = cache_dir
+        self.lru_size = lru_size
+
+        ctx = mp.get_context("spawn")  # fork + torch thread pool de bi treo
+        slots = ctx.Queue()
+        for slot in range(self.workers):
+            slots.put(slot)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(model_name, self.threads_per_worker, slots, pin),
+        )
+
+    def _chunks(self, texts: list[str]) -> Iterator[list[int]]:
+        for start in range(0, len(texts), self.window):
+            order = sorted(range(start, min(start + self.window, len(texts))),
+                           key=lambda i: len(texts[i]), reverse=True)
+            for i in range(0, len(order), self.chunk_size):
+                yield order[i:i + self.chunk_size]
+
+    def _open_cache(self) -> None:
+        if self.cache is None and self.cache_dir:
+            dim = self._executor.submit(_dimension).result()
+            self.cache = EmbeddingCache(self.model_name, dim, self.cache_dir, self.lru_size)
+
+    def warm_up(self) -> None:
+        """Load the model in every worker before timing / streaming."""
+        futures = [self._executor.submit(_encode_chunk, ["warm up"], 1) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def iter_encode(self, texts: list[str], batch_size: Optional[int] = None) -> Iterator[np.ndarray]:
+        """Yield one float32 vector per text, in input order."""
+        if not texts:
+            return
+        self._open_cache()
+        batch_size = batch_size or self.batch_size
+        ready: dict[int, np.ndarray] = {}
+        pending: deque = deque()
+        next_i = 0
+        max_in_flight = self.workers * 2
+
+        def drain_one():
+            indices, future = pending.popleft()
+            for i, vec in zip(indices, future.result()):
+                ready[i] = vec
+                if self.cache is not None:
+                    self.cache.put(texts[i], vec)
+
+        for indices in self._chunks(texts):
+            cached, missing = {}, []
+            if self.cache is not None:
+                for i in indices:
+                    vec = self.cache.get(texts[i])
+                    if vec is not None:
+                        cached[i] = vec
+                    else:
+                        missing.append(i)
+            else:
+                missing = indices
+            for i, vec in cached.items():
+                ready[i] = vec
+            if missing:
+                future = self._executor.submit(_encode_chunk, [texts[i] for i in missing], batch_size)
+                pending.append((missing, future))
+
+            while len(pending) >= max_in_flight or (pending and pending[0][1].done()):
+                drain_one()
+            while next_i in ready:
+                yield ready.pop(next_i)
+                next_i += 1
+
+        while pending:
+            drain_one()
+            while next_i in ready:
+                yield ready.pop(next_i)
+                next_i += 1
+
+    def encode(self, texts: list[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Encode texts into one matrix; empty texts are not encoded and keep a zero row."""
+        keep = [i for i, text in enumerate(texts) if text]
+        out = np.zeros((len(texts), 0), dtype=np.float32)
+        for j, vec in enumerate(self.iter_encode([texts[i] for i in keep], batch_size)):
+            if j == 0:
+                out = np.zeros((len(texts), len(vec)), dtype=np.float32)
+            out[keep[j]] = vec
+        return out
+
+    def get_embeddings(self, texts: list[str], batch_size: Optional[int] = None, normalize: bool = False,
+                       as_numpy: bool = False) -> list[list[float]] | np.ndarray:
+        """Same interface as LocalEmbeddingClient.get_embeddings (usable by StreamingIngestor)."""
+        out = self.encode(texts, batch_size)
+        if normalize and len(out):
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.where(norms == 0, 1.0, norms)
+        if as_numpy:
+            return out
+        return [row.tolist() if text else [] for text, row in zip(texts, out)]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,192 @@
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+from src.utils.embedding_batcher import MicroBatchingEmbedder
+
+DEFAULT_SOCKET = "/tmp/football-rag-embedding.sock"
+
+# Wire format (little-endian), one persistent connection per client thread:
+#   request:  op (1 byte) | count (u32) | count x [len (u32) | utf-8 text]
+#             op b"E" = embed texts, b"P" = ping (count = 0)
+#   response: status (u8, 0 = ok) | count (u32) | dim (u32) | count*dim float32
+#             ping:  status | ready (u8) | dim (u32) | len (u32) | model name
+#             error: status = 1 | len (u32) | utf-8 message
+OP_EMBED = b"E"
+OP_PING = b"P"
+HEADER = struct.Struct("<cI")
+U32 = struct.Struct("<I")
+EMBED_HEADER = struct.Struct("<BII")
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytearray:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("embedding server connection closed")
+        buf += chunk
+    return buf  # bytearray -> np.frombuffer ghi duoc
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        sock: socket.socket = self.request
+        embedder: MicroBatchingEmbedder = self.server.embedder
+        while True:
+            try:
+                op, count = HEADER.unpack(_recv_exact(sock, HEADER.size))
+            except ConnectionError:
+                return
+            try:
+                if op == OP_PING:
+                    name = embedder.model_name.encode("utf-8")
+                    dim = embedder.cache.dim if embedder.ready else 0
+                    sock.sendall(struct.pack("<BBII", 0, embedder.ready, dim, len(name)) + name)
+                    continue
+                texts = []
+                for _ in range(count):
+                    (size,) = U32.unpack(_recv_exact(sock, U32.size))
+                    texts.append(_recv_exact(sock, size).decode("utf-8"))
+                # tung text vao batcher chung: gop voi request cua cac client khac
+                futures = [embedder.submit(text) for text in texts]
+                vectors = [f.result() for f in futures]
+                dim = max((len(v) for v in vectors), default=0)
+                out = np.zeros((len(vectors), dim), dtype="<f4")
+                for i, vec in enumerate(vectors):
+                    if len(vec):
+                        out[i] = vec
+                sock.sendall(EMBED_HEADER.pack(0, len(vectors), dim) + out.tobytes())
+            except ConnectionError:
+                return
+            except Exception as e:
+                message = str(e).encode("utf-8")
+                sock.sendall(struct.pack("<BI", 1, len(message)) + message)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Owns one embedding model for every worker process on the node.
+
+    Each connection gets a thread; all texts go through one MicroBatchingEmbedder, so
+    concurrent requests from different workers are encoded in the same forward pass.
+    """
+
+    daemon_threads = True
+    request_queue_size = 256  # nhieu worker x nhieu thread connect cung luc
+
+    def __init__(self, client: Any, socket_path: str = DEFAULT_SOCKET, max_batch: int = 64,
+                 max_wait_ms: float = 5.0) -> None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # socket cu tu lan chay truoc
+        self.socket_path = socket_path
+        self.embedder = MicroBatchingEmbedder(client, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class EmbeddingServerClient:
+    """Drop-in for LocalEmbeddingClient (get_embedding / get_embeddings / ready) backed by EmbeddingServer."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: float = 30.0) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.model_name: Optional[str] = None
+        self.dim: Optional[int] = None
+        self._ready = False
+        self._local = threading.local()  # 1 ket noi / thread, khong can lock
+
+    def _sock(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _reset(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def _call(self, payload: bytes, read) -> Any:
+        # server restart -> ket noi cu hong, thu lai 1 lan voi ket noi moi
+        for attempt in range(2):
+            try:
+                sock = self._sock()
+                sock.sendall(payload)
+                return read(sock)
+            except (ConnectionError, BlockingIOError, socket.timeout):
+                self._reset()
+                if attempt == 1:
+                    raise
+
+    @staticmethod
+    def _raise_error(sock: socket.socket) -> None:
+        (size,) = U32.unpack(_recv_exact(sock, U32.size))
+        raise RuntimeError(f"Embedding server error: {_recv_exact(sock, size).decode('utf-8')}")
+
+    def ping(self) -> dict:
+        def read(sock):
+            status, ready, dim, size = struct.unpack("<BBII", _recv_exact(sock, 10))
+            return {"ready": bool(ready), "dim": dim, "model_name": _recv_exact(sock, size).decode("utf-8")}
+
+        info = self._call(HEADER.pack(OP_PING, 0), read)
+        self.model_name = info["model_name"]
+        if info["ready"]:
+            self._ready, self.dim = True, info["dim"]
+        return info
+
+    @property
+    def ready(self) -> bool:
+        # chi ping den khi server bao ready, sau do nho ket qua
+        if not self._ready:
+            try:
+                self.ping()
+            except OSError:
+                return False
+        return self._ready
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        parts = [HEADER.pack(OP_EMBED, len(texts))]
+        for text in texts:
+            data = text.encode("utf-8")
+            parts += [U32.pack(len(data)), data]
+
+        def read(sock):
+            status = _recv_exact(sock, 1)[0]
+            if status != 0:
+                self._raise_error(sock)
+            count, dim = struct.unpack("<II", _recv_exact(sock, 8))
+            return np.frombuffer(_recv_exact(sock, count * dim * 4), dtype="<f4").reshape(count, dim)
+
+        return self._call(b"".join(parts), read)
+
+    def get_embedding(self, text: str) -> list[float]:
+        if not text:
+            return []
+        return self._embed([text])[0].tolist()
+
+    def get_embeddings(self, texts: list[str], batch_size: int = 32, normalize: bool = False,
+                       as_numpy: bool = False) -> list[list[float]] | np.ndarray:
+        out = self._embed(texts) if texts else np.zeros((0, self.dim or 0), dtype=np.float32)
+        if normalize and len(out):
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.where(norms == 0, 1.0, norms)
+        if as_numpy:
+            return out
+        return [row.tolist() if text else [] for text, row in zip(texts, out)]
+
+    def close(self) -> None:
+        self._reset()
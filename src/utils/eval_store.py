@@ -0,0 +1,190 @@
+import json
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+try:
+    import fcntl  # khoa file giua cac process (Linux/macOS)
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_EVENTS_PATH = "data/evaluation_events.jsonl"
+LEGACY_EVENTS_PATH = "data/evaluation_events.json"
+OFFSET = struct.Struct("<Q")
+
+
+class EvaluationStore:
+    """Append-only store for saved evaluation events, shared by every Streamlit session.
+
+    On disk, next to `path`:
+      <path>            - one JSON event per line, only ever appended
+      <path>.idx        - u64 byte offset of each event, same order (for paginated reads)
+      <path>.meta.json  - counters {total, with_ground_truth, bytes}, replaced atomically
+
+    Appends take an exclusive flock, so concurrent sessions / processes never interleave
+    lines or lose counter updates. Readers never parse the whole file: counts() reads the
+    meta file and read_page() seeks to the events of one page.
+    """
+
+    def __init__(self, path: str = DEFAULT_EVENTS_PATH, legacy_path: Optional[str] = LEGACY_EVENTS_PATH) -> None:
+        self.path = path
+        self._index_path = path + ".idx"
+        self._meta_path = path + ".meta.json"
+        self._lock_path = path + ".lock"
+        self._lock = threading.Lock()  # flock khong chan cac thread cung process
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if legacy_path and os.path.exists(legacy_path) and not os.path.exists(path):
+            with self._locked():
+                # kiem tra lai trong lock: session/process khac co the vua import xong
+                if not os.path.exists(path):
+                    self._import_legacy(legacy_path)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock, open(self._lock_path, "a") as lf:
+            if fcntl is not None:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"total": 0, "with_ground_truth": 0, "bytes": 0}
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)  # ghi atomic
+
+    def _size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _indexed(self) -> int:
+        return os.path.getsize(self._index_path) // OFFSET.size if os.path.exists(self._index_path) else 0
+
+    def _catch_up(self, meta: dict) -> dict:
+        # goi khi dang giu lock: dem tiep phan file ma meta chua tinh (crash giua luc ghi, ghi tay, ...)
+        if meta["bytes"] >= self._size():
+            return meta
+        with open(self._index_path, "ab") as xf:
+            xf.truncate(meta["total"] * OFFSET.size)  # bo offset thua cua lan ghi do
+        offset = meta["bytes"]
+        with open(self.path, "rb") as f, open(self._index_path, "ab") as xf:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # dong ghi do, khong tinh
+                if line.strip():
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        event = None
+                    if isinstance(event, dict):
+                        xf.write(OFFSET.pack(offset))
+                        meta["total"] += 1
+                        meta["with_ground_truth"] += bool(event.get("ground_truth"))
+                offset += len(line)
+        meta["bytes"] = offset
+        self._write_meta(meta)
+        return meta
+
+    def _write_events(self, events: list[dict]) -> dict:
+        with self._locked():
+            return self._write_events_locked(events)
+
+    def _write_events_locked(self, events: list[dict]) -> dict:
+        # goi khi dang giu lock (append, import legacy)
+        meta = self._catch_up(self._read_meta())
+        size = self._size()
+        if size != meta["bytes"]:
+            with open(self.path, "ab") as f:
+                f.truncate(meta["bytes"])  # bo dong ghi do
+        offsets = []
+        with open(self.path, "ab") as f:
+            for event in events:
+                line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+                offsets.append(OFFSET.pack(meta["bytes"]))
+                f.write(line)
+                meta["bytes"] += len(line)
+                meta["total"] += 1
+                meta["with_ground_truth"] += bool(event.get("ground_truth"))
+            f.flush()
+            os.fsync(f.fileno())
+        # event truoc, offset sau, meta cuoi: crash o giua thi _catch_up sua lai
+        with open(self._index_path, "ab") as xf:
+            xf.write(b"".join(offsets))
+        self._write_meta(meta)
+        return meta
+
+    def _import_legacy(self, legacy_path: str) -> None:
+        # data/evaluation_events.json cu (1 list JSON) -> JSONL, file cu giu nguyen; goi khi dang giu lock
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                events = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Không đọc được {legacy_path}: {e}")
+            return
+        if isinstance(events, list) and events:
+            meta = self._write_events_locked([e for e in events if isinstance(e, dict)])
+            print(f"✅ Đã chuyển {meta['total']} event từ {legacy_path} sang {self.path}")
+
+    def append(self, event: dict[str, Any]) -> dict:
+        """Append one event; returns the updated counters."""
+        event.setdefault("timestamp", datetime.now().isoformat())
+        meta = self._write_events([event])
+        return {"total": meta["total"], "with_ground_truth": meta["with_ground_truth"]}
+
+    def counts(self) -> dict:
+        meta = self._read_meta()
+        if meta["bytes"] < self._size():  # process khac dang ghi / meta cu
+            with self._locked():
+                meta = self._catch_up(self._read_meta())
+        return {"total": meta["total"], "with_ground_truth": meta["with_ground_truth"]}
+
+    def read_page(self, page: int = 0, page_size: int = 20, newest_first: bool = True) -> list[dict]:
+        """Events of one page (page 0 = newest when newest_first), reading only those lines."""
+        total = min(self.counts()["total"], self._indexed())
+        if page < 0 or page_size <= 0:
+            return []
+        if newest_first:
+            stop = total - page * page_size
+            start = max(0, stop - page_size)
+        else:
+            start = page * page_size
+            stop = min(total, start + page_size)
+        if start >= stop:
+            return []
+        with open(self._index_path, "rb") as xf:
+            xf.seek(start * OFFSET.size)
+            data = xf.read((stop - start) * OFFSET.size)
+        offsets = [o for (o,) in OFFSET.iter_unpack(data)]
+        if newest_first:
+            offsets.reverse()
+        events = []
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                events.append(json.loads(f.readline()))
+        return events
+
+    def iter_events(self) -> Iterator[dict]:
+        """All events in insertion order, streamed line by line (for export / evaluation scripts)."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.endswith(b"\n") and line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
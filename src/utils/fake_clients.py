@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+from src.rag.answer_cache import normalize_query
+from src.utils.sqlite_client import SQLiteClient, load_data_dir
+from src.utils.single_flight import SingleFlight
+from src.utils.tracing import span
+
+# Stand-ins for SupabaseClient / GeminiClient / the embedding model, for offline
+# benchmarks (scripts_addon/bench_pipeline.py): same interface, local data, injected latency.
+
+
+class Latency:
+    """Injected delay per call: base_ms plus exponential jitter with mean jitter_ms (long tail, like a network)."""
+
+    def __init__(self, base_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0) -> None:
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Delay in seconds."""
+        with self._lock:
+            jitter = self._rng.expovariate(1 / self.jitter_ms) if self.jitter_ms > 0 else 0.0
+        return max(0.0, self.base_ms + jitter) / 1000
+
+    def sleep(self) -> None:
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self) -> None:
+        delay = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class HashEmbeddingClient:
+    """Deterministic bag-of-words hashing embedder (no model); similar texts get similar vectors."""
+
+    def __init__(self, dim: int = 768, latency: Optional[Latency] = None) -> None:
+        self.dim = dim
+        self.model_name = f"hash-{dim}"
+        self.cache_key = self.model_name
+        self.ready = True
+        self.latency = latency or Latency()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get_embedding(self, text: str) -> list[float]:
+        if not text:
+            return []
+        self._count()
+        with span("embed"):
+            self.latency.sleep()
+            return self._vector(text).tolist()
+
+    def get_embeddings(self, texts: list[str], batch_size: int = 32, normalize: bool = False,
+                       as_numpy: bool = False) -> list[list[float]] | np.ndarray:
+        self._count()
+        with span("embed.batch", texts=len(texts)):
+            self.latency.sleep()  # 1 forward pass cho ca batch
+            out = np.vstack([self._vector(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+        if as_numpy:
+            return out
+        return [row.tolist() if text else [] for text, row in zip(texts, out)]
+
+
+class FakeSupabaseClient:
+    """SupabaseClient stand-in: rows from data/ in an in-memory SQLiteClient, each RPC delayed by `latency`.
+
+    search_vectors_multi counts as one round trip, like the match_players_and_teams RPC.
+    """
+
+    def __init__(self, backend: SQLiteClient, latency: Optional[Latency] = None) -> None:
+        self.backend = backend
+        self.latency = latency or Latency()
+        self._lock = threading.Lock()
+        self._calls: dict[str, int] = defaultdict(int)
+
+    @classmethod
+    def from_data_dir(cls, embedding_client: Any, latency: Optional[Latency] = None, data_dir: str = "data",
+                      match_threshold: float = 0.3) -> "FakeSupabaseClient":
+        backend = SQLiteClient(":memory:", match_threshold=match_threshold)
+        load_data_dir(backend, data_dir, embedding_client=embedding_client)
+        return cls(backend, latency)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._calls[name] += 1
+
+    def _rpc(self, name: str, fn, *args) -> Any:
+        self._count(name)
+        with span(f"rpc.{name}"):  # nhu SupabaseClient._request
+            self.latency.sleep()
+            return fn(*args)
+
+    async def _arpc(self, name: str, fn, *args) -> Any:
+        self._count(name)
+        with span(f"rpc.{name}"):
+            await self.latency.asleep()
+            return fn(*args)
+
+    def search_vectors(self, table: str, query_embedding: list[float], filters: dict | None = None,
+                       top_k: int = 5) -> list[dict]:
+        return self._rpc("search_vectors", self.backend.search_vectors, table, query_embedding, filters, top_k)
+
+    def search_vectors_multi(self, queries: dict[str, list[float]], filters: dict | None = None,
+                             top_k: int = 5) -> dict[str, list[dict]]:
+        return self._rpc("search_vectors_multi", self.backend.search_vectors_multi, queries, filters, top_k)
+
+    def search_by_filters(self, table: str, filters: dict | None = None, top_k: int = 5,
+                          sort_field: str | None = None, sort_order: str | None = None) -> list[dict]:
+        return self._rpc("search_by_filters", self.backend.search_by_filters, table, filters, top_k,
+                         sort_field, sort_order)
+
+    def call_ranking_rpc(self, table: str, filters: dict | None, sort_field: str, sort_order: str, top_k: int = 5):
+        return self._rpc("call_ranking_rpc", self.backend.call_ranking_rpc, table, filters, sort_field,
+                         sort_order, top_k)
+
+    async def asearch_vectors(self, table: str, query_embedding: list[float], filters: dict | None = None,
+                              top_k: int = 5) -> list[dict]:
+        return await self._arpc("search_vectors", self.backend.search_vectors, table, query_embedding, filters, top_k)
+
+    async def asearch_vectors_multi(self, queries: dict[str, list[float]], filters: dict | None = None,
+                                    top_k: int = 5) -> dict[str, list[dict]]:
+        return await self._arpc("search_vectors_multi", self.backend.search_vectors_multi, queries, filters, top_k)
+
+    async def asearch_by_filters(self, table: str, filters: dict | None = None, top_k: int = 5,
+                                 sort_field: str | None = None, sort_order: str | None = None) -> list[dict]:
+        return await self._arpc("search_by_filters", self.backend.search_by_filters, table, filters, top_k,
+                                sort_field, sort_order)
+
+    async def acall_ranking_rpc(self, table: str, filters: dict | None, sort_field: str, sort_order: str,
+                                top_k: int = 5):
+        return await self._arpc("call_ranking_rpc", self.backend.call_ranking_rpc, table, filters, sort_field,
+                                sort_order, top_k)
+
+    def upsert(self, table: str, rows: list[dict]) -> list[dict]:
+        return self._rpc("upsert", self.backend.upsert, table, rows)
+
+    def delete(self, table: str, ids: list) -> int:
+        return self._rpc("delete", self.backend.delete, table, ids)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: {"calls": calls} for name, calls in self._calls.items()}
+
+
+ROUTER_QUERY_RE = re.compile(r'Query: "(.*)"\s*JSON Response:', re.S)
+TABLE_QUERY_RE = re.compile(r'Given the question: "(.*)", select the most relevant table', re.S)
+DECOMPOSE_QUERY_RE = re.compile(r'Given this question: "(.*?)"\n', re.S)
+
+
+class FakeGeminiClient:
+    """GeminiClient stand-in: router / table / decomposition prompts are answered from labelled routes,
+    answers are filler text. Each call sleeps `latency` (time to first token) plus `token_ms` per
+    streamed chunk of the answer.
+
+    routes: normalized query -> {"strategy", "table", "filters", "sort_field", "sort_order", "sub_queries"}
+    (the format of data/eval/router_queries.jsonl). Unknown queries route to hybrid on players.
+    """
+
+    def __init__(self, routes: Optional[dict[str, dict]] = None, latency: Optional[Latency] = None,
+                 token_ms: float = 0.0, answer_tokens: int = 60) -> None:
+        self.routes = {normalize_query(q): r for q, r in (routes or {}).items()}
+        self.latency = latency or Latency()
+        self.token_ms = token_ms
+        self.answer_tokens = answer_tokens
+        self.flight = SingleFlight()  # nhu GeminiClient that
+        self._lock = threading.Lock()
+        self.calls: dict[str, int] = defaultdict(int)
+        self.prompt_chars = 0
+
+    def _route(self, query: str) -> dict:
+        return self.routes.get(normalize_query(query)) or {"strategy": "hybrid", "table": "players"}
+
+    def _kind(self, system_prompt: str) -> str:
+        if "Query Router" in system_prompt:
+            return "router"
+        if "decomposing" in system_prompt:
+            return "decompose"
+        if "database assistant" in system_prompt:
+            return "select_table"
+        return "answer"
+
+    def _respond(self, kind: str, user_prompt: str) -> str:
+        if kind == "router":
+            match = ROUTER_QUERY_RE.search(user_prompt)
+            route = self._route(match.group(1) if match else user_prompt)
+            filters = route.get("filters") or {}
+            return json.dumps({
+                "strategy": route.get("strategy", "hybrid"),
+                "filters": {"league": filters.get("league"), "nationality": filters.get("nationality")},
+                "sort": {"field": route.get("sort_field"), "order": route.get("sort_order")},
+                "table": route.get("table", "players"),
+                "sub_queries": route.get("sub_queries"),
+            }, ensure_ascii=False)
+        if kind == "select_table":
+            match = TABLE_QUERY_RE.search(user_prompt)
+            return self._route(match.group(1) if match else user_prompt).get("table", "players")
+        if kind == "decompose":
+            match = DECOMPOSE_QUERY_RE.search(user_prompt)
+            query = match.group(1) if match else user_prompt
+            sub_queries = self._route(query).get("sub_queries") or {"players": query, "teams": query}
+            return json.dumps(sub_queries, ensure_ascii=False)
+        return " ".join(f"token{i}" for i in range(self.answer_tokens))
+
+    def _record(self, kind: str, system_prompt: str, user_prompt: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+            self.prompt_chars += len(system_prompt) + len(user_prompt)
+
+    def _generation_seconds(self, kind: str) -> float:
+        return self.token_ms * self.answer_tokens / 1000 if kind == "answer" else 0.0
+
+    def chat(self, system_prompt: str, user_prompt: str) -> str:
+        return self.flight.do(("chat", system_prompt, " ".join(user_prompt.split())),
+                              self._chat, system_prompt, user_prompt)
+
+    def _chat(self, system_prompt: str, user_prompt: str) -> str:
+        kind = self._kind(system_prompt)
+        self._record(kind, system_prompt, user_prompt)
+        time.sleep(self.latency.sample() + self._generation_seconds(kind))
+        return self._respond(kind, user_prompt)
+
+    def chat_stream(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        kind = self._kind(system_prompt)
+        self._record(kind, system_prompt, user_prompt)
+        self.latency.sleep()
+        for word in self._respond(kind, user_prompt).split(" "):
+            if self.token_ms:
+                time.sleep(self.token_ms / 1000)
+            yield word + " "
+
+    async def achat(self, system_prompt: str, user_prompt: str) -> str:
+        return await self.flight.ado(("achat", system_prompt, " ".join(user_prompt.split())),
+                                     self._achat, system_prompt, user_prompt)
+
+    async def _achat(self, system_prompt: str, user_prompt: str) -> str:
+        kind = self._kind(system_prompt)
+        self._record(kind, system_prompt, user_prompt)
+        await asyncio.sleep(self.latency.sample() + self._generation_seconds(kind))
+        return self._respond(kind, user_prompt)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": dict(self.calls), "total": sum(self.calls.values()), "prompt_chars": self.prompt_chars}
@@ -1,12 +1,18 @@
 ﻿# src/utils/gemini_client.py
 import os
+from typing import Iterator
+import numpy as np
 import google.generativeai as genai
 
+from src.utils.single_flight import SingleFlight
+
 class GeminiClient:
     def __init__(self):
         genai.configure(api_key=os.environ["GEMINI_API_KEY"])
         self.embed_model_name = "models/text-embedding-004"  
         self.chat_model = genai.GenerativeModel('gemini-2.0-flash')
+        # cung prompt dang chay (nhieu user hoi giong nhau) -> 1 request Gemini
+        self.flight = SingleFlight()
     
     def get_embedding(self, text: str) -> list[float]:
         result = genai.embed_content(
@@ -16,8 +22,63 @@ class GeminiClient:
         )
         return result['embedding']
     
+    def get_embeddings(
+        self,
+        texts: list[str],
+        batch_size: int = 100,
+        normalize: bool = False,
+        as_numpy: bool = False,
+        task_type: str = "retrieval_query",
+    ) -> list[list[float]] | np.ndarray:
+        # 1 request cho moi batch (API gioi han 100 text/request)
+        embeddings: list[list[float]] = []
+        for i in range(0, len(texts), batch_size):
+            result = genai.embed_content(
+                model=self.embed_model_name,
+                content=texts[i:i + batch_size],
+                task_type=task_type,
+            )
+            embeddings.extend(result['embedding'])
+
+        if not normalize and not as_numpy:
+            return embeddings
+
+        out = np.asarray(embeddings, dtype=np.float32)
+        if normalize and len(out):
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.where(norms == 0, 1.0, norms)
+        return out if as_numpy else out.tolist()
+
     # Chat
+    @staticmethod
+    def _chat_key(system_prompt: str, user_prompt: str) -> tuple[str, str]:
+        return system_prompt, " ".join(user_prompt.split())
+
     def chat(self, system_prompt: str, user_prompt: str) -> str:
+        return self.flight.do(("chat", self._chat_key(system_prompt, user_prompt)),
+                              self._chat, system_prompt, user_prompt)
+
+    def _chat(self, system_prompt: str, user_prompt: str) -> str:
         full_prompt = f"{system_prompt}User: {user_prompt}"
         response = self.chat_model.generate_content(full_prompt)
+        return response.text
+
+    def chat_stream(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        full_prompt = f"{system_prompt}User: {user_prompt}"
+        response = self.chat_model.generate_content(full_prompt, stream=True)
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:  # chunk khong co text (vd. bi chan / chi co metadata)
+                continue
+            if text:
+                yield text
+
+    async def achat(self, system_prompt: str, user_prompt: str) -> str:
+        return await self.flight.ado(("achat", self._chat_key(system_prompt, user_prompt)),
+                                     self._achat, system_prompt, user_prompt)
+
+    async def _achat(self, system_prompt: str, user_prompt: str) -> str:
+        full_prompt = f"{system_prompt}User: {user_prompt}"
+        response = await self.chat_model.generate_content_async(full_prompt)
         return response.text
\ No newline at end of file
@@ -0,0 +1,586 @@
+import copy
+import csv
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+# ---- transform / document: cung logic voi cac script trong scripts_addon ----
+
+
+def make_player_document(p: dict) -> str:
+    identity = p.get('identity', {}) or {}
+    stats = p.get('season_stats', {}) or {}
+
+    doc = f"""
+Name: {p.get('name', 'Unknown')}
+Position: {identity.get('position', 'N/A')}
+Nationality: {identity.get('nationality', 'N/A')}
+Birth Year: {identity.get('birth_year', 'N/A')}
+Height: {identity.get('height_cm', 'N/A')} cm
+Preferred Foot: {identity.get('preferred_foot', 'N/A')}
+
+Current Club: {p.get('current_club', 'N/A')}
+Current League: {p.get('current_league', 'N/A')}
+Season: {p.get('current_season', 'N/A')}
+
+Season Stats:
+- Matches: {stats.get('matches', 0)}
+- Goals: {stats.get('goals', 0)}
+- Assists: {stats.get('assists', 0)}
+- Minutes: {stats.get('minutes', 0)}
+
+Biography: {p.get('biography', 'N/A')}
+    """.strip()
+
+    return doc
+
+
+def prepare_player_record(player_data: dict) -> dict:
+    identity = player_data.get("identity") or {}
+    # copy sau: khong duoc pop nationality/position khoi raw (document stage con dung)
+    metadata = copy.deepcopy(player_data)
+    metadata.pop("current_league", None)
+    if isinstance(metadata.get("identity"), dict):
+        metadata["identity"].pop("nationality", None)
+        metadata["identity"].pop("position", None)
+
+    return {
+        "player_id": player_data.get("entity_id") or player_data.get("player_id"),
+        "name": player_data.get("name", "unknown"),
+        "current_league": player_data.get("current_league"),
+        "nationality": identity.get("nationality"),
+        "birth_year": identity.get("birth_year"),
+        "position": identity.get("position"),
+        "metadata": metadata,
+        "current_team_id": player_data.get("current_club_id", "unknown"),
+    }
+
+
+def gen_team_bio(team_data: dict) -> str:
+    meta = team_data.get("metadata", {})
+    identity = meta.get("identity", {})
+    venue = meta.get("venue", {})
+    current_league_raw = meta.get("current_league")
+
+    if isinstance(current_league_raw, dict):
+        current_league = current_league_raw
+    else:
+        current_league = {"name": current_league_raw or "unknown"}
+
+    name = identity.get("full_name", team_data.get("name", "unknown"))
+    country = identity.get("country", "unknown")
+    founded_year = identity.get("founded_year", "unknown")
+    city = venue.get("city", "unknown")
+    stadium = venue.get("stadium_name", "unknown")
+    league = current_league.get("name", "unknown")
+
+    bio = f"{name} is a football club from {city}, {country}. Founded in {founded_year}, they compete in {league} and play their home matches at {stadium}."
+    return bio[:200]
+
+
+def prepare_team_record(team_data: dict) -> dict:
+    meta = team_data.get("metadata", {})
+    identity = meta.get("identity", {})
+    current_league_raw = meta.get("current_league")
+
+    if isinstance(current_league_raw, dict):
+        current_league = current_league_raw
+    else:
+        current_league = {"name": current_league_raw or "unknown"}
+
+    return {
+        "team_id": team_data.get("team_id") or team_data.get("entity_id", "unknown"),
+        "name": team_data.get("name") or identity.get("full_name", "unknown"),
+        "country": identity.get("country"),
+        "founded_year": identity.get("founded_year"),
+        "current_league": current_league.get("name", "unknown"),
+        "current_league_id": current_league.get("league_id", "unknown"),
+        "metadata": meta,
+    }
+
+
+def _norm(s: Any) -> str:
+    s = "" if s is None else str(s)
+    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+    return " ".join(s.lower().split())
+
+
+def _num(value: Any, default: Any = None) -> Any:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def csv_player_entity(row: dict) -> dict:
+    """players CSV row -> player entity (same shape as notebooks/players.ipynb)."""
+    name, club, league = _norm(row.get("Player")), _norm(row.get("Squad")), _norm(row.get("Comp"))
+    born = _num(row.get("Born"))
+    return {
+        "entity_type": "player",
+        "entity_id": "player_" + f"{name}_{club}_{league}_2024_2025".replace(" ", "_"),
+        "name": name,
+        "identity": {
+            "birth_year": int(born) if born is not None else None,
+            "nationality": _norm(row.get("Nation")),
+            "position": _norm(row.get("Pos")),
+            "height_cm": None,
+        },
+        "current_season": "2024-2025",
+        "current_club": club,
+        "current_league": league,
+        "season_stats": {
+            "matches": _num(row.get("MP"), 0),
+            "starts": _num(row.get("Starts"), 0),
+            "minutes": _num(str(row.get("Min") or "").replace(",", ""), 0),
+            "goals": _num(row.get("Gls"), 0),
+            "assists": _num(row.get("Ast"), 0),
+        },
+    }
+
+
+TABLE_SPECS: dict[str, tuple[Callable[[dict], dict], Callable[[dict, dict], str]]] = {
+    # table -> (transform raw -> record, document(raw, record))
+    "players": (prepare_player_record, lambda raw, record: make_player_document(raw)),
+    "teams": (prepare_team_record, lambda raw, record: gen_team_bio(raw)),
+}
+
+
+def iter_raw_records(path: str, skip: int = 0) -> Iterator[tuple[int, Any]]:
+    """(record index, raw line / csv row) from a JSONL or CSV file, streamed."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            lines: Any = csv.DictReader(f)
+        else:
+            lines = (line for line in f if line.strip())
+        for i, item in enumerate(lines):
+            if i >= skip:
+                yield i, item
+
+
+def embedding_model_name(embedding_client: Any) -> str:
+    if embedding_client is None:
+        return "none"
+    return (getattr(embedding_client, "model_name", None) or getattr(embedding_client, "embed_model_name", None)
+            or type(embedding_client).__name__)
+
+
+def _digest(value: Any) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingManifest:
+    """Per player_id/team_id: hash of the document, hash of the other columns and the model name.
+
+    plan() decides per record: None (unchanged, skip), False (columns changed, upsert
+    without re-embedding) or True (new row, document changed or model changed -> embed).
+    Entries are only committed after the upsert succeeded. `target` names the storage the
+    hashes describe (backend + database); a manifest written for another target is ignored,
+    since its rows say nothing about what this one holds.
+    """
+
+    ID_KEYS = {"players": "player_id", "teams": "team_id"}
+
+    def __init__(self, path: str, target: Optional[str] = None) -> None:
+        self.path = path
+        self.target = target
+        self.entries: dict[str, dict[str, list]] = {}  # table -> id -> [doc hash, row hash, model]
+        self._seen: dict[str, set] = {}
+        self._planned: dict[str, dict[str, str]] = {}  # table -> id -> row hash (cho commit)
+        self._stats: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if target is not None and state.get("target") != target:
+                print(f"⚠️ Manifest {path} belongs to {state.get('target')!r}, not {target!r}; ignoring it")
+            else:
+                self.entries = state.get("tables", {})
+
+    def plan(self, table: str, record: dict, model_name: str) -> Optional[bool]:
+        key = str(record.get(self.ID_KEYS[table]))
+        doc_hash = _digest(record["document"])
+        row_hash = _digest({k: v for k, v in record.items() if k not in ("document", "embedding")})
+        with self._lock:
+            self._seen.setdefault(table, set()).add(key)
+            self._planned.setdefault(table, {})[key] = row_hash
+            stats = self._stats.setdefault(table, {"unchanged": 0, "updated": 0, "embedded": 0})
+            old = self.entries.get(table, {}).get(key)
+            if old is None or old[0] != doc_hash or old[2] != model_name:
+                stats["embedded"] += 1
+                return True
+            if old[1] != row_hash:
+                stats["updated"] += 1
+                return False
+            stats["unchanged"] += 1
+            return None
+
+    def commit(self, table: str, records: list[dict], model_name: str) -> None:
+        with self._lock:
+            entries = self.entries.setdefault(table, {})
+            planned = self._planned.get(table, {})
+            for record in records:
+                key = str(record.get(self.ID_KEYS[table]))
+                entries[key] = [_digest(record["document"]), planned.pop(key, None), model_name]
+
+    def stale(self, table: str) -> list[str]:
+        seen = self._seen.get(table, set())
+        return [key for key in self.entries.get(table, {}) if key not in seen]
+
+    def forget(self, table: str, ids: list[str]) -> None:
+        with self._lock:
+            for key in ids:
+                self.entries.get(table, {}).pop(key, None)
+
+    def counts(self, table: str) -> dict:
+        return dict(self._stats.get(table, {"unchanged": 0, "updated": 0, "embedded": 0}))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with self._lock, open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"target": self.target, "tables": self.entries}, f)
+        os.replace(tmp, self.path)
+
+
+# ---- pipeline ----
+
+_DONE = object()  # sentinel ket thuc stream
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, items: int, seconds: float, errors: int = 0) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+            self.errors += errors
+
+
+@dataclass
+class Batch:
+    seq: int
+    start: int  # chi so record dau/cuoi trong file
+    end: int
+    raws: list = field(default_factory=list)
+    records: list = field(default_factory=list)
+    embed: list = field(default_factory=list)  # record can embed lai khong
+    failed: bool = False
+
+
+class Checkpoint:
+    """Records done, advanced only over contiguous successful batches (upserts finish out of order)."""
+
+    def __init__(self, path: Optional[str], source: str, table: str) -> None:
+        self.path = path
+        self.key = {"source": os.path.abspath(source), "table": table}
+        self.records_done = 0
+        self._next_seq = 0
+        self._finished: dict[int, Batch] = {}
+        self._blocked = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if {k: state.get(k) for k in self.key} == self.key:
+                self.records_done = state.get("records_done", 0)
+
+    def finish(self, batch: Batch) -> None:
+        with self._lock:
+            self._finished[batch.seq] = batch
+            advanced = False
+            while not self._blocked and self._next_seq in self._finished:
+                done = self._finished.pop(self._next_seq)
+                if done.failed:
+                    self._blocked = True  # batch loi -> lan chay sau lam lai tu day
+                    break
+                self.records_done = done.end
+                self._next_seq += 1
+                advanced = True
+            if advanced:
+                self._save()
+
+    def clear(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({**self.key, "records_done": self.records_done, "updated_at": time.time()}, f)
+        os.replace(tmp, self.path)
+
+
+class StreamingIngestor:
+    """parse -> transform -> document -> embed -> upsert, one thread per stage plus an upsert pool.
+
+    Stages are joined by bounded queues, so memory stays at ~queue_size batches regardless of
+    the input size, embedding of batch n+1 overlaps the upload of batch n, and
+    `upsert_workers` batches are uploaded concurrently. `storage` is anything with
+    `upsert(table, rows)` (SupabaseClient, SQLiteClient); `embedding_client` anything with
+    `get_embeddings(texts, batch_size=...)`, or None to skip the embed stage.
+
+    Records that fail to parse or transform cannot succeed on a re-run, so they are written
+    to `reject_path` (JSONL: index, stage, error, input) and the checkpoint moves past them;
+    failed embed / upsert batches stop the checkpoint so the next run retries them.
+    """
+
+    def __init__(self, table: str, storage: Any, embedding_client: Any = None, batch_size: int = 100,
+                 embed_batch_size: int = 64, upsert_workers: int = 4, queue_size: int = 8,
+                 checkpoint_path: Optional[str] = None, reject_path: Optional[str] = None,
+                 upsert_retries: int = 2,
+                 on_upserted: Optional[Callable[[str, list], None]] = None,
+                 on_deleted: Optional[Callable[[str, list], None]] = None,
+                 manifest: Optional["EmbeddingManifest"] = None) -> None:
+        if table not in TABLE_SPECS:
+            raise ValueError(f"Unknown table: {table}")
+        self.table = table
+        self.storage = storage
+        self.embedding_client = embedding_client
+        self.batch_size = batch_size
+        self.embed_batch_size = embed_batch_size
+        self.upsert_workers = upsert_workers
+        self.queue_size = queue_size
+        self.checkpoint_path = checkpoint_path
+        self.reject_path = reject_path
+        self.rejected = 0
+        self._reject_lock = threading.Lock()
+        self.upsert_retries = upsert_retries
+        self.on_upserted = on_upserted
+        self.on_deleted = on_deleted
+        self.manifest = manifest
+        self.model_name = embedding_model_name(embedding_client)
+        self.stats = {name: StageStats(name) for name in ("parse", "transform", "document", "embed", "upsert")}
+        self._stop = threading.Event()
+
+    def _reject(self, index: int, stage: str, error: Exception, item: Any) -> None:
+        print(f"⚠️ {stage.capitalize()} failed for record {index}: {error}")
+        with self._reject_lock:
+            self.rejected += 1
+            if not self.reject_path:
+                return
+            os.makedirs(os.path.dirname(self.reject_path) or ".", exist_ok=True)
+            line = {"index": index, "stage": stage, "error": str(error), "input": item}
+            with open(self.reject_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+
+    # moi stage: lay tu inbox, xu ly, day sang outbox; sentinel di tiep xuong duoi
+
+    def _parse(self, path: str, skip: int, outbox: queue.Queue) -> None:
+        stats = self.stats["parse"]
+        for index, item in iter_raw_records(path, skip):
+            if self._stop.is_set():
+                break
+            t0 = time.perf_counter()
+            try:
+                raw = csv_player_entity(item) if isinstance(item, dict) else json.loads(item)
+                stats.add(1, time.perf_counter() - t0)
+            except (json.JSONDecodeError, ValueError) as e:
+                self._reject(index, "parse", e, item)
+                stats.add(0, time.perf_counter() - t0, errors=1)
+                raw = None
+            outbox.put((index, raw))
+        outbox.put(_DONE)
+
+    def _transform(self, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        stats = self.stats["transform"]
+        transform = TABLE_SPECS[self.table][0]
+        while (item := inbox.get()) is not _DONE:
+            index, raw = item
+            t0 = time.perf_counter()
+            record = None
+            if raw is not None:
+                try:
+                    record = transform(raw)
+                except Exception as e:
+                    self._reject(index, "transform", e, raw)
+                    stats.add(0, 0.0, errors=1)
+            stats.add(record is not None, time.perf_counter() - t0)
+            outbox.put((index, raw, record))
+        outbox.put(_DONE)
+
+    def _document(self, inbox: queue.Queue, outbox: queue.Queue, first_index: int) -> None:
+        # gom record thanh batch (theo thu tu file) de embed/upsert
+        stats = self.stats["document"]
+        document = TABLE_SPECS[self.table][1]
+        seq = 0
+        batch = Batch(seq, first_index, first_index)
+        while (item := inbox.get()) is not _DONE:
+            index, raw, record = item
+            t0 = time.perf_counter()
+            if record is not None:
+                record["document"] = document(raw, record)
+                plan = True if self.manifest is None else self.manifest.plan(self.table, record, self.model_name)
+                if plan is not None:
+                    batch.raws.append(raw)
+                    batch.records.append(record)
+                    batch.embed.append(plan)
+            batch.end = index + 1
+            stats.add(record is not None, time.perf_counter() - t0)
+            if batch.end - batch.start >= self.batch_size:
+                outbox.put(batch)
+                seq += 1
+                batch = Batch(seq, batch.end, batch.end)
+        if batch.end > batch.start:
+            outbox.put(batch)
+        outbox.put(_DONE)
+
+    def _embed(self, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        stats = self.stats["embed"]
+        while (batch := inbox.get()) is not _DONE:
+            t0 = time.perf_counter()
+            # document khong doi -> upsert cac cot khac, giu embedding cu
+            to_embed = [r for r, embed in zip(batch.records, batch.embed) if embed]
+            if self.embedding_client is not None and to_embed:
+                try:
+                    vectors = self.embedding_client.get_embeddings(
+                        [r["document"] for r in to_embed], batch_size=self.embed_batch_size)
+                    for record, vec in zip(to_embed, vectors):
+                        record["embedding"] = list(vec)
+                    stats.add(len(to_embed), time.perf_counter() - t0)
+                except Exception as e:
+                    print(f"⚠️ Embedding batch {batch.seq} failed: {e}")
+                    batch.failed = True
+                    stats.add(0, time.perf_counter() - t0, errors=len(to_embed))
+            outbox.put(batch)
+        for _ in range(self.upsert_workers):
+            outbox.put(_DONE)
+
+    def _upsert(self, inbox: queue.Queue, checkpoint: Checkpoint) -> None:
+        stats = self.stats["upsert"]
+        while (batch := inbox.get()) is not _DONE:
+            t0 = time.perf_counter()
+            if not batch.failed and batch.records:
+                # bulk upsert PostgREST can cung bo cot: row co embedding moi va row giu embedding cu
+                # (khong co key "embedding") gui rieng, neu khong embedding cu bi ghi NULL
+                embedded = [r for r in batch.records if "embedding" in r]
+                kept = [r for r in batch.records if "embedding" not in r]
+                for rows in (embedded, kept):
+                    if rows and not batch.failed:
+                        self._upsert_rows(batch, rows)
+                if batch.failed:
+                    stats.add(0, time.perf_counter() - t0, errors=len(batch.records))
+                else:
+                    stats.add(len(batch.records), time.perf_counter() - t0)
+                    if self.manifest is not None:
+                        self.manifest.commit(self.table, batch.records, self.model_name)
+                    if self.on_upserted is not None:
+                        self.on_upserted(self.table, batch.records)
+            checkpoint.finish(batch)
+
+    def _upsert_rows(self, batch: Batch, rows: list[dict]) -> None:
+        for attempt in range(self.upsert_retries + 1):
+            try:
+                self.storage.upsert(self.table, rows)
+                return
+            except Exception as e:
+                if attempt == self.upsert_retries:
+                    print(f"⚠️ Upsert batch {batch.seq} (records {batch.start}-{batch.end}) failed: {e}")
+                    batch.failed = True
+                else:
+                    time.sleep(0.5 * 2 ** attempt)
+
+    def run(self, path: str, resume: bool = True, progress_every: float = 5.0) -> dict:
+        checkpoint = Checkpoint(self.checkpoint_path, path, self.table)
+        skip = checkpoint.records_done if resume else 0
+        if skip:
+            print(f"Resuming {self.table} from record {skip} ({self.checkpoint_path})")
+        checkpoint.records_done = skip
+
+        q_parsed: queue.Queue = queue.Queue(self.queue_size * self.batch_size)
+        q_records: queue.Queue = queue.Queue(self.queue_size * self.batch_size)
+        q_batches: queue.Queue = queue.Queue(self.queue_size)
+        q_embedded: queue.Queue = queue.Queue(self.queue_size)
+        threads = [
+            threading.Thread(target=self._parse, args=(path, skip, q_parsed), name="parse"),
+            threading.Thread(target=self._transform, args=(q_parsed, q_records), name="transform"),
+            threading.Thread(target=self._document, args=(q_records, q_batches, skip), name="document"),
+            threading.Thread(target=self._embed, args=(q_batches, q_embedded), name="embed"),
+        ] + [
+            threading.Thread(target=self._upsert, args=(q_embedded, checkpoint), name=f"upsert-{i}")
+            for i in range(self.upsert_workers)
+        ]
+
+        started = time.perf_counter()
+        for t in threads:
+            t.daemon = True
+            t.start()
+        next_report = started + progress_every
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(max(0.0, next_report - time.perf_counter()))
+                    if time.perf_counter() >= next_report:
+                        self._print_progress(time.perf_counter() - started)
+                        next_report += progress_every
+        except KeyboardInterrupt:
+            # dung doc file; cac batch dang chay van xong, checkpoint giu tien do
+            self._stop.set()
+            print("⚠️ Interrupted, draining in-flight batches...")
+            for t in threads:
+                t.join()
+
+        wall = time.perf_counter() - started
+        report = self.report(wall)
+        report["records_done"] = checkpoint.records_done
+        report["rejected"] = self.rejected
+        report["reject_path"] = self.reject_path if self.rejected else None
+        # record bi reject da nam trong reject file, chay lai cung khong hon -> khong giu checkpoint
+        clean = not self._stop.is_set() and not (self.stats["embed"].errors or self.stats["upsert"].errors)
+        if clean:
+            checkpoint.clear()  # chay xong -> lan sau bat dau lai tu dau file
+        if self.manifest is not None:
+            # record reject khong duoc manifest thay -> khong xoa nhu row cu
+            report["manifest"] = self._sync_manifest(complete=clean and skip == 0 and not self.rejected)
+        return report
+
+    def _sync_manifest(self, complete: bool) -> dict:
+        # row bien mat khoi input -> xoa khoi storage; chi khi da doc het file tu dau
+        deleted = 0
+        stale = self.manifest.stale(self.table)
+        if complete and stale:
+            try:
+                self.storage.delete(self.table, stale)
+                self.manifest.forget(self.table, stale)
+                deleted = len(stale)
+                if self.on_deleted is not None:
+                    self.on_deleted(self.table, stale)
+            except Exception as e:
+                print(f"⚠️ Deleting {len(stale)} stale {self.table} rows failed: {e}")
+        elif stale:
+            print(f"Skipping deletion of {len(stale)} stale {self.table} rows (partial run)")
+        self.manifest.save()
+        return {**self.manifest.counts(self.table), "deleted": deleted}
+
+    def _print_progress(self, elapsed: float) -> None:
+        parts = [f"{s.name} {s.items}" for s in self.stats.values()]
+        print(f"[{elapsed:6.1f}s] " + " | ".join(parts))
+
+    def report(self, wall_seconds: float) -> dict:
+        stages = {}
+        for s in self.stats.values():
+            stages[s.name] = {
+                "items": s.items,
+                "errors": s.errors,
+                "busy_s": round(s.busy_seconds, 3),
+                # items/s khi stage ban, va items/s tren tong thoi gian chay
+                "busy_rate": round(s.items / s.busy_seconds, 1) if s.busy_seconds else None,
+                "wall_rate": round(s.items / wall_seconds, 1) if wall_seconds else None,
+            }
+        return {"table": self.table, "wall_s": round(wall_seconds, 3), "stages": stages}
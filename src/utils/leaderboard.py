@@ -0,0 +1,471 @@
+import csv
+import json
+import os
+import unicodedata
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from src.utils.tracing import annotate
+from src.utils.vector_index import filter_label
+
+DEFAULT_SNAPSHOT = "data/cache/leaderboards.json"
+
+# sort_field cua router -> (duong dan trong row, huong): huong -1 khi gia tri luu nguoc voi y nghia
+# (tuoi tang <-> nam sinh giam, CLB lau doi <-> nam thanh lap nho)
+SORT_FIELDS = {
+    "players": {
+        # metadata.stats.*: row ghi boi fill_players.py (giong context_builder.PLAYER_FIELDS)
+        "goals": (("metadata.season_stats.goals", "metadata.stats.goals"), 1),
+        "assists": (("metadata.season_stats.assists", "metadata.stats.assists"), 1),
+        "appearances": (("metadata.season_stats.matches", "metadata.stats.matches_played"), 1),
+        "height": (("metadata.identity.height_cm", "metadata.identity.height", "height_cm"), 1),
+        "age": (("birth_year", "metadata.identity.birth_year"), -1),
+    },
+    "teams": {
+        "goals": (("metadata.season_stats.goals_for",), 1),
+        "appearances": (("metadata.season_stats.played",), 1),
+        "age": (("metadata.identity.founded_year", "founded_year"), -1),
+        "capacity": (("metadata.venue.capacity",), 1),
+    },
+}
+GROUP_PATHS = {
+    "players": {"league": ("current_league", "metadata.current_league"),
+                "nationality": ("nationality", "metadata.identity.nationality")},
+    "teams": {"league": ("current_league", "metadata.current_league.name"),
+              "nationality": ("country", "metadata.identity.country")},
+}
+ID_KEYS = {"players": "player_id", "teams": "team_id"}
+# filter key cua router -> cot group; filter khac (position, club...) khong duoc materialize
+FILTER_GROUPS = {"league": "league", "current_league": "league", "nationality": "nationality", "country": "nationality"}
+GROUPINGS = ((), ("league",), ("nationality",), ("league", "nationality"))
+ORDERS = ("DESC", "ASC")
+DROP_COLUMNS = ("embedding",)  # giu document: row tra ve giong het RPC
+LABEL_SEP = "\x1f"  # noi league + nationality thanh 1 khoa group
+
+
+def _get_path(row: dict, path: str) -> Any:
+    value: Any = row
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _first(row: dict, paths: Iterable[str]) -> Any:
+    for path in paths:
+        value = _get_path(row, path)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _norm(text: Any) -> str:
+    text = "" if text is None else str(text)
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().split())
+
+
+class TableLeaderboard:
+    """Top-N row positions per (league, nationality, sort_field, order) for one table.
+
+    Boards are built with one lexsort per (grouping, field, order); `top` answers from a
+    single precomputed board in O(k). `upsert` / `delete` only recompute boards the
+    changed rows can actually enter or leave.
+    """
+
+    def __init__(self, table: str, rows: Iterable[dict], top_n: int = 50) -> None:
+        self.table = table
+        self.top_n = top_n
+        self.id_key = ID_KEYS[table]
+        self.fields = SORT_FIELDS[table]
+        self.rows: list[dict] = []
+        self._pos: dict[Any, int] = {}
+        self.labels = {g: np.zeros(0, dtype=object) for g in GROUP_PATHS[table]}
+        self.values = {f: np.zeros(0, dtype=np.float64) for f in self.fields}
+        self.boards: dict[tuple, np.ndarray] = {}
+        self.deleted: set = set()
+        self._matches: dict[tuple[str, str], list] = {}  # gia tri filter -> cac nhan khop
+
+        self._append([self._slim(r) for r in rows if r.get(self.id_key) is not None])
+        self.build()
+
+    @staticmethod
+    def _slim(row: dict) -> dict:
+        return {k: v for k, v in row.items() if k not in DROP_COLUMNS}
+
+    def _append(self, rows: list[dict]) -> None:
+        start = len(self.rows)
+        for i, row in enumerate(rows):
+            self._pos[row[self.id_key]] = start + i
+        self.rows.extend(rows)
+        for group, paths in GROUP_PATHS[self.table].items():
+            new = np.array([filter_label(group, _first(r, paths)) for r in rows], dtype=object)
+            self.labels[group] = np.concatenate([self.labels[group], new])
+        self._matches.clear()
+        for field, (paths, sign) in self.fields.items():
+            new = np.array([_number(_first(r, paths)) * sign for r in rows], dtype=np.float64)
+            self.values[field] = np.concatenate([self.values[field], new])
+
+    def _sort_key(self, field: str, order: str) -> np.ndarray:
+        # lexsort sap tang dan -> DESC thi dao dau
+        return -self.values[field] if order == "DESC" else self.values[field]
+
+    def build(self) -> None:
+        self.boards = {}
+        n = len(self.rows)
+        if not n:
+            return
+        for grouping in GROUPINGS:
+            if grouping:
+                combined = self.labels[grouping[0]]
+                for group in grouping[1:]:
+                    combined = combined + LABEL_SEP + self.labels[group]
+                uniq, inverse = np.unique(combined, return_inverse=True)
+            else:
+                uniq, inverse = np.array([""]), np.zeros(n, dtype=np.int64)
+            group_labels = [tuple(u.split(LABEL_SEP)) if grouping else () for u in uniq.tolist()]
+
+            for field in self.fields:
+                for order in ORDERS:
+                    key = self._sort_key(field, order)
+                    idx = np.nonzero(~np.isnan(key))[0]
+                    if not len(idx):
+                        continue
+                    g = inverse[idx]
+                    # sap theo group, roi gia tri, hoa thi giu thu tu row
+                    perm = np.lexsort((idx, key[idx], g))
+                    idx, g = idx[perm], g[perm]
+                    starts = np.searchsorted(g, np.arange(len(uniq)))
+                    keep = np.arange(len(idx)) - starts[g] < self.top_n
+                    idx, g = idx[keep], g[keep]
+                    bounds = np.flatnonzero(np.diff(g)) + 1
+                    for chunk in np.split(idx, bounds):
+                        labels = dict(zip(grouping, group_labels[inverse[chunk[0]]]))
+                        self.boards[self._board_key(field, order, labels)] = chunk
+
+    @staticmethod
+    def _board_key(field: str, order: str, labels: dict) -> tuple:
+        return field, order, labels.get("league"), labels.get("nationality")
+
+    def _recompute(self, board_key: tuple) -> None:
+        field, order, league, nationality = board_key
+        key = self._sort_key(field, order)
+        mask = ~np.isnan(key)
+        if league is not None:
+            mask &= self.labels["league"] == league
+        if nationality is not None:
+            mask &= self.labels["nationality"] == nationality
+        idx = np.nonzero(mask)[0]
+        idx = idx[np.lexsort((idx, key[idx]))][:self.top_n]
+        if len(idx):
+            self.boards[board_key] = idx
+        else:
+            self.boards.pop(board_key, None)
+
+    def _row_board_keys(self, pos: int) -> list[tuple]:
+        row_labels = {g: self.labels[g][pos] for g in self.labels}
+        keys = []
+        for grouping in GROUPINGS:
+            labels = {g: row_labels[g] for g in grouping}
+            for field in self.fields:
+                for order in ORDERS:
+                    keys.append(self._board_key(field, order, labels))
+        return keys
+
+    def _affected(self, pos: int, board_keys: list[tuple], dirty: set) -> None:
+        for board_key in board_keys:
+            if board_key in dirty:
+                continue
+            board = self.boards.get(board_key)
+            if board is None or len(board) < self.top_n or pos in board:
+                dirty.add(board_key)
+                continue
+            field, order = board_key[:2]
+            key = self._sort_key(field, order)
+            # row moi chi vao board neu tot hon phan tu cuoi
+            if not np.isnan(key[pos]) and (key[pos], pos) < (key[board[-1]], board[-1]):
+                dirty.add(board_key)
+
+    def upsert(self, rows: Iterable[dict]) -> int:
+        """Apply changed rows; returns the number of boards recomputed."""
+        dirty: set = set()
+        changed, new_rows = [], []
+        for row in rows:
+            rid = row.get(self.id_key)
+            if rid is None:
+                continue
+            row = self._slim(row)
+            self.deleted.discard(rid)
+            pos = self._pos.get(rid)
+            if pos is None:
+                new_rows.append(row)
+                continue
+            # board cu cua row (truoc khi doi league/nationality) cung phai tinh lai
+            self._affected(pos, self._row_board_keys(pos), dirty)
+            self.rows[pos] = row
+            for group, paths in GROUP_PATHS[self.table].items():
+                self.labels[group][pos] = filter_label(group, _first(row, paths))
+            self._matches.clear()
+            for field, (paths, sign) in self.fields.items():
+                self.values[field][pos] = _number(_first(row, paths)) * sign
+            changed.append(pos)
+
+        if new_rows:
+            start = len(self.rows)
+            self._append(new_rows)
+            changed.extend(range(start, len(self.rows)))
+        for pos in changed:
+            self._affected(pos, self._row_board_keys(pos), dirty)
+        for board_key in dirty:
+            self._recompute(board_key)
+        return len(dirty)
+
+    def delete(self, ids: Iterable[Any]) -> int:
+        dirty: set = set()
+        for rid in ids:
+            pos = self._pos.get(rid)
+            if pos is None:
+                continue
+            self._affected(pos, self._row_board_keys(pos), dirty)
+            for field in self.fields:
+                self.values[field][pos] = np.nan  # row van giu vi tri nhung khong vao board nao
+            self.deleted.add(rid)
+        for board_key in dirty:
+            self._recompute(board_key)
+        return len(dirty)
+
+    def _match_labels(self, group: str, value: Optional[str]) -> list:
+        if value is None:
+            return [None]
+        # giong RPC: "Premier League" khop "eng premier league"
+        key = (group, filter_label(group, value))
+        labels = self._matches.get(key)
+        if labels is None:
+            labels = [label for label in set(self.labels[group].tolist()) if label and key[1] in label]
+            self._matches[key] = labels
+        return labels
+
+    def top(self, filters: dict | None, sort_field: str, sort_order: str | None,
+            top_k: int = 5) -> list[dict] | None:
+        """Ranked rows, or None when this query is not materialized (caller falls back to the RPC)."""
+        if sort_field not in self.fields or top_k > self.top_n:
+            return None
+        order = "ASC" if str(sort_order or "").upper() == "ASC" else "DESC"
+        if (sort_field, order, None, None) not in self.boards:
+            return None  # field khong co gia tri nao trong du lieu local (vd height) -> RPC
+
+        wanted: dict[str, str] = {}
+        for key, value in (filters or {}).items():
+            if not value:
+                continue
+            group = FILTER_GROUPS.get(key)
+            if group is None:
+                return None
+            wanted[group] = str(value)
+
+        leagues = self._match_labels("league", wanted.get("league"))
+        nationalities = self._match_labels("nationality", wanted.get("nationality"))
+        if not leagues or not nationalities:
+            return None  # gia tri filter khong co trong du lieu local -> de RPC quyet dinh
+
+        boards = [self.boards.get((sort_field, order, l, n)) for l in leagues for n in nationalities]
+        boards = [b for b in boards if b is not None]
+        if not boards:
+            return None  # khong row nao cua nhom nay co gia tri -> de RPC quyet dinh
+        if len(boards) == 1:
+            ids = boards[0][:top_k]
+        else:
+            # filter khop nhieu nhan (vd "liga") -> gop cac board nho
+            ids = np.concatenate(boards)
+            key = self._sort_key(sort_field, order)[ids]
+            ids = ids[np.lexsort((ids, key))][:top_k]
+        return [dict(self.rows[i]) for i in ids]
+
+
+class Leaderboards:
+    """Materialized RANKING answers for the players and teams tables."""
+
+    def __init__(self, tables: dict[str, TableLeaderboard]) -> None:
+        self.tables = tables
+
+    @classmethod
+    def from_rows(cls, rows_by_table: dict[str, list[dict]], top_n: int = 50) -> "Leaderboards":
+        return cls({t: TableLeaderboard(t, rows, top_n) for t, rows in rows_by_table.items()})
+
+    @classmethod
+    def from_data_dir(cls, data_dir: str = "data", top_n: int = 50) -> "Leaderboards":
+        data = Path(data_dir)
+        players = load_player_rows(data / "players" / "players_data_light-2024_2025.csv")
+        teams = load_team_rows(data / "teams" / "team_complete_metadata_for_supabase.jsonl")
+        return cls.from_rows({"players": players, "teams": teams}, top_n)
+
+    @classmethod
+    def from_storage(cls, storage: Any, top_n: int = 50) -> "Leaderboards":
+        """Build from the rows the storage itself returns (same columns as its ranking RPC)."""
+        return cls.from_rows({t: storage.search_by_filters(t, None, top_k=storage.count(t))
+                              for t in ("players", "teams")}, top_n)
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_SNAPSHOT, data_dir: str = "data", top_n: int = 50) -> "Leaderboards":
+        """Load the snapshot kept up to date by the ingestion scripts, else build from data/."""
+        if os.path.exists(path):
+            try:
+                return cls.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Leaderboard snapshot unreadable, rebuilding: {e}")
+        return cls.from_data_dir(data_dir, top_n)
+
+    def top(self, table: str, filters: dict | None, sort_field: str, sort_order: str | None,
+            top_k: int = 5) -> list[dict] | None:
+        board = self.tables.get("teams" if table == "teams" else "players")
+        return None if board is None else board.top(filters, sort_field, sort_order, top_k)
+
+    def upsert(self, table: str, rows: Iterable[dict]) -> int:
+        return self.tables[table].upsert(rows) if table in self.tables else 0
+
+    def delete(self, table: str, ids: Iterable[Any]) -> int:
+        return self.tables[table].delete(ids) if table in self.tables else 0
+
+    def save(self, path: str = DEFAULT_SNAPSHOT) -> None:
+        # chi luu rows, board tinh lai khi load (vai chuc ms)
+        payload = {
+            "top_n": next(iter(self.tables.values())).top_n if self.tables else 50,
+            "tables": {t: [r for r in b.rows if r[b.id_key] not in b.deleted] for t, b in self.tables.items()},
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_SNAPSHOT) -> "Leaderboards":
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        return cls.from_rows(payload["tables"], payload.get("top_n", 50))
+
+
+def refresh_snapshot(table: str, rows: list[dict] | None = None, deleted_ids: Iterable[Any] = (),
+                     path: str = DEFAULT_SNAPSHOT, data_dir: str = "data") -> None:
+    """Called by the ingestion scripts after an upsert so ranking answers stay current."""
+    boards = Leaderboards.open(path, data_dir)
+    recomputed = boards.upsert(table, rows or []) + boards.delete(table, deleted_ids)
+    boards.save(path)
+    print(f"Leaderboards '{table}': {len(rows or [])} rows applied, {recomputed} boards recomputed")
+
+
+def load_player_rows(csv_path: str | Path) -> list[dict]:
+    """players CSV -> rows shaped like the players table (see fill_players.prepare_record_for_upsert)."""
+    if not os.path.exists(csv_path):
+        return []
+    rows = []
+    with open(csv_path, "r", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            name, club, league = _norm(r.get("Player")), _norm(r.get("Squad")), _norm(r.get("Comp"))
+            # cung cong thuc make_entity_id trong notebooks/players.ipynb
+            player_id = "player_" + f"{name}_{club}_{league}_2024_2025".replace(" ", "_")
+            birth_year = _number(r.get("Born"))
+            birth_year = None if np.isnan(birth_year) else int(birth_year)
+            rows.append({
+                "player_id": player_id,
+                "name": name,
+                "current_league": league,
+                "nationality": _norm(r.get("Nation")),
+                "birth_year": birth_year,
+                "position": _norm(r.get("Pos")),
+                "metadata": {
+                    "identity": {"birth_year": birth_year, "height_cm": None},
+                    "current_club": club,
+                    "current_season": "2024-2025",
+                    "season_stats": {
+                        "matches": _number(r.get("MP")),
+                        "goals": _number(r.get("Gls")),
+                        "assists": _number(r.get("Ast")),
+                        "minutes": _number(str(r.get("Min") or "").replace(",", "")),
+                    },
+                },
+            })
+    return rows
+
+
+def load_team_rows(jsonl_path: str | Path) -> list[dict]:
+    if not os.path.exists(jsonl_path):
+        return []
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class LeaderboardClient:
+    """SupabaseClient wrapper that answers call_ranking_rpc from materialized leaderboards.
+
+    Queries the leaderboards cannot answer (other filters, top_k above top_n, unknown
+    filter values) go to the RPC. upsert()/delete() refresh the affected boards, and a newer
+    snapshot written by the ingestion scripts is picked up on the next ranking call.
+    """
+
+    def __init__(self, supabase: Any, leaderboards: Leaderboards, snapshot_path: Optional[str] = None) -> None:
+        self.supabase = supabase
+        self.leaderboards = leaderboards
+        self.snapshot_path = snapshot_path
+        self._snapshot_mtime = self._mtime()
+        self.hits = 0
+        self.misses = 0
+
+    def _mtime(self) -> float:
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            return os.path.getmtime(self.snapshot_path)
+        return 0.0
+
+    def _reload_if_changed(self) -> None:
+        mtime = self._mtime()
+        if mtime > self._snapshot_mtime:
+            self.leaderboards = Leaderboards.load(self.snapshot_path)
+            self._snapshot_mtime = mtime
+
+    def _local(self, table: str, filters: dict | None, sort_field: str, sort_order: str, top_k: int):
+        self._reload_if_changed()
+        result = self.leaderboards.top(table, filters, sort_field, sort_order, top_k)
+        annotate(leaderboard_hit=result is not None)  # gan vao span "retrieve"
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def call_ranking_rpc(self, table: str, filters: dict | None, sort_field: str, sort_order: str, top_k: int = 5):
+        result = self._local(table, filters, sort_field, sort_order, top_k)
+        if result is None:
+            return self.supabase.call_ranking_rpc(table, filters, sort_field, sort_order, top_k)
+        return result
+
+    async def acall_ranking_rpc(self, table: str, filters: dict | None, sort_field: str, sort_order: str, top_k: int = 5):
+        result = self._local(table, filters, sort_field, sort_order, top_k)
+        if result is None:
+            return await self.supabase.acall_ranking_rpc(table, filters, sort_field, sort_order, top_k)
+        return result
+
+    def upsert(self, table: str, rows: list[dict]) -> list[dict]:
+        data = self.supabase.upsert(table, rows)
+        self.leaderboards.upsert(table, rows)
+        return data
+
+    def delete(self, table: str, ids: list) -> int:
+        deleted = self.supabase.delete(table, ids)
+        self.leaderboards.delete(table, ids)
+        return deleted
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def __getattr__(self, name: str):
+        return getattr(self.supabase, name)
@@ -0,0 +1,176 @@
+import os
+import tempfile
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.utils.vector_index import VectorIndex
+
+BLOCK_ROWS = 8192
+SCAN_BLOCK = 1024  # so hang int8 giai nen moi lan, vua L2 cache
+
+
+def kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 15, seed: int = 0) -> np.ndarray:
+    """Plain (euclidean) k-means, used to train the PQ sub-codebooks."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, bo |x|^2 vi khong doi argmin
+        assign = np.argmin((centroids ** 2).sum(axis=1) - 2 * data @ centroids.T, axis=1)
+        # sub-vector chi vai chieu -> bincount theo tung chieu nhanh hon np.add.at nhieu
+        sums = np.stack([np.bincount(assign, weights=data[:, d], minlength=n_clusters)
+                         for d in range(data.shape[1])], axis=1)
+        counts = np.bincount(assign, minlength=n_clusters)
+
+        empty = counts == 0
+        new_centroids = sums / np.maximum(counts, 1)[:, None]
+        if empty.any():
+            new_centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+        if np.allclose(new_centroids, centroids, atol=1e-5):
+            centroids = new_centroids
+            break
+        centroids = new_centroids
+    return centroids.astype(np.float32)
+
+
+class QuantizedIndex(VectorIndex):
+    """Compressed cosine index: quantized scan for candidates, then exact re-rank.
+
+    mode="int8": per-dimension symmetric scalar quantization, 1 byte / dim (4x smaller).
+    mode="pq":   product quantization, `pq_m` sub-vectors x 256 centroids, 1 byte / sub-vector
+                 (768 dims, pq_m=96 -> 32x smaller).
+
+    The top `top_k * rerank_factor` candidates of the quantized scan are re-scored with the
+    full-precision vectors, kept on disk (np.memmap) so only the codes stay resident: in
+    `full_precision_path` if given (one file per index), else in an anonymous temp file.
+    `rerank_factor=0` skips the re-rank and drops the full-precision vectors entirely.
+    """
+
+    def __init__(self, rows: Iterable[dict], embedding_key: str = "embedding", mode: str = "int8",
+                 pq_m: int = 96, rerank_factor: int = 4, full_precision_path: Optional[str] = None,
+                 train_size: int = 8192, seed: int = 0) -> None:
+        super().__init__(rows, embedding_key)
+        self._configure(mode, pq_m, rerank_factor, full_precision_path, train_size, seed)
+
+    @classmethod
+    def from_matrix(cls, rows: list[dict], matrix: np.ndarray, mode: str = "int8", pq_m: int = 96,
+                    rerank_factor: int = 4, full_precision_path: Optional[str] = None,
+                    train_size: int = 8192, seed: int = 0) -> "QuantizedIndex":
+        index = cls.__new__(cls)
+        index._set_data(rows, matrix)
+        index._configure(mode, pq_m, rerank_factor, full_precision_path, train_size, seed)
+        return index
+
+    def _configure(self, mode: str, pq_m: int, rerank_factor: int, full_precision_path: Optional[str],
+                   train_size: int, seed: int) -> None:
+        if mode not in ("int8", "pq"):
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.mode = mode
+        self.rerank_factor = rerank_factor
+        if not len(self.rows):
+            self.codes = np.zeros((0, 0), dtype=np.uint8)
+            self.scale = self.codebooks = np.zeros(0, dtype=np.float32)
+            self.pq_m = self.dsub = 0
+            return
+
+        if mode == "int8":
+            self._train_int8()
+        else:
+            self._train_pq(pq_m, train_size, seed)
+
+        if rerank_factor <= 0:
+            self.matrix = None  # khong re-rank -> bo han vector goc
+        elif full_precision_path:
+            # vector goc chi can cho re-rank vai chuc hang -> de tren dia, OS tu cache
+            # ghi file tam roi rename: memmap cua index khac tren file cu khong bi cat (SIGBUS)
+            tmp = full_precision_path + ".tmp"
+            self.matrix.tofile(tmp)
+            os.replace(tmp, full_precision_path)
+            self.matrix = np.memmap(full_precision_path, dtype=np.float32, mode="r", shape=self.matrix.shape)
+        else:
+            # file tam khong ten: tu xoa khi dong, mmap van giu du lieu
+            with tempfile.TemporaryFile() as f:
+                self.matrix.tofile(f)
+                f.flush()
+                self.matrix = np.memmap(f, dtype=np.float32, mode="r", shape=self.matrix.shape)
+
+    def _train_int8(self) -> None:
+        self.scale = np.abs(self.matrix).max(axis=0) / 127.0
+        self.scale[self.scale == 0] = 1.0
+        self.codes = np.clip(np.rint(self.matrix / self.scale), -127, 127).astype(np.int8)
+
+    def _train_pq(self, pq_m: int, train_size: int, seed: int) -> None:
+        dim = self.matrix.shape[1]
+        if dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding dim {dim}")
+        self.pq_m = pq_m
+        self.dsub = dim // pq_m
+        n = len(self.rows)
+        rng = np.random.default_rng(seed)
+        sample = self.matrix[rng.choice(n, min(n, train_size), replace=False)]
+
+        self.codebooks = np.empty((pq_m, min(256, len(sample)), self.dsub), dtype=np.float32)
+        # codes luu theo sub-space (pq_m, n): scan ADC doc lien tuc tung hang
+        self.codes = np.empty((pq_m, n), dtype=np.uint8)
+        for j in range(pq_m):
+            sub = slice(j * self.dsub, (j + 1) * self.dsub)
+            book = kmeans(sample[:, sub], 256, seed=seed + j)
+            self.codebooks[j] = book
+            for start in range(0, n, BLOCK_ROWS):
+                block = self.matrix[start:start + BLOCK_ROWS, sub]
+                self.codes[j, start:start + BLOCK_ROWS] = np.argmin(
+                    (book ** 2).sum(axis=1) - 2 * block @ book.T, axis=1)
+
+    def memory_bytes(self) -> dict:
+        """Resident bytes of the scan structures vs the float32 matrix they replace."""
+        codes = self.codes.nbytes
+        codes += self.scale.nbytes if self.mode == "int8" else self.codebooks.nbytes
+        float32 = len(self.rows) * self.dim * 4
+        resident_full = 0 if self.matrix is None or isinstance(self.matrix, np.memmap) else self.matrix.nbytes
+        return {"codes": codes, "float32": float32, "resident_full_precision": resident_full,
+                "compression": float32 / max(1, codes)}
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1] if self.mode == "int8" else self.pq_m * self.dsub
+
+    def approximate_scores(self, q: np.ndarray) -> np.ndarray:
+        if self.mode == "int8":
+            qs = q * self.scale  # gop scale vao query: score = codes . (q * scale)
+            scores = np.empty(len(self.rows), dtype=np.float32)
+            for start in range(0, len(scores), SCAN_BLOCK):
+                scores[start:start + SCAN_BLOCK] = self.codes[start:start + SCAN_BLOCK].astype(np.float32) @ qs
+            return scores
+        # ADC: bang tra cuu q_sub . centroid cho tung sub-space, roi cong theo code
+        lut = np.einsum("mkd,md->mk", self.codebooks, q.reshape(self.pq_m, self.dsub))
+        scores = np.zeros(len(self.rows), dtype=np.float32)
+        for j in range(self.pq_m):
+            scores += lut[j].take(self.codes[j])
+        return scores
+
+    def search(self, query_embedding: list[float] | np.ndarray, top_k: int = 5,
+               match_threshold: float = 0.3, filters: dict | None = None,
+               rerank_factor: Optional[int] = None) -> list[dict]:
+        if not len(self.rows) or top_k <= 0:
+            return []
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        scores = self.approximate_scores(q)
+        mask = self.filter_mask(filters)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        rerank_factor = self.rerank_factor if rerank_factor is None else rerank_factor
+        if rerank_factor <= 0 or self.matrix is None:
+            return self._top_k(np.arange(len(scores)), scores, top_k, match_threshold)
+
+        n_candidates = min(len(scores), top_k * rerank_factor)
+        ids = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        if mask is not None:
+            ids = ids[mask[ids]]
+        if not len(ids):
+            return []
+        ids = np.sort(ids)  # doc memmap theo thu tu tang dan
+        return self._top_k(ids, self.matrix[ids] @ q, top_k, match_threshold)
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable
+
+import numpy as np
+
+from src.utils.tracing import span
+
+
+class _LeaderCancelled(Exception):
+    """Set on the shared future when the leader was cancelled: waiters retry instead of failing."""
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and all get its result.
+
+    Only calls that overlap in time are merged (no caching): once the leader finishes,
+    the next call with that key runs again. Errors are propagated to every waiter, except
+    the leader's own cancellation (client disconnect in api.py): then one waiter takes over.
+    A waiter records its wait as a "coalesced" span.
+    """
+
+    def __init__(self) -> None:
+        self.executed = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.executed += 1
+            return future, True
+
+    def _finish(self, key: Hashable) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+    @staticmethod
+    def _wait_span(key: Hashable):
+        return span("coalesced", coalesced=True, call=key[0] if isinstance(key, tuple) else None)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        future, leader = self._join(key)
+        if not leader:
+            with self._wait_span(key):
+                return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._finish(key)
+        future.set_result(result)
+        return result
+
+    async def ado(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                with self._wait_span(key):
+                    # shield: waiter bi huy khong duoc huy future chung cua cac caller khac
+                    return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                continue  # leader bi huy -> vong lai, 1 waiter thanh leader moi
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._finish(key)
+        future.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+def _freeze(value: Any) -> Any:
+    # vector (embedding) -> sha1 cua bytes, khong dump 768 so float ra JSON
+    if isinstance(value, np.ndarray) or (isinstance(value, list) and value and isinstance(value[0], float)):
+        return hashlib.sha1(np.asarray(value, dtype=np.float32).tobytes()).hexdigest()
+    if isinstance(value, dict):
+        return {str(k): _freeze(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_freeze(v) for v in value]
+    return value
+
+
+def call_key(*parts: Any) -> str:
+    """Stable key for call arguments (dicts, lists, embeddings)."""
+    frozen = json.dumps(_freeze(list(parts)), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(frozen.encode("utf-8")).hexdigest()
+
+
+class CoalescingStorage:
+    """Storage client wrapper: identical in-flight reads (same method and arguments) run once."""
+
+    READS = ("search_vectors", "search_vectors_multi", "search_by_filters", "call_ranking_rpc")
+
+    def __init__(self, storage: Any) -> None:
+        self.storage = storage
+        self.flight = SingleFlight()
+
+    def _wrap(self, name: str):
+        fn = getattr(self.storage, name)
+
+        def call(*args, **kwargs):
+            key = (name, call_key(args, kwargs))
+            return self.flight.do(key, fn, *args, **kwargs)
+
+        async def acall(*args, **kwargs):
+            key = (name, call_key(args, kwargs))
+            return await self.flight.ado(key, fn, *args, **kwargs)
+
+        return acall if asyncio.iscoroutinefunction(fn) else call
+
+    def __getattr__(self, name: str):
+        if name in self.READS or (name.startswith("a") and name[1:] in self.READS):
+            return self._wrap(name)
+        return getattr(self.storage, name)
+
+    def stats(self) -> dict:
+        inner = getattr(self.storage, "stats", None)
+        return {"coalescing": self.flight.stats(), **({"storage": inner()} if inner else {})}
@@ -0,0 +1,336 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from src.utils.leaderboard import load_player_rows, load_team_rows
+from src.utils.vector_index import FILTER_COLUMNS, VectorIndex, filter_matches, parse_embedding
+
+DEFAULT_DB_PATH = "data/football.db"
+
+COLUMNS = {
+    "players": ("player_id", "name", "current_league", "nationality", "birth_year", "position",
+                "current_team_id", "metadata", "document", "embedding"),
+    "teams": ("team_id", "name", "country", "founded_year", "current_league", "current_league_id",
+              "metadata", "document", "embedding"),
+}
+PRIMARY_KEYS = {"players": "player_id", "teams": "team_id"}
+
+# sort_field cua ranking RPC -> (bieu thuc SQL, huong); bieu thuc phai giong het index ben duoi
+RANKING_EXPRESSIONS = {
+    "players": {
+        "goals": ("json_extract(metadata, '$.season_stats.goals')", 1),
+        "assists": ("json_extract(metadata, '$.season_stats.assists')", 1),
+        "appearances": ("json_extract(metadata, '$.season_stats.matches')", 1),
+        "height": ("json_extract(metadata, '$.identity.height_cm')", 1),
+        "age": ("birth_year", -1),
+    },
+    "teams": {
+        "goals": ("json_extract(metadata, '$.season_stats.goals_for')", 1),
+        "appearances": ("json_extract(metadata, '$.season_stats.played')", 1),
+        "points": ("json_extract(metadata, '$.season_stats.points')", 1),
+        "age": ("founded_year", -1),
+        "capacity": ("json_extract(metadata, '$.venue.capacity')", 1),
+    },
+}
+FILTER_INDEX_COLUMNS = {"players": ("current_league", "nationality", "position"), "teams": ("current_league", "country")}
+JSON_PATH_RE = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+
+def _schema() -> list[str]:
+    statements = [
+        """CREATE TABLE IF NOT EXISTS players (
+            player_id TEXT PRIMARY KEY, name TEXT, current_league TEXT, nationality TEXT,
+            birth_year INTEGER, position TEXT, current_team_id TEXT,
+            metadata TEXT, document TEXT, embedding BLOB)""",
+        """CREATE TABLE IF NOT EXISTS teams (
+            team_id TEXT PRIMARY KEY, name TEXT, country TEXT, founded_year INTEGER,
+            current_league TEXT, current_league_id TEXT,
+            metadata TEXT, document TEXT, embedding BLOB)""",
+    ]
+    for table, columns in FILTER_INDEX_COLUMNS.items():
+        for column in columns:
+            statements.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column} COLLATE NOCASE)")
+    # JSON1 expression index cho moi truong sort -> ORDER BY ... LIMIT k doc thang tu index
+    for table, fields in RANKING_EXPRESSIONS.items():
+        for field, (expression, _) in fields.items():
+            statements.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_rank_{field} ON {table}({expression})")
+    return statements
+
+
+class SQLiteClient:
+    """Local SQLite backend with the SupabaseClient interface (no network hop for storage).
+
+    Rows keep the Supabase shape: flat filter columns plus a `metadata` JSON object.
+    Embeddings are float32 BLOBs; search_vectors runs on an in-process VectorIndex that is
+    rebuilt lazily after writes to the table.
+
+    Filters match like the RPCs (case-insensitive containment, "Brazil" matches "br BRA"):
+    the filter value is resolved against the column's distinct values, then the query uses
+    `column COLLATE NOCASE IN (...)`, which the NOCASE indexes serve.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, match_threshold: float = 0.3) -> None:
+        self.db_path = db_path
+        self.match_threshold = match_threshold
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            for statement in _schema():
+                self.conn.execute(statement)
+        self._indexes: dict[str, VectorIndex] = {}
+        self._distinct: dict[tuple[str, str], list[str]] = {}  # gia tri distinct cua cot filter
+
+    # ---- doc / ghi row ----
+
+    @staticmethod
+    def _table(table: str) -> str:
+        return "teams" if table == "teams" else "players"
+
+    def _encode(self, table: str, row: dict) -> dict:
+        # chi ghi cac cot co trong row, giong upsert PostgREST (row thieu cot -> giu gia tri cu)
+        values = {c: row[c] for c in COLUMNS[table] if c in row}
+        if "metadata" not in row:
+            return self._encode_embedding(values)
+        metadata = row.get("metadata") or {}
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        # cot phang lay tu metadata khi row chi co metadata (vd file JSONL cua teams)
+        if table == "teams":
+            league = metadata.get("current_league")
+            values.setdefault("current_league", league.get("name") if isinstance(league, dict) else league)
+            values.setdefault("country", (metadata.get("identity") or {}).get("country"))
+            values.setdefault("founded_year", (metadata.get("identity") or {}).get("founded_year"))
+        else:
+            values.setdefault("current_league", metadata.get("current_league"))
+            values.setdefault("nationality", (metadata.get("identity") or {}).get("nationality"))
+            values.setdefault("birth_year", (metadata.get("identity") or {}).get("birth_year"))
+
+        values["metadata"] = json.dumps(metadata, ensure_ascii=False)
+        return self._encode_embedding(values)
+
+    @staticmethod
+    def _encode_embedding(values: dict) -> dict:
+        if "embedding" in values:
+            vec = parse_embedding(values["embedding"])
+            values["embedding"] = None if vec is None else vec.astype(np.float32).tobytes()
+        return values
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> dict:
+        out = {k: row[k] for k in row.keys() if k != "embedding"}
+        if out.get("metadata"):
+            out["metadata"] = json.loads(out["metadata"])
+        return out
+
+    def _write(self, table: str, rows: list[dict], upsert: bool) -> list[dict]:
+        table = self._table(table)
+        key = PRIMARY_KEYS[table]
+        with self._lock, self.conn:
+            for row in rows:
+                values = self._encode(table, row)
+                columns = ", ".join(values)
+                placeholders = ", ".join("?" for _ in values)
+                sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+                if upsert:
+                    updates = ", ".join(f"{c} = excluded.{c}" for c in values if c != key)
+                    sql += f" ON CONFLICT({key}) DO UPDATE SET {updates}" if updates else f" ON CONFLICT({key}) DO NOTHING"
+                self.conn.execute(sql, list(values.values()))
+            self._invalidate(table)
+        return rows
+
+    def insert(self, table: str, rows: list[dict]) -> list[dict]:
+        """Insert rows into table"""
+        return self._write(table, rows, upsert=False)
+
+    def upsert(self, table: str, rows: list[dict]) -> list[dict]:
+        """Upsert rows into table"""
+        return self._write(table, rows, upsert=True)
+
+    def delete(self, table: str, ids: list[Any]) -> int:
+        table = self._table(table)
+        with self._lock, self.conn:
+            cur = self.conn.executemany(f"DELETE FROM {table} WHERE {PRIMARY_KEYS[table]} = ?", [(i,) for i in ids])
+            self._invalidate(table)
+        return cur.rowcount
+
+    def _invalidate(self, table: str) -> None:
+        self._indexes.pop(table, None)
+        for key in [k for k in self._distinct if k[0] == table]:
+            self._distinct.pop(key, None)
+
+    def _query(self, sql: str, params: list) -> list[dict]:
+        with self._lock:
+            return [self._decode(r) for r in self.conn.execute(sql, params).fetchall()]
+
+    # ---- vector search ----
+
+    def _vector_index(self, table: str) -> VectorIndex:
+        index = self._indexes.get(table)
+        if index is None:
+            with self._lock:
+                cur = self.conn.execute(f"SELECT * FROM {table} WHERE embedding IS NOT NULL")
+                rows, vectors = [], []
+                for r in cur.fetchall():
+                    rows.append(self._decode(r))
+                    vectors.append(np.frombuffer(r["embedding"], dtype=np.float32))
+            matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+            index = VectorIndex.from_matrix(rows, matrix)
+            self._indexes[table] = index
+        return index
+
+    def search_vectors(
+        self,
+        table: str,
+        query_embedding: list[float],
+        filters: dict | None = None,
+        top_k: int = 5,
+    ) -> list[dict]:
+        """Search vectors using embedding"""
+        return self._vector_index(self._table(table)).search(query_embedding, top_k, self.match_threshold, filters)
+
+    def search_vectors_multi(
+        self,
+        queries: dict[str, list[float]],
+        filters: dict | None = None,
+        top_k: int = 5,
+    ) -> dict[str, list[dict]]:
+        return {table: self.search_vectors(table, embedding, filters, top_k) for table, embedding in queries.items()}
+
+    async def asearch_vectors_multi(self, queries: dict[str, list[float]], filters: dict | None = None,
+                                    top_k: int = 5) -> dict[str, list[dict]]:
+        return self.search_vectors_multi(queries, filters, top_k)
+
+    # ---- filter / ranking ----
+
+    def _labels(self, table: str, column: str) -> list[str]:
+        key = (table, column)
+        labels = self._distinct.get(key)
+        if labels is None:
+            with self._lock:
+                # doc thang tu index NOCASE, vai tram gia tri
+                cur = self.conn.execute(
+                    f"SELECT DISTINCT {column} COLLATE NOCASE FROM {table} WHERE {column} IS NOT NULL")
+                labels = [r[0] for r in cur.fetchall()]
+            self._distinct[key] = labels
+        return labels
+
+    def _where(self, table: str, filters: dict | None) -> tuple[str, list]:
+        clauses, params = [], []
+        for key, value in (filters or {}).items():
+            if value in (None, ""):
+                continue
+            column = FILTER_COLUMNS.get(key, key)
+            if table == "teams" and column == "nationality":
+                column = "country"
+            if column in COLUMNS[table]:
+                matched = [label for label in self._labels(table, column) if filter_matches(column, label, value)]
+                if not matched:
+                    clauses.append("0")  # gia tri khong co trong bang
+                    continue
+                clauses.append(f"{column} COLLATE NOCASE IN ({', '.join('?' for _ in matched)})")
+                params.extend(matched)
+            elif JSON_PATH_RE.match(key):
+                # truong trong metadata: khong co index, khop chuoi con
+                clauses.append(f"json_extract(metadata, '$.{key}') LIKE ?")
+                params.append(f"%{value}%")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def search_by_filters(self, table: str, filters: dict | None = None, top_k: int = 5,
+                          sort_field: str | None = None, sort_order: str | None = None) -> list[dict]:
+        """Search by filters with optional sorting"""
+        table = self._table(table)
+        where, params = self._where(table, filters)
+        order = ""
+        if sort_field and sort_order and JSON_PATH_RE.match(sort_field):
+            order = f" ORDER BY json_extract(metadata, '$.{sort_field}') {'DESC' if sort_order == 'DESC' else 'ASC'}"
+        return self._query(f"SELECT * FROM {table}{where}{order} LIMIT ?", params + [top_k])
+
+    def call_ranking_rpc(self, table: str, filters: dict | None, sort_field: str, sort_order: str, top_k: int = 5):
+        table = self._table(table)
+        spec = RANKING_EXPRESSIONS[table].get(sort_field)
+        if spec is None:
+            if not JSON_PATH_RE.match(sort_field or ""):
+                return []
+            spec = (f"json_extract(metadata, '$.{sort_field}')", 1)
+        expression, sign = spec
+        descending = (str(sort_order).upper() != "ASC") == (sign > 0)
+
+        where, params = self._where(table, filters)
+        where += (" AND " if where else " WHERE ") + f"{expression} IS NOT NULL"
+        sql = f"SELECT * FROM {table}{where} ORDER BY {expression} {'DESC' if descending else 'ASC'} LIMIT ?"
+        return self._query(sql, params + [top_k])
+
+    # ---- async: SQLite local, goi truc tiep ----
+
+    async def asearch_vectors(self, table: str, query_embedding: list[float], filters: dict | None = None,
+                              top_k: int = 5) -> list[dict]:
+        return self.search_vectors(table, query_embedding, filters, top_k)
+
+    async def asearch_by_filters(self, table: str, filters: dict | None = None, top_k: int = 5,
+                                 sort_field: str | None = None, sort_order: str | None = None) -> list[dict]:
+        return await asyncio.to_thread(self.search_by_filters, table, filters, top_k, sort_field, sort_order)
+
+    async def acall_ranking_rpc(self, table: str, filters: dict | None, sort_field: str, sort_order: str, top_k: int = 5):
+        return await asyncio.to_thread(self.call_ranking_rpc, table, filters, sort_field, sort_order, top_k)
+
+    def count(self, table: str) -> int:
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self._table(table)}").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def player_document(row: dict) -> str:
+    # ban rut gon cua make_player_document cho row tu CSV (chua co biography)
+    meta = row.get("metadata") or {}
+    stats = meta.get("season_stats") or {}
+    return (f"Name: {row.get('name')}\nPosition: {row.get('position')}\nNationality: {row.get('nationality')}\n"
+            f"Birth Year: {row.get('birth_year')}\nCurrent Club: {meta.get('current_club')}\n"
+            f"Current League: {row.get('current_league')}\nSeason: {meta.get('current_season')}\n"
+            f"Season Stats:\n- Matches: {stats.get('matches')}\n- Goals: {stats.get('goals')}\n"
+            f"- Assists: {stats.get('assists')}\n- Minutes: {stats.get('minutes')}")
+
+
+def load_data_dir(client: SQLiteClient, data_dir: str = "data", embedding_client: Optional[Any] = None,
+                  batch_size: int = 64) -> dict[str, int]:
+    """Fill the SQLite tables from the files under data/.
+
+    players: data/players/players.jsonl (Supabase-shaped export, may carry embeddings) if present,
+    else the players CSV. teams: team_complete_metadata_for_supabase.jsonl. With an
+    embedding_client, rows without an embedding get one from their document.
+    """
+    data = Path(data_dir)
+    players_jsonl = data / "players" / "players.jsonl"
+    if players_jsonl.exists():
+        with open(players_jsonl, "r", encoding="utf-8") as f:
+            players = [json.loads(line) for line in f if line.strip()]
+    else:
+        players = load_player_rows(data / "players" / "players_data_light-2024_2025.csv")
+    teams = load_team_rows(data / "teams" / "team_complete_metadata_for_supabase.jsonl")
+
+    counts = {}
+    for table, rows in (("players", players), ("teams", teams)):
+        for row in rows:
+            if not row.get("document") and table == "players":
+                row["document"] = player_document(row)
+        if embedding_client is not None:
+            missing = [r for r in rows if r.get("embedding") is None and r.get("document")]
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                vectors = embedding_client.get_embeddings([r["document"] for r in batch], batch_size=batch_size)
+                for row, vec in zip(batch, vectors):
+                    row["embedding"] = vec
+        client.upsert(table, rows)
+        counts[table] = len(rows)
+    return counts
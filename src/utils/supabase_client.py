@@ -1,11 +1,118 @@
+import asyncio
+import contextvars
 import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
 from supabase import create_client, Client
 
+from src.utils.tracing import annotate, span
+
+# loi tam thoi -> thu lai (chi voi request doc, idempotent)
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+MULTI_RPC = "match_players_and_teams"  # scripts_addon/sql/match_players_and_teams.sql
+
+
+class RetryableStatus(Exception):
+    def __init__(self, response: httpx.Response) -> None:
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
 class SupabaseClient:
-    def __init__(self) -> None:
+    def __init__(self, timeout: float = 10.0, connect_timeout: float = 3.0, max_retries: int = 2,
+                 backoff: float = 0.1, pool_size: int = 20) -> None:
         url: str = os.environ["SUPABASE_URL"]
         key: str = os.environ["SUPABASE_SERVICE_KEY"]
-        self.client = create_client(url, key)
+        self.client = create_client(url, key)  # van dung cho upsert/insert/table()
+
+        # 1 httpx.Client dung chung cho cac RPC doc: ket noi keep-alive trong pool,
+        # khong TLS handshake lai moi request
+        self.http = httpx.Client(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}", "Content-Type": "application/json"},
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                keepalive_expiry=60.0),
+        )
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="supabase")
+        self._multi_rpc_available = True
+
+        self._stats_lock = threading.Lock()
+        self._calls: dict[str, int] = defaultdict(int)
+        self._errors: dict[str, int] = defaultdict(int)
+        self._retries: dict[str, int] = defaultdict(int)
+        self._latency_ms: dict[str, deque] = defaultdict(lambda: deque(maxlen=1024))
+
+    def _record(self, name: str, started: float, ok: bool) -> None:
+        with self._stats_lock:
+            self._calls[name] += 1
+            if not ok:
+                self._errors[name] += 1
+            self._latency_ms[name].append((time.perf_counter() - started) * 1000)
+
+    def _request(self, name: str, method: str, path: str, json: dict | None = None,
+                 params: dict | None = None, deadline: float | None = None, idempotent: bool = True):
+        """One PostgREST call with a per-call deadline (seconds) and jittered retries for reads."""
+        with span(f"rpc.{name}", method=method) as s:
+            result = self._send(name, method, path, json, params, deadline, idempotent)
+            if isinstance(result, list):
+                s.set(rows=len(result))
+            return result
+
+    def _send(self, name: str, method: str, path: str, json: dict | None, params: dict | None,
+              deadline: float | None, idempotent: bool):
+        started = time.perf_counter()
+        attempts = self.max_retries + 1 if idempotent else 1
+        last_error: Exception | None = None
+        for attempt in range(attempts):
+            timeout = httpx.USE_CLIENT_DEFAULT
+            if deadline is not None:
+                remaining = deadline - (time.perf_counter() - started)
+                if remaining <= 0:
+                    break
+                timeout = remaining
+            try:
+                resp = self.http.request(method, path, json=json, params=params, timeout=timeout)
+                if resp.status_code in RETRY_STATUS:
+                    raise RetryableStatus(resp)
+                resp.raise_for_status()
+                self._record(name, started, ok=True)
+                return resp.json()
+            except (httpx.TransportError, RetryableStatus) as e:
+                last_error = e
+                if attempt == attempts - 1:
+                    break
+                with self._stats_lock:
+                    self._retries[name] += 1
+                annotate(retries=attempt + 1)
+                # full jitter: ngu ngau nhien trong [0, backoff * 2^attempt] de cac worker khong retry cung luc
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                if deadline is not None:
+                    remaining = deadline - (time.perf_counter() - started)
+                    if remaining <= 0:
+                        break
+                    delay = min(delay, remaining)  # khong ngu qua deadline
+                time.sleep(delay)
+            except httpx.HTTPStatusError:
+                self._record(name, started, ok=False)
+                raise
+        self._record(name, started, ok=False)
+        if isinstance(last_error, RetryableStatus):
+            last_error.response.raise_for_status()
+        raise last_error or httpx.TimeoutException(f"{name}: deadline exceeded")
+
+    def rpc(self, name: str, payload: dict, deadline: float | None = None):
+        return self._request(name, "POST", f"/rpc/{name}", json=payload, deadline=deadline)
+
+    # loi (HTTP / mang / het deadline) duoc raise, khong tra [] -> phan biet duoc voi "khong co ket qua"
+    # deadline: giay cho ca lan goi, tinh ca retry
 
     def search_vectors(
         self,
@@ -13,25 +120,70 @@ class SupabaseClient:
         query_embedding: list[float],
         filters: dict | None = None,
         top_k: int = 5,
+        deadline: float | None = None,
     ) -> list[dict]:
         """Search vectors using embedding"""
-        
+
         # Select RPC based on table
         rpc_name = "match_teams" if table == "teams" else "match_players"
-        
+
         payload = {
             "query_embedding": query_embedding,
             "match_count": top_k,
             "match_threshold": 0.3, # Default threshold
             "filter": filters or {},
         }
-        
-        try:
-            resp = self.client.rpc(rpc_name, payload).execute()
-            return resp.data
-        except Exception as e:
-            print(f"Error calling RPC {rpc_name}: {e}")
-            return []
+
+        return self.rpc(rpc_name, payload, deadline=deadline)
+
+    def search_vectors_multi(
+        self,
+        queries: dict[str, list[float]],
+        filters: dict | None = None,
+        top_k: int = 5,
+        deadline: float | None = None,
+    ) -> dict[str, list[dict]]:
+        """Search players and teams in one round trip ({"players": emb, "teams": emb} -> rows per table)"""
+        if self._multi_rpc_available and set(queries) == {"players", "teams"}:
+            payload = {
+                "players_embedding": queries["players"],
+                "teams_embedding": queries["teams"],
+                "match_count": top_k,
+                "match_threshold": 0.3,
+                "filter": filters or {},
+            }
+            try:
+                found = self.rpc(MULTI_RPC, payload, deadline=deadline)
+                return {"players": found.get("players") or [], "teams": found.get("teams") or []}
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404:
+                    raise
+                # function chua tao tren DB -> dung 2 RPC song song
+                print(f"⚠️ RPC {MULTI_RPC} not found, falling back to parallel RPCs")
+                self._multi_rpc_available = False
+
+        # copy_context: span cua 2 RPC van nam trong trace cua query
+        futures = {
+            table: self._executor.submit(contextvars.copy_context().run, self.search_vectors, table, embedding,
+                                         filters, top_k, deadline)
+            for table, embedding in queries.items()
+        }
+        return {table: future.result() for table, future in futures.items()}
+
+    async def asearch_vectors(
+        self,
+        table: str,
+        query_embedding: list[float],
+        filters: dict | None = None,
+        top_k: int = 5,
+        deadline: float | None = None,
+    ) -> list[dict]:
+        """Async search_vectors: the blocking RPC runs in a worker thread"""
+        return await asyncio.to_thread(self.search_vectors, table, query_embedding, filters, top_k, deadline)
+
+    async def asearch_vectors_multi(self, queries: dict[str, list[float]], filters: dict | None = None,
+                                    top_k: int = 5, deadline: float | None = None) -> dict[str, list[dict]]:
+        return await asyncio.to_thread(self.search_vectors_multi, queries, filters, top_k, deadline)
 
     def insert(self, table: str, rows: list[dict]) -> list[dict]:
         """Insert rows into table"""
@@ -43,21 +195,28 @@ class SupabaseClient:
         resp = self.client.table(table).upsert(rows).execute()
         return resp.data
 
-    def search_by_filters(self, table: str, filters: dict | None = None, top_k: int = 5, sort_field: str | None = None, sort_order: str | None = None) -> list[dict]:
+    def delete(self, table: str, ids: list) -> int:
+        """Delete rows by primary key (player_id / team_id)"""
+        key = "team_id" if table == "teams" else "player_id"
+        resp = self.client.table(table).delete().in_(key, list(ids)).execute()
+        return len(resp.data or [])
+
+    def search_by_filters(self, table: str, filters: dict | None = None, top_k: int = 5, sort_field: str | None = None, sort_order: str | None = None,
+                          deadline: float | None = None) -> list[dict]:
         """Search by filters with optional sorting"""
-        query = self.client.table(table).select("*").limit(top_k)
+        params = {"select": "*", "limit": str(top_k)}
         if filters:
             for key, value in filters.items():
-                query = query.eq(key, value)
+                params[key] = f"eq.{value}"
 
         if sort_field and sort_order:
             column_expr = f"metadata->{sort_field}"
-            query = query.order(column_expr, desc=(sort_order == "DESC"))
+            params["order"] = f"{column_expr}.{'desc' if sort_order == 'DESC' else 'asc'}"
 
-        resp = query.execute()
-        return resp.data
+        return self._request(f"select_{table}", "GET", f"/{table}", params=params, deadline=deadline)
 
-    def call_ranking_rpc(self, table: str, filters: dict|None, sort_field: str, sort_order: str, top_k: int=5):
+    def call_ranking_rpc(self, table: str, filters: dict|None, sort_field: str, sort_order: str, top_k: int=5,
+                         deadline: float | None = None):
         if table == 'teams':
             rpc_name = "match_teams_ranking"
         else:
@@ -69,12 +228,35 @@ class SupabaseClient:
             'filters' : filters,
             'match_count' : top_k
         }
-        
-        resp = self.client.rpc(rpc_name,payload).execute()
-        
-        return resp.data
 
+        return self.rpc(rpc_name, payload, deadline=deadline)
+
+    async def asearch_by_filters(self, table: str, filters: dict | None = None, top_k: int = 5, sort_field: str | None = None, sort_order: str | None = None,
+                                 deadline: float | None = None) -> list[dict]:
+        return await asyncio.to_thread(self.search_by_filters, table, filters, top_k, sort_field, sort_order, deadline)
+
+    async def acall_ranking_rpc(self, table: str, filters: dict|None, sort_field: str, sort_order: str, top_k: int=5,
+                                deadline: float | None = None):
+        return await asyncio.to_thread(self.call_ranking_rpc, table, filters, sort_field, sort_order, top_k, deadline)
+
+    def stats(self) -> dict:
+        """Per-call counters: calls, errors, retries and p50/p95 latency (ms) over the last 1024 calls"""
+        with self._stats_lock:
+            out = {}
+            for name, calls in self._calls.items():
+                latency = sorted(self._latency_ms[name])
+                out[name] = {
+                    "calls": calls,
+                    "errors": self._errors[name],
+                    "retries": self._retries[name],
+                    "p50_ms": round(latency[len(latency) // 2], 1) if latency else None,
+                    "p95_ms": round(latency[int(len(latency) * 0.95)], 1) if latency else None,
+                }
+            return out
 
+    def close(self) -> None:
+        self.http.close()
+        self._executor.shutdown(wait=False)
 
     def table(self, table_name: str):
         """Get table reference"""
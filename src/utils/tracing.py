@@ -0,0 +1,265 @@
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Iterator, Optional
+
+try:
+    import fcntl  # khoa file giua cac process (Linux/macOS)
+except ImportError:  # Windows
+    fcntl = None
+
+# Per-query timing spans for the RAG pipeline.
+#
+#   with trace("query") as tr:          # pipeline entry point (RAGPipeline.__call__ / acall / stream)
+#       with span("route") as s:        # any stage, nested freely; s.set(strategy=...)
+#           ...
+#   tr.to_dict()                        # -> result["trace"]
+#
+# Every finished span is also observed in METRICS (Prometheus histogram per span name, GET /metrics
+# in api.py), and each finished trace is appended to the JSONL file named by RAG_TRACE_LOG, if set.
+# Spans opened outside a trace (e.g. the embedding batcher thread) only feed the histogram.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start", "duration_ms", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str] = None, **attributes: Any) -> None:
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self, origin: float) -> dict:
+        out = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "attributes": self.attributes,
+        }
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class Trace:
+    """All spans of one query; the root span covers the whole call."""
+
+    def __init__(self, name: str = "query", **attributes: Any) -> None:
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.timestamp = datetime.now().isoformat(timespec="milliseconds")
+        self.root = Span(name, **attributes)
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()  # span con co the ket thuc o thread khac (asyncio.to_thread)
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def record(self, name: str, started: float, ended: Optional[float] = None, **attributes: Any) -> Span:
+        """Add a span measured by the caller (perf_counter times), e.g. across a generator's yields."""
+        span = Span(name, parent_id=self.root.span_id, **attributes)
+        span.start = started
+        _finish(span, ended)
+        self.add(span)
+        return span
+
+    def finish(self) -> None:
+        if self.root.duration_ms is None:
+            _finish(self.root)
+            write_trace(self)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {
+            "trace_id": self.trace_id,
+            "timestamp": self.timestamp,
+            "total_ms": round(self.root.duration_ms, 3) if self.root.duration_ms is not None else None,
+            "root": self.root.to_dict(self.root.start),
+            "spans": [s.to_dict(self.root.start) for s in spans],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("rag_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("rag_span", default=None)
+
+
+class SpanMetrics:
+    """Duration histogram (seconds) and error count per span name, rendered as Prometheus text."""
+
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counts: dict[str, list[int]] = {}
+        self._sums: dict[str, float] = {}
+        self._errors: dict[str, int] = {}
+
+    def observe(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(name, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[name] = self._sums.get(name, 0.0) + seconds
+            if error:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP rag_span_duration_seconds Duration of RAG pipeline stages.",
+            "# TYPE rag_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name in sorted(self._counts):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), self._counts[name]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'rag_span_duration_seconds_bucket{{span="{label}",le="{le}"}} {cumulative}')
+                lines.append(f'rag_span_duration_seconds_sum{{span="{label}"}} {self._sums[name]:.6f}')
+                lines.append(f'rag_span_duration_seconds_count{{span="{label}"}} {cumulative}')
+            lines += ["# HELP rag_span_errors_total Spans that ended with an exception.",
+                      "# TYPE rag_span_errors_total counter"]
+            for name in sorted(self._errors):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'rag_span_errors_total{{span="{label}"}} {self._errors[name]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+            self._errors.clear()
+
+
+METRICS = SpanMetrics()
+_log_lock = threading.Lock()
+
+
+def _finish(span: Span, ended: Optional[float] = None) -> None:
+    seconds = (ended if ended is not None else time.perf_counter()) - span.start
+    span.duration_ms = seconds * 1000
+    METRICS.observe(span.name, seconds, error=span.error is not None)
+
+
+def write_trace(tr: Trace) -> None:
+    # RAG_TRACE_LOG doc moi lan ghi (app.py load .env sau khi import)
+    path = os.environ.get("RAG_TRACE_LOG")
+    if not path:
+        return
+    line = json.dumps(tr.to_dict(), ensure_ascii=False, default=str) + "\n"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _log_lock, open(path, "a", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+    except OSError as e:
+        print(f"⚠️ Không ghi được trace log {path}: {e}")
+
+
+@contextmanager
+def trace(name: str = "query", **attributes: Any) -> Iterator[Trace]:
+    """Start a trace for one query; nested span() calls (also in asyncio.to_thread) attach to it."""
+    tr = Trace(name, **attributes)
+    trace_token = _current_trace.set(tr)
+    span_token = _current_span.set(tr.root)
+    try:
+        yield tr
+    except BaseException as e:
+        tr.root.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        tr.finish()
+
+
+@contextmanager
+def activate(tr: Trace) -> Iterator[Trace]:
+    """Make an open trace current for a block (for generators: never across a yield)."""
+    trace_token = _current_trace.set(tr)
+    span_token = _current_span.set(tr.root)
+    try:
+        yield tr
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    parent = _current_span.get()
+    s = Span(name, parent_id=parent.span_id if parent is not None else None, **attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(s)
+        tr = _current_trace.get()
+        if tr is not None:
+            tr.add(s)
+
+
+def annotate(**attributes: Any) -> None:
+    """Set attributes on the innermost open span (no-op outside a span)."""
+    s = _current_span.get()
+    if s is not None:
+        s.set(**attributes)
+
+
+def traced(name: str, result_attrs: Optional[Callable[[Any], dict]] = None, **attributes: Any):
+    """Decorator: run the (sync or async) function inside span(name); result_attrs(result) -> attributes."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes) as s:
+                    result = await fn(*args, **kwargs)
+                    if result_attrs is not None:
+                        s.set(**result_attrs(result))
+                    return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes) as s:
+                result = fn(*args, **kwargs)
+                if result_attrs is not None:
+                    s.set(**result_attrs(result))
+                return result
+        return wrapper
+    return decorator
+
+
+def doc_count(docs: Any) -> dict:
+    return {"docs": len(docs or [])}
@@ -0,0 +1,215 @@
+import json
+from typing import Any, Iterable
+
+import numpy as np
+
+from src.rag.fast_router import canonical_nation
+
+# filter key cua router -> cot trong bang
+FILTER_COLUMNS = {"league": "current_league", "current_league": "current_league",
+                  "nationality": "nationality", "position": "position"}
+MASK_COLUMNS = ("current_league", "nationality", "position")
+
+
+def filter_label(column: str, value: Any) -> str:
+    """Comparable form of a filter column value; nationality codes ("br BRA") become the router's name."""
+    value = "" if value is None else str(value)
+    if column in ("nationality", "country") and value:
+        value = canonical_nation(value)
+    return value.lower()
+
+
+def filter_matches(column: str, stored: Any, value: Any) -> bool:
+    # giong RPC: khong phan biet hoa thuong, theo chuoi con ("La Liga" khop "es la liga")
+    return filter_label(column, value) in filter_label(column, stored)
+
+
+def parse_embedding(value: Any) -> np.ndarray | None:
+    # pgvector qua PostgREST tra ve chuoi "[0.1,0.2,...]"
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+class VectorIndex:
+    """Exact cosine top-k over one table, held in a contiguous float32 matrix.
+
+    Mirrors the match_players / match_teams RPCs: rows with similarity above
+    `match_threshold` that satisfy every filter, best first, with a `similarity` field.
+    Filter values match case-insensitively by containment ("Premier League" matches
+    "eng premier league", "Brazil" matches "br BRA"); filters on columns the table does
+    not have are ignored.
+    """
+
+    def __init__(self, rows: Iterable[dict], embedding_key: str = "embedding") -> None:
+        vectors, kept = [], []
+        for row in rows:
+            vec = parse_embedding(row.get(embedding_key))
+            if vec is None or not vec.size:
+                continue
+            vectors.append(vec)
+            kept.append({k: v for k, v in row.items() if k != embedding_key})
+
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        self._set_data(kept, matrix)
+
+    @classmethod
+    def from_matrix(cls, rows: list[dict], matrix: np.ndarray) -> "VectorIndex":
+        index = cls.__new__(cls)
+        index._set_data(rows, matrix)
+        return index
+
+    def _set_data(self, rows: list[dict], matrix: np.ndarray) -> None:
+        self.rows = rows
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True) if matrix.size else 1.0
+        self.matrix = np.ascontiguousarray(matrix / np.where(norms == 0, 1.0, norms))
+
+        # mask boolean cho moi gia tri cua moi cot filter
+        self._value_masks: dict[str, dict[str, np.ndarray]] = {}
+        for column in MASK_COLUMNS:
+            if not any(column in r for r in rows):
+                continue
+            values = np.array([filter_label(column, r.get(column)) for r in rows], dtype=object)
+            self._value_masks[column] = {v: values == v for v in set(values.tolist())}
+        self._filter_cache: dict[tuple[str, str], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def _column_mask(self, column: str, value: str) -> np.ndarray:
+        key = (column, filter_label(column, value))
+        mask = self._filter_cache.get(key)
+        if mask is None:
+            mask = np.zeros(len(self.rows), dtype=bool)
+            for column_value, value_mask in self._value_masks[column].items():
+                if key[1] in column_value:
+                    mask |= value_mask
+            self._filter_cache[key] = mask
+        return mask
+
+    def filter_mask(self, filters: dict | None) -> np.ndarray | None:
+        mask = None
+        for key, value in (filters or {}).items():
+            column = FILTER_COLUMNS.get(key, key)
+            if not value or column not in self._value_masks:
+                continue
+            column_mask = self._column_mask(column, str(value))
+            mask = column_mask if mask is None else mask & column_mask
+        return mask
+
+    def search(self, query_embedding: list[float] | np.ndarray, top_k: int = 5,
+               match_threshold: float = 0.3, filters: dict | None = None) -> list[dict]:
+        if not len(self.rows) or top_k <= 0:
+            return []
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        scores = self.matrix @ q
+        mask = self.filter_mask(filters)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        return self._top_k(np.arange(len(scores)), scores, top_k, match_threshold)
+
+    def _top_k(self, ids: np.ndarray, scores: np.ndarray, top_k: int, match_threshold: float) -> list[dict]:
+        if not len(ids):
+            return []
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        return [
+            {**self.rows[ids[i]], "similarity": float(scores[i])}
+            for i in best
+            if scores[i] > match_threshold
+        ]
+
+
+class LocalVectorSearchClient:
+    """SupabaseClient stand-in that answers search_vectors from in-process indexes.
+
+    Everything else (filters, ranking RPC, upsert, ...) is delegated to the wrapped client.
+    """
+
+    def __init__(self, supabase: Any, indexes: dict[str, VectorIndex], match_threshold: float = 0.3) -> None:
+        self.supabase = supabase
+        self.indexes = indexes
+        self.match_threshold = match_threshold
+
+    @classmethod
+    def from_supabase(cls, supabase: Any, tables: tuple[str, ...] = ("players", "teams"),
+                      page_size: int = 1000, index_type: str = "exact",
+                      index_kwargs: dict | None = None, **kwargs) -> "LocalVectorSearchClient":
+        # tai embedding 1 lan luc khoi dong, phan trang qua PostgREST
+        # index_type: "exact" (VectorIndex), "ivf" (IVFIndex, cho catalog nhieu mua)
+        # hoac "int8" / "pq" (QuantizedIndex, nen vector + re-rank chinh xac)
+        # index_kwargs={"cache_path": ...} voi "ivf": dung lai index da luu neu du lieu khong doi
+        index_kwargs = dict(index_kwargs or {})
+        if index_type == "ivf":
+            from src.utils.ann_index import IVFIndex as index_cls
+        elif index_type in ("int8", "pq"):
+            from src.utils.quantized_index import QuantizedIndex as index_cls
+            index_kwargs.setdefault("mode", index_type)
+        else:
+            index_cls = VectorIndex
+        indexes = {}
+        for table in tables:
+            rows, start = [], 0
+            while True:
+                resp = supabase.table(table).select("*").range(start, start + page_size - 1).execute()
+                rows.extend(resp.data)
+                if len(resp.data) < page_size:
+                    break
+                start += page_size
+            table_kwargs = dict(index_kwargs)
+            for key in ("full_precision_path", "cache_path"):
+                if table_kwargs.get(key):
+                    # moi bang 1 file: index sau ghi de file ma memmap / index cua bang truoc dang dung
+                    table_kwargs[key] = f"{table_kwargs[key]}.{table}"
+            indexes[table] = index_cls(rows, **table_kwargs)
+            print(f"Local vector index '{table}': {len(indexes[table])} rows")
+        return cls(supabase, indexes, **kwargs)
+
+    def search_vectors(
+        self,
+        table: str,
+        query_embedding: list[float],
+        filters: dict | None = None,
+        top_k: int = 5,
+    ) -> list[dict]:
+        index = self.indexes.get("teams" if table == "teams" else "players")
+        if index is None:
+            return self.supabase.search_vectors(table, query_embedding, filters, top_k)
+        return index.search(query_embedding, top_k, self.match_threshold, filters)
+
+    async def asearch_vectors(
+        self,
+        table: str,
+        query_embedding: list[float],
+        filters: dict | None = None,
+        top_k: int = 5,
+    ) -> list[dict]:
+        # scan local < 1 ms, khong can worker thread
+        return self.search_vectors(table, query_embedding, filters, top_k)
+
+    def search_vectors_multi(
+        self,
+        queries: dict[str, list[float]],
+        filters: dict | None = None,
+        top_k: int = 5,
+    ) -> dict[str, list[dict]]:
+        return {table: self.search_vectors(table, embedding, filters, top_k) for table, embedding in queries.items()}
+
+    async def asearch_vectors_multi(self, queries: dict[str, list[float]], filters: dict | None = None,
+                                    top_k: int = 5) -> dict[str, list[dict]]:
+        return self.search_vectors_multi(queries, filters, top_k)
+
+    def __getattr__(self, name: str):
+        return getattr(self.supabase, name)
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def repo_root():
+    # du lieu mau (data/...) doc theo duong dan tuong doi nhu app.py
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(ROOT)
+        yield
@@ -0,0 +1,70 @@
+import numpy as np
+
+from src.utils.ann_index import IVFIndex
+from src.utils.vector_index import VectorIndex
+
+LEAGUES = ["eng premier league", "es la liga", "it serie a"]
+
+
+def dataset(n: int = 3000, dim: int = 32, seed: int = 0):
+    # cum chong lan nhau (nhieu lon) -> IVF khong tim thay het neu nprobe qua nho
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((40, dim)).astype(np.float32)
+    matrix = centers[rng.integers(0, 40, n)] + 1.0 * rng.standard_normal((n, dim)).astype(np.float32)
+    rows = [{"player_id": i, "current_league": LEAGUES[i % 3], "embedding": matrix[i].tolist()} for i in range(n)]
+    queries = matrix[rng.choice(n, 50)] + 0.5 * rng.standard_normal((50, dim)).astype(np.float32)
+    return rows, queries
+
+
+def recall(index, exact, queries, filters=None, k: int = 10) -> float:
+    hits = []
+    for q in queries:
+        truth = {r["player_id"] for r in exact.search(q, k, -1.0, filters)}
+        got = {r["player_id"] for r in index.search(q, k, -1.0, filters)}
+        hits.append(len(got & truth) / len(truth))
+    return float(np.mean(hits))
+
+
+def test_recall_at_default_nprobe():
+    rows, queries = dataset()
+    exact, ivf = VectorIndex(rows), IVFIndex(rows)
+    assert ivf.nlist == 54 and ivf.nprobe == 8
+    assert recall(ivf, exact, queries) >= 0.9
+    assert recall(ivf, exact, queries, {"league": "La Liga"}) >= 0.9
+
+
+def test_nprobe_all_lists_is_exact():
+    rows, queries = dataset(n=500)
+    exact, ivf = VectorIndex(rows), IVFIndex(rows, nprobe=10_000)
+    assert recall(ivf, exact, queries) == 1.0
+
+
+def test_save_and_load_round_trip(tmp_path):
+    rows, queries = dataset(n=500)
+    ivf = IVFIndex(rows)
+    path = str(tmp_path / "ivf.npz")
+    ivf.save(path)
+    loaded = IVFIndex.load(path)
+
+    assert loaded.nlist == ivf.nlist and loaded.rows == ivf.rows
+    for q in queries[:5]:
+        assert [r["player_id"] for r in loaded.search(q, 5, -1.0)] == [r["player_id"] for r in ivf.search(q, 5, -1.0)]
+
+
+def test_cache_path_reuses_the_index_only_for_the_same_data(tmp_path, monkeypatch):
+    rows, _ = dataset(n=500)
+    path = str(tmp_path / "ivf_index.players")
+    first = IVFIndex(rows, cache_path=path)
+
+    def no_build(*args, **kwargs):
+        raise AssertionError("k-means should not run again")
+
+    monkeypatch.setattr(IVFIndex, "build", no_build)
+    again = IVFIndex(rows, cache_path=path)
+    assert np.array_equal(again.centroids, first.centroids)
+    monkeypatch.undo()
+
+    changed = [dict(r, current_league="de bundesliga") if r["player_id"] == 0 else r for r in rows]
+    rebuilt = IVFIndex(changed, cache_path=path)
+    assert rebuilt.rows[0]["current_league"] == "de bundesliga"
+    assert IVFIndex(rows, nlist=5, cache_path=path).nlist == 5
@@ -0,0 +1,91 @@
+import json
+
+from src.rag.answer_cache import SemanticAnswerCache
+from src.rag.types import QueryContext, Strategy
+
+
+class FakeEmbedder:
+    """Same vector for every query: any two questions are semantically 'identical'."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_embedding(self, text):
+        self.calls += 1
+        return [1.0, 0.0, 0.0]
+
+
+def route(strategy=Strategy.HYBRID, **kwargs):
+    return QueryContext(raw_query="", strategy=strategy, filters=kwargs.pop("filters", {}), embedding=None, **kwargs)
+
+
+RESULT = {"answer": "Vinicius", "context": [{"name": "vinicius", "embedding": [0.1]}], "strategy": "hybrid"}
+
+
+def test_semantic_hit_requires_the_same_route():
+    embedder = FakeEmbedder()
+    cache = SemanticAnswerCache(embedder)
+    la_liga = route(filters={"league": "La Liga"})
+    _, embedding = cache.lookup("fast winger in la liga", la_liga)
+    cache.store("fast winger in la liga", embedding, RESULT, la_liga)
+
+    hit, _ = cache.lookup("quick winger in la liga", route(filters={"league": "la liga"}))
+    assert hit["answer"] == "Vinicius"
+    assert "embedding" not in hit["context"][0]
+    miss, _ = cache.lookup("fast winger in serie a", route(filters={"league": "Serie A"}))
+    assert miss is None
+
+
+def test_ranking_routes_are_not_embedded_and_only_hit_exactly():
+    embedder = FakeEmbedder()
+    cache = SemanticAnswerCache(embedder)
+    youngest = route(Strategy.RANKING, sort_field="age", sort_order="DESC")
+
+    _, embedding = cache.lookup("youngest player", youngest)
+    assert embedding is None and embedder.calls == 0
+    cache.store("youngest player", embedding, {**RESULT, "strategy": "ranking"}, youngest)
+
+    assert cache.lookup("Youngest   player", youngest)[0] is not None
+    assert cache.lookup("the youngest player", youngest)[0] is None
+    assert embedder.calls == 0
+
+
+def test_empty_or_failed_answers_are_not_stored():
+    cache = SemanticAnswerCache(FakeEmbedder())
+    cache.store("q1", [1.0, 0.0, 0.0], {**RESULT, "context": []})
+    cache.store("q2", [1.0, 0.0, 0.0], {**RESULT, "error": "timeout"})
+    cache.store("q3", [1.0, 0.0, 0.0], {**RESULT, "answer": ""})
+    assert cache.stats()["size"] == 0
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.rag.answer_cache.time.time", lambda: now[0])
+    cache = SemanticAnswerCache(FakeEmbedder(), ttl_seconds=60)
+    cache.store("q", [1.0, 0.0, 0.0], RESULT)
+
+    now[0] += 59
+    assert cache.lookup("q")[0] is not None
+    now[0] += 2
+    assert cache.lookup("q")[0] is None
+    assert cache.lookup("similar q")[0] is None
+
+
+def test_lru_eviction_reuses_slots():
+    cache = SemanticAnswerCache(FakeEmbedder(), max_size=2)
+    for i in range(3):
+        cache.store(f"q{i}", [1.0, float(i), 0.0], RESULT)
+    assert cache.stats()["size"] == 2 and cache.evictions == 1
+    assert cache.lookup("q0", route(Strategy.RANKING))[0] is None
+    assert cache.lookup("q2", route(Strategy.RANKING))[0] is not None
+
+
+def test_snapshot_with_duplicate_keys_does_not_leak_slots(tmp_path):
+    path = tmp_path / "answer_cache.json"
+    entry = {"key": "q", "query": "q", "route": None, "embedding": [1.0, 0.0, 0.0], "result": RESULT,
+             "created_at": 10 ** 10}
+    path.write_text(json.dumps([entry] * 5 + [dict(entry, key="other")]), encoding="utf-8")
+
+    cache = SemanticAnswerCache(FakeEmbedder(), max_size=4, snapshot_path=str(path))
+    assert cache.stats()["size"] == 2
+    assert len(cache._free_slots) == 2
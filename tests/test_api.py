@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("dotenv")
+httpx = pytest.importorskip("httpx")
+from fastapi import HTTPException  # noqa: E402
+
+import api  # noqa: E402
+
+
+class SlowPipeline:
+    answer_cache = None
+
+    async def acall(self, question: str) -> dict:
+        await asyncio.sleep(0.1)
+        return {"answer": question, "context": [{"name": "A", "embedding": [0.1, 0.2]}]}
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        admission = api.AdmissionController(max_in_flight=1, max_queue=0)
+        await admission.acquire()
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire()
+        admission.release()
+        await admission.acquire()  # slot tra lai -> nhan tiep
+        return admission, exc.value
+
+    admission, error = asyncio.run(scenario())
+    assert error.status_code == 429 and error.headers == {"Retry-After": "1"}
+    assert admission.stats()["rejected"] == 1 and admission.stats()["in_flight"] == 1
+
+
+def test_queued_request_times_out_with_429():
+    async def scenario():
+        admission = api.AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+        await admission.acquire()
+        with pytest.raises(HTTPException) as exc:
+            await admission.acquire()
+        return admission, exc.value
+
+    admission, error = asyncio.run(scenario())
+    assert error.status_code == 429 and "timed out" in error.detail
+    assert admission.stats()["waiting"] == 0
+
+
+def test_ask_admits_in_flight_plus_queue_and_rejects_the_rest(monkeypatch):
+    monkeypatch.setitem(api.state, "pipeline", SlowPipeline())
+
+    async def scenario():
+        api.state["admission"] = api.AdmissionController(max_in_flight=2, max_queue=2, queue_timeout=5)
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/ask", json={"question": f"q{i}"}) for i in range(6)))
+
+    try:
+        responses = asyncio.run(scenario())
+    finally:
+        api.state.pop("admission", None)
+    codes = sorted(r.status_code for r in responses)
+    assert codes == [200] * 4 + [429] * 2
+    ok = next(r.json() for r in responses if r.status_code == 200)
+    assert ok["context"] == [{"name": "A"}]  # bo embedding khoi response
+    assert all(r.headers["retry-after"] == "1" for r in responses if r.status_code == 429)
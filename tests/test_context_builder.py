@@ -0,0 +1,52 @@
+from src.rag.context_builder import ContextBuilder, estimate_tokens
+from src.rag.types import Strategy
+
+
+def player(i: int, bio_words: int = 10) -> dict:
+    return {
+        "player_id": i, "name": f"Player {i}", "current_league": "es La Liga", "nationality": "br BRA",
+        "position": "FW", "birth_year": 2000, "embedding": [0.1] * 8,
+        "metadata": {"season_stats": {"goals": 10 + i, "assists": 3}, "identity": {"height_cm": 180}},
+        "document": " ".join(["word"] * bio_words),
+    }
+
+
+def test_ranking_projects_base_fields_plus_the_sort_field():
+    fields = ContextBuilder().project(player(1), Strategy.RANKING, "goals")
+    assert fields == {"name": "Player 1", "league": "es La Liga", "nationality": "br BRA",
+                      "position": "FW", "goals": 11}
+    # age -> birth_year, height -> height_cm
+    assert ContextBuilder().project(player(1), Strategy.RANKING, "age")["birth_year"] == 2000
+    assert ContextBuilder().project(player(1), Strategy.RANKING, "height")["height_cm"] == 180
+
+
+def test_team_fields_follow_the_strategy():
+    team = {"team_id": "t1", "name": "lazio", "current_league": "Serie A",
+            "metadata": {"venue": {"stadium_name": "Stadio Olimpico", "capacity": 68530}}}
+    assert ContextBuilder().project(team, Strategy.RANKING, "capacity")["capacity"] == 68530
+    assert ContextBuilder().project(team, Strategy.FILTERS_ONLY)["stadium"] == "Stadio Olimpico"
+
+
+def test_context_stays_under_the_token_budget():
+    builder = ContextBuilder(max_tokens=300, max_doc_chars=200)
+    docs = [player(i, bio_words=100) for i in range(20)]
+    text, stats = builder.build(docs, Strategy.SEMANTIC)
+
+    assert stats["context_tokens"] == estimate_tokens(text) <= 300 + 20  # + dong "omitted"
+    assert 0 < stats["docs_included"] < stats["docs_total"] == 20
+    assert f"[{20 - stats['docs_included']} more document(s) omitted" in text
+    assert stats["docs_truncated"] == stats["docs_included"]
+    assert "embedding" not in text
+
+
+def test_long_text_is_cut_at_max_doc_chars():
+    text, stats = ContextBuilder(max_doc_chars=50).build([player(1, bio_words=100)], Strategy.SEMANTIC)
+    document = next(line for line in text.splitlines() if line.startswith("document: "))
+    assert len(document) <= len("document: ") + 50 + len(" ...") and document.endswith(" ...")
+    assert stats == {**stats, "docs_included": 1, "docs_truncated": 1}
+
+
+def test_no_documents():
+    text, stats = ContextBuilder().build([])
+    assert text == "No documents were retrieved from the database."
+    assert stats["docs_total"] == stats["docs_included"] == 0
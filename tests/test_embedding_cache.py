@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.utils.embedding_cache import DIGEST_SIZE, EmbeddingCache
+
+
+def vec(x: float) -> np.ndarray:
+    return np.array([x, 1.0, 0.0], dtype=np.float32)
+
+
+def test_new_instance_reads_vectors_from_disk(tmp_path):
+    EmbeddingCache("model-a", dim=3, cache_dir=str(tmp_path)).put("Pedri", vec(1))
+
+    reopened = EmbeddingCache("model-a", dim=3, cache_dir=str(tmp_path))
+    assert np.array_equal(reopened.get("  Pedri "), vec(1))  # khoa theo text da chuan hoa
+    assert reopened.get("Pedri") is not None
+    assert reopened.stats()["disk_hits"] == 1 and reopened.stats()["hits"] == 1
+
+
+def test_rows_appended_by_another_instance_are_picked_up(tmp_path):
+    reader = EmbeddingCache("model-a", dim=3, cache_dir=str(tmp_path))
+    assert reader.get("Pedri") is None
+    EmbeddingCache("model-a", dim=3, cache_dir=str(tmp_path)).put("Pedri", vec(2))
+    assert np.array_equal(reader.get("Pedri"), vec(2))
+
+
+def test_models_do_not_share_vectors(tmp_path):
+    EmbeddingCache("model-a", dim=3, cache_dir=str(tmp_path)).put("Pedri", vec(1))
+    assert EmbeddingCache("model-b", dim=3, cache_dir=str(tmp_path)).get("Pedri") is None
+
+
+def test_partially_written_row_is_ignored_and_repaired(tmp_path):
+    cache = EmbeddingCache("model-a", dim=3, cache_dir=str(tmp_path))
+    cache.put("Pedri", vec(1))
+    # crash giua luc ghi: nua vector, chua co digest
+    with open(cache._vectors_path, "ab") as f:
+        f.write(vec(9).tobytes()[:6])
+
+    reopened = EmbeddingCache("model-a", dim=3, cache_dir=str(tmp_path))
+    assert reopened.stats()["disk_rows"] == 1
+    reopened.put("Gavi", vec(3))
+
+    fresh = EmbeddingCache("model-a", dim=3, cache_dir=str(tmp_path))
+    assert np.array_equal(fresh.get("Pedri"), vec(1))
+    assert np.array_equal(fresh.get("Gavi"), vec(3))
+    assert fresh._row_count_on_disk() * DIGEST_SIZE == fresh._index_offset
+
+
+def test_lru_is_bounded(tmp_path):
+    cache = EmbeddingCache("model-a", dim=3, lru_size=2)
+    for i in range(3):
+        cache.put(f"t{i}", vec(i))
+    assert cache.get("t0") is None  # khong co tang disk
+    assert cache.get("t2") is not None
+    assert cache.stats()["lru_size"] == 2
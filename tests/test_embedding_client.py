@@ -0,0 +1,169 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from src.rag.fast_router import FastRouter
+from src.rag.generator import ResponseGenerator
+from src.rag.query_processor import QueryProcessor
+from src.rag.rag_pipeline import RAGPipeline
+from src.rag.retriever import Retriever
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.embedding_client import LocalEmbeddingClient
+from src.utils.fake_clients import FakeGeminiClient, FakeSupabaseClient, HashEmbeddingClient
+
+
+class FakeModel:
+    """SentenceTransformer stand-in: vector = [len(text), 1, 0, 0], records every encode call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        self.calls.append((texts, batch_size))
+        out = np.array([[len(t), 1.0, 0.0, 0.0] for t in texts], dtype=np.float32)
+        return out[0] if single else out
+
+
+def make_client(cache_dir=None) -> LocalEmbeddingClient:
+    client = LocalEmbeddingClient(model_name="fake", lazy=True)
+    client.model = FakeModel()  # _ensure_model khong load gi
+    client.cache = EmbeddingCache(client.cache_key, dim=4, cache_dir=cache_dir)
+    return client
+
+
+def test_batch_encodes_each_distinct_text_once():
+    client = make_client()
+    out = client.get_embeddings(["ab", "abc", "ab", ""], batch_size=8)
+
+    assert out[0] == out[2] == [2.0, 1.0, 0.0, 0.0]
+    assert out[1] == [3.0, 1.0, 0.0, 0.0]
+    assert out[3] == []
+    assert client.model.calls == [(["ab", "abc"], 8)]
+
+
+def test_cached_texts_are_not_re_encoded():
+    client = make_client()
+    client.get_embedding("ab")
+    client.model.calls.clear()
+
+    out = client.get_embeddings(["ab", "xyz"], as_numpy=True, normalize=True)
+    assert out.shape == (2, 4)
+    assert np.allclose(np.linalg.norm(out, axis=1), 1.0)
+    assert client.model.calls == [(["xyz"], 32)]
+
+
+def test_batch_matches_single_calls():
+    client = make_client()
+    texts = ["Vinicius Junior", "Pedri", "Jude Bellingham"]
+    batch = client.get_embeddings(texts)
+    assert batch == [make_client().get_embedding(t) for t in texts]
+
+
+def fake_loader(client: LocalEmbeddingClient, started=None, release=None):
+    # thay _ensure_model: "load" model gia, co the chan cho toi khi release.set()
+    def load():
+        if client.model is None:
+            if started is not None:
+                started.set()
+            if release is not None:
+                release.wait(5)
+            client.cache = EmbeddingCache(client.cache_key, dim=4)
+            client.model = FakeModel()
+    return load
+
+
+def test_lazy_client_loads_nothing_until_used():
+    client = LocalEmbeddingClient(model_name="fake", lazy=True)
+    assert client.model is None and client.cache is None and not client.ready
+
+    client._ensure_model = fake_loader(client)
+    client.get_embedding("ab")
+    assert client.ready
+
+
+def test_background_warm_up_sets_ready_when_loaded():
+    client = LocalEmbeddingClient(model_name="fake", lazy=True)
+    started, release = threading.Event(), threading.Event()
+    client._ensure_model = fake_loader(client, started, release)
+
+    thread = client.warm_up(background=True)
+    assert started.wait(5)
+    assert not client.ready and not client.wait_ready(0.01)
+    release.set()
+    thread.join(5)
+    assert client.ready and client.warmup_seconds is not None
+    assert client.model.calls == [(["warm up"], 32)]
+
+
+def test_failed_warm_up_leaves_the_client_not_ready():
+    client = LocalEmbeddingClient(model_name="fake", lazy=True)
+
+    def broken():
+        raise OSError("model download failed")
+
+    client._ensure_model = broken
+    assert client.warm_up(background=False) is None
+    assert not client.ready
+
+
+def test_ranking_questions_are_answered_while_the_model_loads():
+    client = LocalEmbeddingClient(model_name="fake", lazy=True)
+    release = threading.Event()
+    client._ensure_model = fake_loader(client, release=release)  # "load" chi xong khi release
+    client.warm_up(background=True)
+
+    gemini = FakeGeminiClient(answer_tokens=3)
+    storage = FakeSupabaseClient.from_data_dir(HashEmbeddingClient(dim=4), match_threshold=-1.0)
+    pipeline = RAGPipeline(
+        retriever=Retriever(storage, gemini, client),
+        generator=ResponseGenerator(gemini),
+        query_processor=QueryProcessor(gemini, client, fast_router=FastRouter.from_data_dir("data")),
+    )
+    try:
+        result = asyncio.run(asyncio.wait_for(pipeline.acall("Ai ghi nhiều bàn nhất EPL?"), 5))
+        assert result["strategy"] == "ranking" and result["context"]
+        assert not client.ready
+    finally:
+        release.set()
+
+
+def test_quantized_and_truncated_encoders_get_their_own_cache_namespace(tmp_path):
+    assert LocalEmbeddingClient(model_name="m", lazy=True).cache_key == "m"
+    assert LocalEmbeddingClient(model_name="m", lazy=True, quantize=True).cache_key == "m#int8"
+    assert LocalEmbeddingClient(model_name="m", lazy=True, max_seq_length=64).cache_key == "m#seq64"
+    assert LocalEmbeddingClient(model_name="m", lazy=True, quantize=True, max_seq_length=64).cache_key == "m#int8-seq64"
+
+    fp32 = make_client(cache_dir=str(tmp_path))
+    fp32.get_embedding("Pedri")
+    int8 = LocalEmbeddingClient(model_name="fake", lazy=True, quantize=True)
+    int8.model = FakeModel()
+    int8.cache = EmbeddingCache(int8.cache_key, dim=4, cache_dir=str(tmp_path))
+    int8.get_embedding("Pedri")
+    assert int8.model.calls == [(["Pedri"], 32)]  # khong doc vector fp32 tren disk
+
+
+def test_factory_reads_the_query_encoder_options(monkeypatch):
+    from src.rag import factory
+
+    monkeypatch.setenv("EMBEDDING_QUANTIZE", "1")
+    monkeypatch.setenv("EMBEDDING_MAX_SEQ_LENGTH", "64")
+    monkeypatch.delenv("EMBEDDING_SERVER_SOCKET", raising=False)
+    monkeypatch.setattr(LocalEmbeddingClient, "warm_up", lambda self, background=True: None)
+    client = factory.build_embedding_client()
+    assert (client.quantize, client.max_seq_length, client.model) == (True, 64, None)
+
+
+def test_bulk_pool_of_a_quantized_client_uses_fp32_without_its_cache(monkeypatch):
+    from src.utils import embedding_pool
+
+    created = []
+    monkeypatch.setattr(embedding_pool, "EmbeddingPool", lambda model_name, **kwargs: created.append(kwargs))
+    client = LocalEmbeddingClient(model_name="m", lazy=True, quantize=True)
+    client.pool(workers=2)
+    plain = LocalEmbeddingClient(model_name="m", lazy=True, cache_dir="data/cache/embeddings")
+    plain.pool(workers=2)
+    assert created[0] == {"workers": 2}
+    assert created[1]["cache_dir"] == "data/cache/embeddings"
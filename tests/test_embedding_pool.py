@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.utils import embedding_pool
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.embedding_pool import EmbeddingPool
+
+
+class FakeModel:
+    """vector = [len(text), first char code, 1]; records the texts of every encode call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.array([[len(t), ord(t[0]), 1.0] for t in texts], dtype=np.float64)
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # worker process can sentence_transformers -> chay _encode_chunk trong thread voi model gia
+    model = FakeModel()
+    monkeypatch.setattr(embedding_pool, "_model", model)
+    p = EmbeddingPool("fake", workers=2, chunk_size=4, window=8, pin=False)
+    p._executor.shutdown()
+    p._executor = ThreadPoolExecutor(max_workers=2)
+    yield p
+    p.close()
+
+
+def expected(text: str) -> list[float]:
+    return [len(text), ord(text[0]), 1.0]
+
+
+def test_vectors_come_back_in_input_order(pool):
+    texts = [("x" * (i % 7 + 1)) + str(i) for i in range(30)]
+    out = pool.get_embeddings(texts)
+    assert out == [expected(t) for t in texts]
+    assert all(len(call) <= 4 for call in embedding_pool._model.calls)
+
+
+def test_chunks_are_sorted_by_length_within_a_window(pool):
+    texts = ["a", "aaaa", "aa", "aaa", "aaaaa", "b", "bbbbbb", "bb", "c"]
+    chunks = list(pool._chunks(texts))
+    assert sorted(i for chunk in chunks for i in chunk) == list(range(len(texts)))
+    assert [len(texts[i]) for i in chunks[0]] == [6, 5, 4, 3]
+    assert chunks[-1] == [8]  # cua so thu 2 chi co 1 text
+
+
+def test_empty_texts_keep_a_zero_row_and_are_not_encoded(pool):
+    out = pool.get_embeddings(["ab", "", "c"], as_numpy=True)
+    assert out.dtype == np.float32 and out.shape == (3, 3)
+    assert not out[1].any()
+    assert "" not in [t for call in embedding_pool._model.calls for t in call]
+    assert pool.get_embeddings(["ab", ""])[1] == []
+
+
+def test_cache_is_opened_with_the_worker_dimension_and_reused(pool, tmp_path):
+    pool.cache_dir = str(tmp_path)
+    pool.get_embeddings(["ab", "cde"])
+    assert isinstance(pool.cache, EmbeddingCache) and pool.cache.dim == 3
+
+    embedding_pool._model.calls.clear()
+    assert pool.get_embeddings(["cde", "fg"]) == [expected("cde"), expected("fg")]
+    assert embedding_pool._model.calls == [["fg"]]
@@ -0,0 +1,123 @@
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.embedding_client import LocalEmbeddingClient
+from src.utils.embedding_server import EmbeddingServer, EmbeddingServerClient
+
+
+class FakeModel:
+    """vector = [len(text), 1, 0, 0]; texts containing "boom" fail."""
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if any("boom" in t for t in texts):
+            raise ValueError("cannot encode")
+        out = np.array([[len(t), 1.0, 0.0, 0.0] for t in texts], dtype=np.float32)
+        return out[0] if single else out
+
+
+def make_model_client() -> LocalEmbeddingClient:
+    client = LocalEmbeddingClient(model_name="fake-model", lazy=True)
+    client.model = FakeModel()
+    client.cache = EmbeddingCache(client.cache_key, dim=4)
+    return client
+
+
+def serve(socket_path: str, model_client) -> EmbeddingServer:
+    server = EmbeddingServer(model_client, socket_path, max_batch=16, max_wait_ms=20)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "emb.sock")
+
+
+def test_ping_reports_ready_only_after_warm_up(socket_path):
+    model_client = make_model_client()
+    server = serve(socket_path, model_client)
+    client = EmbeddingServerClient(socket_path)
+    try:
+        assert client.ping() == {"ready": False, "dim": 0, "model_name": "fake-model"}
+        assert not client.ready
+        model_client.warm_up(background=False)
+        assert client.ready and client.dim == 4
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_embeddings_match_the_model_and_batch_across_threads(socket_path):
+    server = serve(socket_path, make_model_client())
+    client = EmbeddingServerClient(socket_path)
+    try:
+        assert client.get_embedding("abc") == [3.0, 1.0, 0.0, 0.0]
+        assert client.get_embeddings(["ab", "", "abcd"]) == [[2.0, 1.0, 0.0, 0.0], [], [4.0, 1.0, 0.0, 0.0]]
+        out = client.get_embeddings(["ab", "abcd"], normalize=True, as_numpy=True)
+        assert np.allclose(np.linalg.norm(out, axis=1), 1.0)
+
+        texts = ["x" * (i + 1) for i in range(40)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(client.get_embedding, texts))
+        assert [r[0] for r in results] == [len(t) for t in texts]
+        assert server.embedder.batches < 2 + len(texts)  # request cua cac thread duoc gop
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_errors_are_reported_and_the_connection_survives(socket_path):
+    server = serve(socket_path, make_model_client())
+    client = EmbeddingServerClient(socket_path)
+    try:
+        with pytest.raises(RuntimeError, match="cannot encode"):
+            client.get_embedding("boom")
+        assert client.get_embedding("ok") == [2.0, 1.0, 0.0, 0.0]
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+class ConnectionTrackingServer(EmbeddingServer):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.connections = []
+
+    def process_request(self, request, client_address) -> None:
+        self.connections.append(request)
+        super().process_request(request, client_address)
+
+    def kill(self) -> None:
+        # nhu process server chet: dong ca cac ket noi dang mo
+        self.shutdown()
+        self.server_close()
+        for conn in self.connections:
+            conn.shutdown(socket.SHUT_RDWR)
+            conn.close()
+
+
+def test_client_reconnects_after_a_server_restart(socket_path):
+    old = ConnectionTrackingServer(make_model_client(), socket_path)
+    threading.Thread(target=old.serve_forever, daemon=True).start()
+    client = EmbeddingServerClient(socket_path)
+    try:
+        assert client.get_embedding("ab")[0] == 2.0
+        old.kill()
+        restarted = make_model_client()
+        restarted.model.encode = lambda texts, **kwargs: np.full((len(texts), 4), 9.0, dtype=np.float32)
+        server = serve(socket_path, restarted)
+        assert client.get_embedding("abc") == [9.0] * 4  # ket noi moi toi server moi
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,68 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.eval_store import EvaluationStore
+
+
+def make_store(tmp_path) -> EvaluationStore:
+    return EvaluationStore(str(tmp_path / "events.jsonl"), legacy_path=None)
+
+
+def test_append_and_read_page(tmp_path):
+    store = make_store(tmp_path)
+    for i in range(5):
+        store.append({"query": f"q{i}", "ground_truth": "x" if i % 2 else ""})
+
+    assert store.counts() == {"total": 5, "with_ground_truth": 2}
+    assert [e["query"] for e in store.read_page(0, 2)] == ["q4", "q3"]
+    assert [e["query"] for e in store.read_page(2, 2)] == ["q0"]
+    assert [e["query"] for e in store.read_page(0, 2, newest_first=False)] == ["q0", "q1"]
+
+
+def test_partial_line_from_a_crash_is_dropped(tmp_path):
+    store = make_store(tmp_path)
+    store.append({"query": "q0"})
+    with open(store.path, "ab") as f:
+        f.write(b'{"query": "half wri')  # crash giua luc ghi
+
+    assert store.counts()["total"] == 1
+    store.append({"query": "q1"})
+
+    assert store.counts()["total"] == 2
+    assert [e["query"] for e in store.iter_events()] == ["q0", "q1"]
+    assert [e["query"] for e in store.read_page(0, 10)] == ["q1", "q0"]
+
+
+def test_lines_written_before_the_meta_update_are_counted(tmp_path):
+    store = make_store(tmp_path)
+    store.append({"query": "q0"})
+    # crash sau khi ghi event, truoc khi ghi offset / meta
+    with open(store.path, "ab") as f:
+        f.write((json.dumps({"query": "q1", "ground_truth": "g"}) + "\n").encode("utf-8"))
+
+    reopened = make_store(tmp_path)
+    assert reopened.counts() == {"total": 2, "with_ground_truth": 1}
+    assert [e["query"] for e in reopened.read_page(0, 10)] == ["q1", "q0"]
+
+    reopened.append({"query": "q2"})
+    assert [e["query"] for e in reopened.read_page(0, 10, newest_first=False)] == ["q0", "q1", "q2"]
+
+
+def test_legacy_file_is_imported_once_by_concurrent_stores(tmp_path, monkeypatch):
+    legacy = tmp_path / "events.json"
+    legacy.write_text(json.dumps([{"query": f"q{i}"} for i in range(50)]), encoding="utf-8")
+    path = str(tmp_path / "events.jsonl")
+    slow_import = EvaluationStore._import_legacy
+
+    def import_legacy(self, legacy_path):
+        time.sleep(0.05)  # mo rong khoang giua kiem tra file va ghi
+        slow_import(self, legacy_path)
+
+    monkeypatch.setattr(EvaluationStore, "_import_legacy", import_legacy)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        stores = list(pool.map(lambda _: EvaluationStore(path, legacy_path=str(legacy)), range(8)))
+
+    assert stores[0].counts()["total"] == 50
+    assert [e["query"] for e in stores[-1].iter_events()] == [f"q{i}" for i in range(50)]
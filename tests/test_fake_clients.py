@@ -0,0 +1,77 @@
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+from conftest import ROOT
+
+from src.rag.query_processor import QueryProcessor
+from src.rag.types import Strategy
+from src.utils.fake_clients import FakeGeminiClient, FakeSupabaseClient, HashEmbeddingClient, Latency
+from src.utils.tracing import trace
+
+with open(ROOT / "data/eval/router_queries.jsonl", "r", encoding="utf-8") as f:
+    LABELS = [json.loads(line) for line in f if line.strip()]
+
+
+def test_latency_is_seeded_and_never_below_the_base():
+    samples = [Latency(10, 5, seed=1).sample() for _ in range(3)]
+    assert samples[0] == samples[1] == samples[2]
+    latency = Latency(10, 5, seed=2)
+    assert all(latency.sample() >= 0.010 for _ in range(100))
+    assert Latency().sample() == 0.0
+
+
+def test_hash_embeddings_are_deterministic_and_word_based():
+    embedder = HashEmbeddingClient(dim=64)
+    a = np.array(embedder.get_embedding("creative Spanish midfielder"))
+    assert np.isclose(np.linalg.norm(a), 1.0)
+    assert embedder.get_embeddings(["creative Spanish midfielder"])[0] == a.tolist()
+    closer = a @ np.array(embedder.get_embedding("Spanish midfielder"))
+    farther = a @ np.array(embedder.get_embedding("tall goalkeeper from Brazil"))
+    assert closer > farther
+    assert embedder.calls == 4
+
+
+@pytest.fixture(scope="module")
+def storage():
+    return FakeSupabaseClient.from_data_dir(HashEmbeddingClient(dim=16), latency=Latency(20), match_threshold=-1.0)
+
+
+def test_storage_counts_and_delays_each_rpc(storage):
+    with trace("query") as tr:
+        started = time.perf_counter()
+        rows = storage.call_ranking_rpc("players", {"league": "Premier League"}, "goals", "DESC", 3)
+        elapsed = time.perf_counter() - started
+    assert len(rows) == 3 and elapsed >= 0.020
+    assert rows[0]["metadata"]["season_stats"]["goals"] >= rows[-1]["metadata"]["season_stats"]["goals"]
+    assert storage.stats()["call_ranking_rpc"] == {"calls": 1}
+    assert [s["name"] for s in tr.to_dict()["spans"]] == ["rpc.call_ranking_rpc"]
+
+
+def test_gemini_routes_from_the_labelled_set():
+    gemini = FakeGeminiClient(routes={r["query"]: r for r in LABELS}, answer_tokens=4)
+    qp = QueryProcessor(gemini, HashEmbeddingClient(dim=8))
+    for case in LABELS:
+        context = qp(case["query"])
+        assert context.strategy.value == case["strategy"]
+        assert context.filters == case["filters"]
+        assert (context.sort_field, context.sort_order) == (case["sort_field"], case["sort_order"])
+    assert qp("not in the labelled set").strategy == Strategy.HYBRID
+    assert list(gemini.chat_stream("You answer questions", "q")) == ["token0 ", "token1 ", "token2 ", "token3 "]
+    assert gemini.stats()["calls"] == {"router": len(LABELS) + 1, "answer": 1}
+
+
+def test_bench_pipeline_runs_offline(tmp_path):
+    out = tmp_path / "bench.json"
+    zero = ["--embed-ms", "0", "--embed-jitter-ms", "0", "--supabase-ms", "0", "--supabase-jitter-ms", "0",
+            "--llm-ms", "0", "--llm-jitter-ms", "0", "--token-ms", "0"]
+    subprocess.run([sys.executable, "scripts_addon/bench_pipeline.py", "--mode", "async", "--rounds", "1",
+                    "--warmup", "0", "--no-alloc", "--out", str(out), *zero],
+                   cwd=ROOT, check=True, capture_output=True, timeout=120)
+
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert report["overall"]["queries"] >= len(LABELS) and report["overall"]["errors"] == 0
+    assert {"ranking", "semantic", "hybrid", "filters_only"} <= set(report["groups"])
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from conftest import ROOT
+
+from src.rag.fast_router import FastRouter, canonical_nation
+from src.rag.types import Strategy
+
+with open(ROOT / "data/eval/router_queries.jsonl", "r", encoding="utf-8") as f:
+    LABELS = [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.fixture(scope="module")
+def router():
+    return FastRouter.from_data_dir("data")
+
+
+@pytest.mark.parametrize("query, field, order", [
+    ("Ai ghi nhiều bàn nhất EPL?", "goals", "DESC"),
+    ("Who has the most assists in La Liga?", "assists", "DESC"),
+    ("Cầu thủ trẻ nhất Bundesliga", "age", "ASC"),
+    ("Tallest goalkeeper in Serie A", "height", "DESC"),
+    ("Đội bóng nào ở Serie A có sân lớn nhất?", "capacity", "DESC"),
+    ("Which club has the smallest stadium in Ligue 1?", "capacity", "ASC"),
+])
+def test_sort_rules(router, query, field, order):
+    route = router(query)
+    assert route.strategy == Strategy.RANKING
+    assert (route.sort_field, route.sort_order) == (field, order)
+    assert route.confidence == 0.95
+
+
+def test_filters_only_and_aliases(router):
+    route = router("Cầu thủ Brazil ở La Liga")
+    assert route.strategy == Strategy.FILTERS_ONLY and route.confidence == 0.85
+    assert route.filters == {"league": "La Liga", "nationality": "Brazil"}
+    # "Ngoại hạng Anh" la giai, khong phai nuoc Anh
+    assert router("Cầu thủ Ngoại hạng Anh").filters == {"league": "Premier League"}
+    assert canonical_nation("br BRA") == "Brazil"
+
+
+def test_uncertain_queries_defer_to_the_llm(router):
+    # so sanh khong ro truong sort / hoi ca cau thu lan doi -> confidence thap, LLM router quyet
+    assert router("Who is the best player in the world?").confidence < 0.8
+    assert router("Cầu thủ nào của đội có sân vận động lớn nhất?").confidence <= 0.4
+    assert router("Tell me about football").confidence < 0.8
+
+
+def test_confident_routes_agree_with_labels(router):
+    confident = 0
+    for case in LABELS:
+        route = router(case["query"])
+        if route.confidence < 0.8:
+            continue
+        confident += 1
+        assert route.strategy.value == case["strategy"], case["query"]
+        assert route.filters == case["filters"], case["query"]
+        assert (route.sort_field, route.sort_order) == (case["sort_field"], case["sort_order"]), case["query"]
+    assert confident >= len(LABELS) // 2
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from src.utils.fake_clients import HashEmbeddingClient
+from src.utils.ingest import Batch, Checkpoint, StreamingIngestor
+from src.utils.sqlite_client import SQLiteClient
+
+
+def player(i: int) -> dict:
+    return {"entity_id": f"player_{i}", "name": f"Player {i}", "current_league": "es la liga",
+            "identity": {"nationality": "br BRA", "position": "FW", "birth_year": 2000},
+            "season_stats": {"goals": i}}
+
+
+def write_input(path, n: int, bad: tuple = ()) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write("{not json\n" if i in bad else json.dumps(player(i)) + "\n")
+    return str(path)
+
+
+class FlakyStorage(SQLiteClient):
+    """Fails every upsert that contains one of `fail_ids` (until cleared)."""
+
+    fail_ids: set = set()
+
+    def upsert(self, table, rows):
+        if any(r["player_id"] in self.fail_ids for r in rows):
+            raise ConnectionError("upstream down")
+        return super().upsert(table, rows)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    client = FlakyStorage(str(tmp_path / "football.db"))
+    yield client
+    client.close()
+
+
+def make_ingestor(tmp_path, storage, **kwargs) -> StreamingIngestor:
+    return StreamingIngestor("players", storage, HashEmbeddingClient(dim=8), batch_size=10, upsert_workers=3,
+                             upsert_retries=0, checkpoint_path=str(tmp_path / "ckpt.json"),
+                             reject_path=str(tmp_path / "rejects.jsonl"), **kwargs)
+
+
+def test_all_records_are_embedded_and_upserted(tmp_path, storage):
+    report = make_ingestor(tmp_path, storage).run(write_input(tmp_path / "p.jsonl", 45), progress_every=60)
+
+    assert storage.count("players") == 45
+    assert report["records_done"] == 45 and report["rejected"] == 0
+    assert report["stages"]["embed"]["items"] == report["stages"]["upsert"]["items"] == 45
+    assert len(storage.search_vectors("players", [1.0] * 8, top_k=3)) == 3
+    assert not (tmp_path / "ckpt.json").exists()  # chay xong -> xoa checkpoint
+
+
+def test_unparsable_records_are_rejected_and_skipped(tmp_path, storage):
+    report = make_ingestor(tmp_path, storage).run(write_input(tmp_path / "p.jsonl", 25, bad=(3, 17)),
+                                                  progress_every=60)
+
+    assert storage.count("players") == 23
+    assert report["rejected"] == 2 and report["records_done"] == 25
+    rejects = [json.loads(line) for line in (tmp_path / "rejects.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [(r["index"], r["stage"], r["input"]) for r in rejects] == [(3, "parse", "{not json\n"),
+                                                                      (17, "parse", "{not json\n")]
+    # reject la ket qua cuoi: lan chay sau doc lai ca file (vd. sau khi sua input)
+    assert not (tmp_path / "ckpt.json").exists()
+
+
+def test_failed_batch_holds_the_checkpoint_and_is_retried_on_resume(tmp_path, storage):
+    path = write_input(tmp_path / "p.jsonl", 50)
+    storage.fail_ids = {"player_25"}  # batch 20-30
+    report = make_ingestor(tmp_path, storage).run(path, progress_every=60)
+
+    assert report["records_done"] == 20  # batch sau batch loi co the da ghi, nhung checkpoint dung o 20
+    assert report["stages"]["upsert"]["errors"] == 10
+    assert json.loads((tmp_path / "ckpt.json").read_text(encoding="utf-8"))["records_done"] == 20
+
+    storage.fail_ids = set()
+    resumed = make_ingestor(tmp_path, storage).run(path, progress_every=60)
+    assert resumed["stages"]["parse"]["items"] == 30  # bat dau lai tu record 20
+    assert storage.count("players") == 50 and resumed["records_done"] == 50
+
+
+def test_checkpoint_advances_only_over_contiguous_batches(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "ckpt.json"), "input.jsonl", "players")
+    checkpoint.finish(Batch(1, 10, 20))
+    assert checkpoint.records_done == 0
+    checkpoint.finish(Batch(0, 0, 10))
+    assert checkpoint.records_done == 20
+    # checkpoint cua file / bang khac khong duoc dung
+    assert Checkpoint(str(tmp_path / "ckpt.json"), "input.jsonl", "players").records_done == 20
+    assert Checkpoint(str(tmp_path / "ckpt.json"), "other.jsonl", "players").records_done == 0
@@ -0,0 +1,55 @@
+from src.utils.ingest import EmbeddingManifest
+
+MODEL = "model-a"
+
+
+def record(**changes):
+    row = {"player_id": 7, "name": "A", "current_league": "es la liga", "document": "A plays in La Liga"}
+    row.update(changes)
+    return row
+
+
+def committed(path, target=None) -> EmbeddingManifest:
+    manifest = EmbeddingManifest(str(path), target)
+    assert manifest.plan("players", record(), MODEL) is True
+    manifest.commit("players", [record()], MODEL)
+    manifest.save()
+    return manifest
+
+
+def test_plan_decides_embed_update_or_skip(tmp_path):
+    path = tmp_path / "manifest.json"
+    committed(path)
+    manifest = EmbeddingManifest(str(path))
+
+    assert manifest.plan("players", record(), MODEL) is None
+    assert manifest.plan("players", record(current_league="eng premier league"), MODEL) is False
+    assert manifest.plan("players", record(document="A plays in the Premier League"), MODEL) is True
+    assert manifest.plan("players", record(), "model-b") is True
+    assert manifest.plan("players", record(player_id=8), MODEL) is True
+
+
+def test_uncommitted_rows_are_planned_again(tmp_path):
+    path = tmp_path / "manifest.json"
+    manifest = EmbeddingManifest(str(path))
+    assert manifest.plan("players", record(), MODEL) is True
+    manifest.save()  # upsert loi -> khong commit
+
+    assert EmbeddingManifest(str(path)).plan("players", record(), MODEL) is True
+
+
+def test_manifest_for_another_target_is_ignored(tmp_path):
+    path = tmp_path / "manifest.json"
+    committed(path, target="sqlite:data/football.db")
+
+    assert EmbeddingManifest(str(path), "sqlite:data/football.db").plan("players", record(), MODEL) is None
+    assert EmbeddingManifest(str(path), "supabase:https://x.supabase.co").plan("players", record(), MODEL) is True
+
+
+def test_stale_lists_rows_not_seen_in_this_run(tmp_path):
+    path = tmp_path / "manifest.json"
+    committed(path)
+    manifest = EmbeddingManifest(str(path))
+    manifest.plan("players", record(player_id=8), MODEL)
+
+    assert manifest.stale("players") == ["7"]
@@ -0,0 +1,51 @@
+from src.utils.leaderboard import LeaderboardClient, Leaderboards, TableLeaderboard
+from src.utils.sqlite_client import SQLiteClient
+
+PLAYERS = [
+    {"player_id": 1, "name": "A", "current_league": "es la liga", "nationality": "br BRA", "birth_year": 2000,
+     "metadata": {"season_stats": {"goals": 20, "assists": 5, "matches": 30}}},
+    {"player_id": 2, "name": "B", "current_league": "eng premier league", "nationality": "eng ENG", "birth_year": 1995,
+     "metadata": {"season_stats": {"goals": 25, "assists": 3, "matches": 32}}},
+    # row ghi boi fill_players.py: so lieu o metadata.stats
+    {"player_id": 3, "name": "C", "current_league": "es la liga", "nationality": "ar ARG", "birth_year": 1990,
+     "metadata": {"stats": {"goals": 30, "assists": 9, "matches_played": 34}}},
+]
+
+
+def names(rows):
+    return [r["name"] for r in rows]
+
+
+def test_metadata_stats_rows_are_ranked():
+    board = TableLeaderboard("players", PLAYERS)
+    assert names(board.top(None, "goals", "DESC", 3)) == ["C", "B", "A"]
+    assert names(board.top({"league": "La Liga"}, "assists", "DESC", 5)) == ["C", "A"]
+    assert names(board.top(None, "appearances", "ASC", 1)) == ["A"]
+
+
+def test_field_without_local_values_falls_back():
+    board = TableLeaderboard("players", PLAYERS)
+    assert board.top(None, "height", "DESC", 5) is None
+
+
+def test_nationality_filter_matches_fbref_codes():
+    board = TableLeaderboard("players", PLAYERS)
+    assert names(board.top({"nationality": "Brazil"}, "goals", "DESC", 5)) == ["A"]
+    assert names(board.top({"nationality": "brasil", "league": "La Liga"}, "goals", "DESC", 5)) == ["A"]
+
+
+def test_unknown_filter_value_or_column_falls_back():
+    board = TableLeaderboard("players", PLAYERS)
+    assert board.top({"league": "Serie A"}, "goals", "DESC", 5) is None
+    assert board.top({"position": "FW"}, "goals", "DESC", 5) is None
+
+
+def test_boards_built_from_storage_answer_like_the_rpc(tmp_path):
+    storage = SQLiteClient(str(tmp_path / "football.db"))
+    storage.upsert("players", PLAYERS[:2] + [dict(PLAYERS[2], metadata={"season_stats": {"goals": 30}})])
+    client = LeaderboardClient(storage, Leaderboards.from_storage(storage))
+
+    for filters in (None, {"league": "La Liga"}, {"nationality": "Brazil"}):
+        assert client.call_ranking_rpc("players", filters, "goals", "DESC") == \
+            storage.call_ranking_rpc("players", filters, "goals", "DESC")
+    assert client.hits == 3
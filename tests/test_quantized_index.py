@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from src.utils.quantized_index import QuantizedIndex
+from src.utils.vector_index import VectorIndex
+
+K = 10
+LEAGUES = ["eng Premier League", "es La Liga", "it Serie A"]
+
+
+@pytest.fixture(scope="module")
+def data():
+    # vector co cum + query = vector co san + nhieu (giong bench_ann --queries perturb)
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((40, 64)).astype(np.float32)
+    matrix = centers[rng.integers(0, 40, 3000)] + 0.8 * rng.standard_normal((3000, 64)).astype(np.float32)
+    rows = [{"player_id": i, "current_league": LEAGUES[i % 3]} for i in range(3000)]
+    base = matrix[rng.choice(3000, 50)]
+    queries = base / np.linalg.norm(base, axis=1, keepdims=True) + 0.5 * rng.standard_normal((50, 64)) / 8
+    return rows, matrix, queries.astype(np.float32)
+
+
+def recall(index, exact, queries, filters=None, **kwargs) -> float:
+    hits = []
+    for q in queries:
+        truth = {r["player_id"] for r in exact.search(q, K, -1.0, filters)}
+        got = {r["player_id"] for r in index.search(q, K, -1.0, filters, **kwargs)}
+        hits.append(len(got & truth) / len(truth))
+    return float(np.mean(hits))
+
+
+@pytest.mark.parametrize("mode, kwargs, minimum", [("int8", {}, 0.98), ("pq", {"pq_m": 16}, 0.95)])
+def test_recall_with_rerank(data, mode, kwargs, minimum):
+    rows, matrix, queries = data
+    exact = VectorIndex.from_matrix(rows, matrix)
+    index = QuantizedIndex.from_matrix(rows, matrix, mode=mode, **kwargs)
+    assert recall(index, exact, queries) >= minimum
+    assert recall(index, exact, queries, {"league": "La Liga"}) >= minimum
+
+
+def test_rerank_improves_pq_recall_and_returns_exact_similarities(data):
+    rows, matrix, queries = data
+    exact = VectorIndex.from_matrix(rows, matrix)
+    index = QuantizedIndex.from_matrix(rows, matrix, mode="pq", pq_m=16)
+    assert recall(index, exact, queries) > recall(index, exact, queries, rerank_factor=0)
+
+    got = index.search(queries[0], K, -1.0)
+    expected = {r["player_id"]: r["similarity"] for r in exact.search(queries[0], len(rows), -1.0)}
+    assert all(np.isclose(r["similarity"], expected[r["player_id"]], atol=1e-5) for r in got)
+
+
+def test_codes_are_smaller_than_the_float32_matrix(tmp_path, data):
+    rows, matrix, _ = data
+    int8 = QuantizedIndex.from_matrix(rows, matrix, mode="int8", full_precision_path=str(tmp_path / "fp.f32"))
+    assert int8.memory_bytes()["compression"] > 3.5
+    assert int8.memory_bytes()["resident_full_precision"] == 0  # vector goc tren memmap
+    assert QuantizedIndex.from_matrix(rows, matrix, mode="pq", pq_m=16).codes.nbytes == len(rows) * 16
+    assert QuantizedIndex.from_matrix(rows, matrix, mode="int8", rerank_factor=0).matrix is None
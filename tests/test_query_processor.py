@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import pytest
+from conftest import ROOT
+
+from src.rag.generator import ResponseGenerator
+from src.rag.query_processor import QueryProcessor
+from src.rag.rag_pipeline import RAGPipeline
+from src.rag.retriever import Retriever
+from src.rag.types import Strategy
+from src.utils.fake_clients import FakeGeminiClient, FakeSupabaseClient, HashEmbeddingClient
+
+with open(ROOT / "data/eval/router_queries.jsonl", "r", encoding="utf-8") as f:
+    LABELS = [json.loads(line) for line in f if line.strip()]
+BOTH = "Which team does Messi play for and where is their stadium?"
+
+
+@pytest.fixture(scope="module")
+def storage():
+    return FakeSupabaseClient.from_data_dir(HashEmbeddingClient(dim=64), match_threshold=-1.0)
+
+
+def make_pipeline(storage) -> tuple[RAGPipeline, FakeGeminiClient]:
+    # khong co FastRouter: moi cau hoi deu qua router LLM
+    embedder = HashEmbeddingClient(dim=64)
+    gemini = FakeGeminiClient(routes={r["query"]: r for r in LABELS}, answer_tokens=3)
+    pipeline = RAGPipeline(
+        retriever=Retriever(storage, gemini, embedder),
+        generator=ResponseGenerator(gemini),
+        query_processor=QueryProcessor(gemini, embedder),
+    )
+    return pipeline, gemini
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_one_routing_call_per_query(storage, mode):
+    pipeline, gemini = make_pipeline(storage)
+    for case in LABELS:
+        if mode == "sync":
+            pipeline(case["query"])
+        else:
+            asyncio.run(pipeline.acall(case["query"]))
+    # bang + sub-questions di chung lan goi router, khong goi select_table / decompose rieng
+    assert dict(gemini.calls) == {"router": len(LABELS), "answer": len(LABELS)}
+
+
+def test_table_and_sub_queries_come_from_the_routing_call():
+    routes = {BOTH: {"strategy": "semantic", "table": "both",
+                     "sub_queries": {"players": "Which team does Messi play for?"}}}
+    qp = QueryProcessor(FakeGeminiClient(routes=routes), HashEmbeddingClient(dim=8))
+    context = qp(BOTH)
+    assert context.table == "both"
+    assert context.sub_queries == {"players": "Which team does Messi play for?", "teams": BOTH}
+    assert context.embedding is not None and context.confidence is None
+
+
+def test_ranking_route_does_not_embed():
+    label = next(c for c in LABELS if c["strategy"] == "ranking")
+    embedder = HashEmbeddingClient(dim=8)
+    qp = QueryProcessor(FakeGeminiClient(routes={label["query"]: label}), embedder)
+    context = asyncio.run(qp.acall(label["query"]))
+    assert context.strategy == Strategy.RANKING and context.sort_field == label["sort_field"]
+    assert context.embedding is None
+
+
+def test_unparsable_router_reply_defaults_to_hybrid():
+    class BrokenGemini:
+        def chat(self, system_prompt, user_prompt):
+            return "not json"
+
+    context = QueryProcessor(BrokenGemini(), HashEmbeddingClient(dim=8))("Pedri")
+    assert context.strategy == Strategy.HYBRID and context.table is None and context.filters == {}
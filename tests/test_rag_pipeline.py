@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+from conftest import ROOT
+
+from src.rag.answer_cache import SemanticAnswerCache
+from src.rag.fast_router import FastRouter
+from src.rag.generator import ResponseGenerator
+from src.rag.query_processor import QueryProcessor
+from src.rag.rag_pipeline import RAGPipeline
+from src.rag.retriever import Retriever
+from src.utils.fake_clients import FakeGeminiClient, FakeSupabaseClient, HashEmbeddingClient
+
+with open(ROOT / "data/eval/router_queries.jsonl", "r", encoding="utf-8") as f:
+    LABELS = [json.loads(line) for line in f if line.strip()]
+QUERIES = [LABELS[i]["query"] for i in (0, 5, 12, 20, 30, 39)]
+
+
+@pytest.fixture(scope="module")
+def clients():
+    embedder = HashEmbeddingClient(dim=64)
+    storage = FakeSupabaseClient.from_data_dir(embedder, match_threshold=-1.0)
+    return embedder, storage
+
+
+def make_pipeline(clients, answer_cache: bool = False) -> RAGPipeline:
+    embedder, storage = clients
+    gemini = FakeGeminiClient(routes={r["query"]: r for r in LABELS}, answer_tokens=5)
+    return RAGPipeline(
+        retriever=Retriever(storage, gemini, embedder),
+        generator=ResponseGenerator(gemini),
+        query_processor=QueryProcessor(gemini, embedder, fast_router=FastRouter.from_data_dir("data")),
+        answer_cache=SemanticAnswerCache(embedder) if answer_cache else None,
+    )
+
+
+def comparable(result: dict) -> dict:
+    return {k: result[k] for k in ("answer", "context", "strategy", "filters", "cache_hit") if k in result}
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_sync_async_and_stream_agree(clients, query):
+    sync = make_pipeline(clients)(query)
+    async_ = asyncio.run(make_pipeline(clients).acall(query))
+    streamed = list(make_pipeline(clients).stream(query))[-1]
+
+    assert comparable(sync) == comparable(async_)
+    assert {**comparable(streamed), "answer": streamed["answer"].strip()} == \
+        {**comparable(sync), "answer": sync["answer"].strip()}
+
+
+def test_answer_cache_is_shared_by_sync_and_async(clients):
+    pipeline = make_pipeline(clients, answer_cache=True)
+    first = pipeline(QUERIES[3])
+    assert first["cache_hit"] is False
+    again = asyncio.run(pipeline.acall(QUERIES[3]))
+    assert again["cache_hit"] is True and again["answer"] == first["answer"]
+
+
+def test_ranking_miss_does_not_embed(clients):
+    embedder, _ = clients
+    pipeline = make_pipeline(clients, answer_cache=True)
+    before = embedder.calls
+    result = pipeline("Ai ghi nhiều bàn nhất EPL?")
+    assert result["strategy"] == "ranking" and result["context"]
+    assert embedder.calls == before
+
+
+def test_stream_yields_tokens_then_one_result_with_timings(clients):
+    events = list(make_pipeline(clients).stream(QUERIES[0]))
+    tokens, result = events[:-1], events[-1]
+    assert len(tokens) > 1 and all(e["type"] == "token" for e in tokens)
+    assert result["type"] == "result"
+    assert "".join(e["text"] for e in tokens) == result["answer"]
+    assert 0 <= result["ttft_ms"] <= result["total_ms"]
+    assert result["generation_ms"] <= result["total_ms"]
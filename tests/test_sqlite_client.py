@@ -0,0 +1,50 @@
+import pytest
+
+from src.utils.sqlite_client import SQLiteClient
+
+PLAYERS = [
+    {"player_id": 1, "name": "A", "current_league": "es La Liga", "nationality": "br BRA", "position": "FW",
+     "birth_year": 2000, "metadata": {"season_stats": {"goals": 20}}},
+    {"player_id": 2, "name": "B", "current_league": "eng Premier League", "nationality": "eng ENG", "position": "MF",
+     "birth_year": 1995, "metadata": {"season_stats": {"goals": 25}}},
+    {"player_id": 3, "name": "C", "current_league": "es La Liga", "nationality": "ar ARG", "position": "FW",
+     "birth_year": 1990, "metadata": {"season_stats": {"goals": 30}}},
+]
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = SQLiteClient(str(tmp_path / "football.db"))
+    client.upsert("players", PLAYERS)
+    yield client
+    client.close()
+
+
+def names(rows):
+    return sorted(r["name"] for r in rows)
+
+
+def test_league_filter_matches_by_containment_ignoring_case(client):
+    assert names(client.search_by_filters("players", {"league": "La Liga"}, top_k=10)) == ["A", "C"]
+    assert names(client.search_by_filters("players", {"league": "premier league"}, top_k=10)) == ["B"]
+
+
+def test_nationality_filter_matches_country_names(client):
+    assert names(client.search_by_filters("players", {"nationality": "Brazil"}, top_k=10)) == ["A"]
+    assert names(client.search_by_filters("players", {"nationality": "Brazil", "league": "La Liga"},
+                                          top_k=10)) == ["A"]
+
+
+def test_unknown_filter_value_returns_no_rows(client):
+    assert client.search_by_filters("players", {"league": "Serie B"}, top_k=10) == []
+    assert client.call_ranking_rpc("players", {"nationality": "Japan"}, "goals", "DESC") == []
+
+
+def test_ranking_respects_filters(client):
+    assert [r["name"] for r in client.call_ranking_rpc("players", {"league": "La Liga"}, "goals", "DESC")] == ["C", "A"]
+
+
+def test_filter_uses_the_nocase_index(client):
+    where, params = client._where("players", {"league": "La Liga"})
+    plan = client.conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM players{where}", params).fetchall()
+    assert any("USING INDEX" in str(tuple(row)) for row in plan)
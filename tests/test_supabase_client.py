@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+supabase_client = pytest.importorskip("src.utils.supabase_client", exc_type=ImportError)
+SupabaseClient = supabase_client.SupabaseClient
+
+
+def make_client(handler, max_retries: int = 2, backoff: float = 0.0) -> SupabaseClient:
+    # khong tao supabase-py client: chi test duong RPC qua httpx
+    client = SupabaseClient.__new__(SupabaseClient)
+    client.http = httpx.Client(base_url="https://db.test/rest/v1", transport=httpx.MockTransport(handler))
+    client.max_retries = max_retries
+    client.backoff = backoff
+    client._multi_rpc_available = True
+    client._executor = None
+    client._stats_lock = supabase_client.threading.Lock()
+    client._calls = supabase_client.defaultdict(int)
+    client._errors = supabase_client.defaultdict(int)
+    client._retries = supabase_client.defaultdict(int)
+    client._latency_ms = supabase_client.defaultdict(lambda: supabase_client.deque(maxlen=16))
+    return client
+
+
+def test_retryable_status_is_retried_then_succeeds():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503 if len(calls) < 3 else 200, json=[{"name": "a"}])
+
+    client = make_client(handler)
+    assert client.rpc("match_players", {}) == [{"name": "a"}]
+    assert len(calls) == 3 and client._retries["match_players"] == 2
+
+
+def test_errors_raise_instead_of_returning_empty():
+    client = make_client(lambda request: httpx.Response(503))
+    with pytest.raises(httpx.HTTPStatusError):
+        client.rpc("match_players", {})
+    client = make_client(lambda request: httpx.Response(400))
+    with pytest.raises(httpx.HTTPStatusError):
+        client.rpc("match_players", {})
+    assert client._retries["match_players"] == 0  # 4xx khong retry
+
+
+def test_backoff_sleep_is_clamped_to_the_deadline(monkeypatch):
+    slept = []
+    monkeypatch.setattr(supabase_client.time, "sleep", lambda s: slept.append(s))
+    monkeypatch.setattr(supabase_client.random, "uniform", lambda a, b: b)
+
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    client = make_client(handler, max_retries=5, backoff=10.0)
+    started = time.perf_counter()
+    with pytest.raises(httpx.ConnectError):
+        client.rpc("match_players", {}, deadline=0.2)
+    assert slept and all(s <= 0.2 for s in slept)
+    assert time.perf_counter() - started < 1.0
+
+
+def test_non_idempotent_calls_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    client = make_client(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        client._request("upsert", "POST", "/players", json={}, idempotent=False)
+    assert len(calls) == 1
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+from src.utils.tracing import SpanMetrics, Trace, activate, annotate, span, trace, traced
+
+
+def by_name(tr_dict: dict) -> dict:
+    return {s["name"]: s for s in tr_dict["spans"]}
+
+
+def test_spans_nest_across_to_thread_and_gather():
+    @traced("rpc.match_players", result_attrs=lambda docs: {"docs": len(docs)})
+    def rpc():
+        with span("rpc.decode"):
+            return [1, 2, 3]
+
+    async def query():
+        with trace("query", mode="async") as tr:
+            with span("retrieve"):
+                await asyncio.gather(asyncio.to_thread(rpc), asyncio.to_thread(annotate, table="players"))
+            with span("generate"):
+                await asyncio.sleep(0)
+        return tr.to_dict()
+
+    tr = asyncio.run(query())
+    spans = by_name(tr)
+    assert spans["retrieve"]["parent_id"] == tr["root"]["span_id"]
+    assert spans["rpc.match_players"]["parent_id"] == spans["retrieve"]["span_id"]
+    assert spans["rpc.decode"]["parent_id"] == spans["rpc.match_players"]["span_id"]
+    assert spans["rpc.match_players"]["attributes"] == {"docs": 3}
+    assert spans["retrieve"]["attributes"] == {"table": "players"}
+    assert spans["generate"]["start_ms"] >= spans["retrieve"]["start_ms"] + spans["retrieve"]["duration_ms"] - 1e-3
+    assert tr["total_ms"] >= spans["retrieve"]["duration_ms"] and tr["root"]["attributes"] == {"mode": "async"}
+
+
+def test_error_is_recorded_and_spans_outside_a_trace_are_not_collected():
+    with pytest.raises(ValueError):
+        with trace("query") as tr:
+            with span("route"):
+                raise ValueError("boom")
+    assert by_name(tr.to_dict())["route"]["error"] == "ValueError"
+    assert tr.to_dict()["root"]["error"] == "ValueError"
+
+    with span("embed") as s:  # vd thread cua embedding batcher
+        pass
+    assert s.parent_id is None and s.duration_ms is not None
+
+
+def test_activate_and_record_for_generators(tmp_path, monkeypatch):
+    log = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("RAG_TRACE_LOG", str(log))
+    tr = Trace("query", mode="stream")
+    with activate(tr):
+        with span("route"):
+            pass
+    tr.record("generate", tr.root.start, tr.root.start + 0.01, ttft_ms=3.0)
+    tr.finish()
+    tr.finish()  # chi ghi 1 lan
+
+    lines = log.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    logged = json.loads(lines[0])
+    assert [s["name"] for s in logged["spans"]] == ["generate", "route"]
+    assert by_name(logged)["generate"]["duration_ms"] == pytest.approx(10.0, abs=1e-3)
+
+
+def test_render_is_prometheus_text():
+    metrics = SpanMetrics(buckets=(0.01, 0.1))
+    metrics.observe("route", 0.005)
+    metrics.observe("route", 0.05)
+    metrics.observe("route", 5.0, error=True)
+    metrics.observe('rpc."x"', 0.001)
+
+    text = metrics.render()
+    assert text.endswith("\n")
+    assert 'rag_span_duration_seconds_bucket{span="route",le="0.01"} 1' in text
+    assert 'rag_span_duration_seconds_bucket{span="route",le="0.1"} 2' in text
+    assert 'rag_span_duration_seconds_bucket{span="route",le="+Inf"} 3' in text
+    assert 'rag_span_duration_seconds_sum{span="route"} 5.055000' in text
+    assert 'rag_span_duration_seconds_count{span="route"} 3' in text
+    assert 'rag_span_errors_total{span="route"} 1' in text
+    assert 'span="rpc.\\"x\\""' in text
+    sample = re.compile(r'^[a-z_]+\{span="(?:[^"\\]|\\.)*"(?:,le="[^"]+")?\} [0-9.]+$')
+    assert all(line.startswith("# ") or sample.match(line) for line in text.splitlines())
+
+    metrics.reset()
+    assert "rag_span_duration_seconds_bucket" not in metrics.render()
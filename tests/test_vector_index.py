@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from src.utils.vector_index import LocalVectorSearchClient, VectorIndex
+
+LEAGUES = ["eng Premier League", "es La Liga", "it Serie A"]
+NATIONS = {"br BRA": "brazil", "fr FRA": "france", "eng ENG": "england", "es ESP": "spain"}
+
+
+def rpc_reference(rows, matrix, query, top_k, threshold, filters):
+    # cach match_players RPC tinh: cosine, ILIKE '%value%' tren tung filter, similarity > threshold
+    # (ten nuoc "Brazil" khop ma FBref "br BRA")
+    q = query / np.linalg.norm(query)
+    league = (filters or {}).get("league")
+    nation = (filters or {}).get("nationality")
+    out = []
+    for row, vec in zip(rows, matrix):
+        if league and league.lower() not in row["current_league"].lower():
+            continue
+        if nation and nation.lower() not in (row["nationality"].lower(), NATIONS[row["nationality"]]):
+            continue
+        similarity = float(vec @ q / np.linalg.norm(vec))
+        if similarity > threshold:
+            out.append((similarity, row["player_id"]))
+    return [pid for _, pid in sorted(out, reverse=True)[:top_k]]
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((300, 16)).astype(np.float32)
+    rows = [{"player_id": i, "current_league": LEAGUES[i % 3], "nationality": list(NATIONS)[i % 4]} for i in range(300)]
+    queries = rng.standard_normal((20, 16)).astype(np.float32)
+    return rows, matrix, queries
+
+
+@pytest.mark.parametrize("threshold", [-1.0, 0.0, 0.3])
+@pytest.mark.parametrize("filters", [None, {"league": "La Liga"}, {"league": "serie a", "nationality": "Brazil"},
+                                     {"nationality": "br BRA"}, {"league": "Bundesliga"}])
+def test_search_matches_the_rpc(data, threshold, filters):
+    rows, matrix, queries = data
+    index = VectorIndex([{**r, "embedding": v.tolist()} for r, v in zip(rows, matrix)])
+    for q in queries:
+        got = index.search(q, 10, threshold, filters)
+        assert [r["player_id"] for r in got] == rpc_reference(rows, matrix, q, 10, threshold, filters)
+        assert all(r["similarity"] > threshold and "embedding" not in r for r in got)
+
+
+def test_filters_on_missing_columns_are_ignored(data):
+    rows, matrix, queries = data
+    index = VectorIndex.from_matrix(rows, matrix)
+    assert index.search(queries[0], 5, -1.0, {"position": "FW"}) == index.search(queries[0], 5, -1.0)
+
+
+def test_local_client_uses_its_threshold_and_delegates_the_rest(data):
+    rows, matrix, queries = data
+
+    class Storage:
+        def call_ranking_rpc(self, *args):
+            return "rpc"
+
+    client = LocalVectorSearchClient(Storage(), {"players": VectorIndex.from_matrix(rows, matrix)},
+                                     match_threshold=0.3)
+    got = client.search_vectors("players", queries[1].tolist(), {"league": "La Liga"}, top_k=5)
+    assert [r["player_id"] for r in got] == rpc_reference(rows, matrix, queries[1], 5, 0.3, {"league": "La Liga"})
+    assert client.call_ranking_rpc("players", None, "goals", "DESC") == "rpc"